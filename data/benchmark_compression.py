@@ -0,0 +1,77 @@
+"""
+This script is for calculating the difference in time between compressing the footprint with the ktools
+footprinttocsv | footprinttobin pipeline and the native compressor. This script should be run in the same directory as
+the model data, with the root of this repo on the python path:
+
+    PYTHONPATH=/path/to/utils python -m data.benchmark_compression --intensity-bins 50 --workers 4
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from data.compress_footrpint import compress_footprint_file, incremental_compress_footprint_file
+from data.footprint_reader import FootprintReader
+
+
+def compare_compressed_footprints(first_path: str, second_path: str) -> int:
+    """
+    Compares the decompressed events of two compressed footprints.
+
+    :param first_path: (str) the directory housing the first footprint.bin.z and footprint.idx.z
+    :param second_path: (str) the directory housing the second footprint.bin.z and footprint.idx.z
+    :return: (int) the number of events that differ between the two footprints
+    """
+    differences: int = 0
+    with FootprintReader(first_path, compressed=True) as first, FootprintReader(second_path, compressed=True) as second:
+        if not np.array_equal(first.event_ids, second.event_ids):
+            return max(len(first), len(second))
+        for (_, first_records), (_, second_records) in zip(first.iter_events(), second.iter_events()):
+            if first_records.tobytes() != second_records.tobytes():
+                differences += 1
+    return differences
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="times the native footprint compressor against ktools")
+    parser.add_argument("--static-path", default="./static/", help="the directory housing footprint.bin/idx")
+    parser.add_argument("--intensity-bins", type=int, required=True, help="the number of intensity bins")
+    parser.add_argument("--workers", type=int, default=1, help="the number of processes the native compressor uses")
+    parser.add_argument("--incremental", action="store_true",
+                        help="also times an incremental recompression of the unchanged footprint")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as ktools_path, tempfile.TemporaryDirectory() as native_path:
+        start = time.time()
+        compress_footprint_file(static_path=args.static_path, intensity_bins=args.intensity_bins, native=False,
+                                output_path=ktools_path)
+        finish = time.time()
+        print(f"the time with footprinttocsv | footprinttobin is: {finish - start}")
+
+        start = time.time()
+        compress_footprint_file(static_path=args.static_path, intensity_bins=args.intensity_bins,
+                                output_path=native_path, workers=args.workers)
+        finish = time.time()
+        print(f"the time with the native compressor on {args.workers} workers is: {finish - start}")
+
+        if args.incremental is True:
+            # the first incremental run has no manifest so it compresses every event and writes one
+            incremental_compress_footprint_file(static_path=args.static_path, intensity_bins=args.intensity_bins,
+                                                output_path=native_path, workers=args.workers)
+            start = time.time()
+            counts = incremental_compress_footprint_file(static_path=args.static_path,
+                                                         intensity_bins=args.intensity_bins, output_path=native_path,
+                                                         workers=args.workers)
+            finish = time.time()
+            print(f"the time of an incremental recompression reusing {counts['reused']} of {counts['events']} "
+                  f"events is: {finish - start}")
+
+        for file_name in ("footprint.bin.z", "footprint.idx.z"):
+            ktools_size: int = os.path.getsize(os.path.join(ktools_path, file_name))
+            native_size: int = os.path.getsize(os.path.join(native_path, file_name))
+            print(f"{file_name} size with ktools is {ktools_size} and with native is {native_size}")
+
+        # the CSV round trip prints probabilities as text so events can legitimately differ in the last digits
+        print(f"events that decompress differently: {compare_compressed_footprints(ktools_path, native_path)}")
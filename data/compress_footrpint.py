@@ -1,19 +1,440 @@
 """
 This file compresses the footprint file.
+
+The native compressor can also recompress incrementally. A sidecar manifest next to footprint.bin.z keeps a content hash
+of every event's bytes in footprint.bin along with where its compressed block sits, so only the events whose bytes
+changed are compressed again and the blocks of the others are copied over from the old footprint.bin.z in as few byte
+range copies as possible.
 """
+import errno
+import hashlib
+import os
+import shutil
+import tempfile
+import zlib
+from multiprocessing import Pool
 from subprocess import Popen
+from typing import BinaryIO, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from data.footprint_format import (FOOTPRINT_HEADER_SIZE, INTENSITY_UNCERTAINTY_MASK, UNCOMPRESSED_SIZE_MASK,
+                                   ZFootprintIndex, load_footprint_index, pack_footprint_header,
+                                   read_footprint_header)
 
+COMPRESSION_MANIFEST_FILE: str = "footprint.bin.z.manifest.npz"
+CompressionManifestEntry = np.dtype([("event_id", "<i4"), ("hash", "<u8", (2,)), ("offset", "<i8"), ("size", "<i8")])
+COPY_CHUNK_SIZE: int = 16 * 1024 * 1024
 
-def compress_footprint_file(static_path: str, intensity_bins: int) -> None:
+
+def compress_footprint_file(static_path: str, intensity_bins: int, native: bool = True,
+                            output_path: Optional[str] = None, compression_level: int = -1,
+                            workers: int = 1, incremental: bool = False) -> None:
     """
     Compresses the footprint file to a compressed file.
 
     :param static_path: (str) the path to the static file
     :param intensity_bins: (int) the number of intensity bins
+    :param native: (bool) if set to False the ktools footprinttocsv | footprinttobin pipeline is used instead
+    :param output_path: (Optional[str]) the directory the compressed files are written to, defaults to static_path
+    :param compression_level: (int) the zlib compression level used by the native compressor
+    :param workers: (int) the number of processes the native compressor splits the events across
+    :param incremental: (bool) if set to True the native compressor only compresses the events that changed since the
+                        last incremental compression into output_path
     :return: None
     """
+    output_path = static_path if output_path is None else output_path
+
+    if incremental is True:
+        if native is False:
+            raise ValueError("incremental compression needs the native compressor")
+        incremental_compress_footprint_file(static_path=static_path, intensity_bins=intensity_bins,
+                                            output_path=output_path, compression_level=compression_level,
+                                            workers=workers)
+        return
+
+    if native is True:
+        native_compress_footprint_file(static_path=static_path, intensity_bins=intensity_bins,
+                                       output_path=output_path, compression_level=compression_level,
+                                       workers=workers)
+        return
+
     command: str = f"footprinttocsv -b {static_path}/footprint.bin -x {static_path}/footprint.idx | " \
-                   f"footprinttobin -z -u -b {static_path}/footprint.bin.z -x {static_path}/footprint.idx.z " \
+                   f"footprinttobin -z -u -b {output_path}/footprint.bin.z -x {output_path}/footprint.idx.z " \
                    f"-i {intensity_bins}"
     compression_process = Popen(command, shell=True)
     compression_process.wait()
+
+
+def native_compress_footprint_file(static_path: str, intensity_bins: int, output_path: Optional[str] = None,
+                                   compression_level: int = -1, workers: int = 1) -> None:
+    """
+    Compresses the footprint file without going through the CSV text format. Each event's records are read through
+    footprint.idx and zlib compressed straight into footprint.bin.z, one event at a time, so memory use is bounded by
+    the largest event. The output matches the layout written by footprinttobin -z -u.
+
+    With more than one worker the events are split into contiguous ranges of footprint.idx which are compressed into
+    part files by a process pool. The parts are stitched together in event order so the output is byte identical to
+    the serial run.
+
+    :param static_path: (str) the path to the static file
+    :param intensity_bins: (int) the number of intensity bins
+    :param output_path: (Optional[str]) the directory the compressed files are written to, defaults to static_path
+    :param compression_level: (int) the zlib compression level, -1 is the zlib default used by ktools
+    :param workers: (int) the number of processes the events are split across
+    :return: None
+    """
+    output_path = static_path if output_path is None else output_path
+    bin_path: str = os.path.join(static_path, "footprint.bin")
+
+    index: np.ndarray = load_footprint_index(os.path.join(static_path, "footprint.idx"))
+    _, options = read_footprint_header(bin_path)
+    header: bytes = pack_footprint_header(
+        num_intensity_bins=intensity_bins,
+        options=(options & INTENSITY_UNCERTAINTY_MASK) | UNCOMPRESSED_SIZE_MASK
+    )
+
+    with open(bin_path, "rb") as source, open(os.path.join(output_path, "footprint.bin.z"), "wb") as target:
+        target.write(header)
+        if workers > 1 and len(index) > 1:
+            compressed_sizes: np.ndarray = _parallel_compress_events(
+                bin_path=bin_path, target=target, index=index, compression_level=compression_level,
+                workers=workers, part_path=output_path
+            )
+        else:
+            compressed_sizes = _compress_events(source=source, target=target, index=index,
+                                                compression_level=compression_level)
+
+    _build_compressed_index(index=index, compressed_sizes=compressed_sizes).tofile(
+        os.path.join(output_path, "footprint.idx.z")
+    )
+
+
+def _compress_events(source: BinaryIO, target: BinaryIO, index: np.ndarray, compression_level: int) -> np.ndarray:
+    """
+    Compresses the events referenced by the index from the source file and appends them to the target file.
+
+    :param source: (BinaryIO) the open footprint.bin file
+    :param target: (BinaryIO) the open file the compressed blocks are appended to
+    :param index: (np.ndarray) the footprint.idx entries of the events to compress, in output order
+    :param compression_level: (int) the zlib compression level
+    :return: (np.ndarray) the compressed size of each event
+    """
+    compressed_sizes: np.ndarray = np.empty(len(index), dtype=np.int64)
+
+    for i, (event_id, offset, size) in enumerate(index.tolist()):
+        source.seek(offset)
+        data: bytes = source.read(size)
+        if len(data) != size:
+            raise ValueError(f"event {event_id} runs past the end of the footprint file")
+        compressed: bytes = zlib.compress(data, compression_level)
+        target.write(compressed)
+        compressed_sizes[i] = len(compressed)
+
+    return compressed_sizes
+
+
+def _compress_event_range(task: Tuple[str, np.ndarray, int, str]) -> Tuple[str, np.ndarray]:
+    """
+    Compresses a contiguous range of events into a part file, this is run by the worker processes.
+
+    :param task: (Tuple[str, np.ndarray, int, str]) the footprint.bin path, the footprint.idx entries of the range,
+                 the zlib compression level and the directory the part file is written to
+    :return: (Tuple[str, np.ndarray]) the path to the part file and the compressed size of each event
+    """
+    bin_path, index, compression_level, part_path = task
+    with open(bin_path, "rb") as source, \
+            tempfile.NamedTemporaryFile(dir=part_path, prefix="footprint.bin.z.", suffix=".part",
+                                        delete=False) as target:
+        compressed_sizes: np.ndarray = _compress_events(source=source, target=target, index=index,
+                                                        compression_level=compression_level)
+    return target.name, compressed_sizes
+
+
+def _parallel_compress_events(bin_path: str, target: BinaryIO, index: np.ndarray, compression_level: int,
+                              workers: int, part_path: str) -> np.ndarray:
+    """
+    Compresses the events across a process pool and appends the compressed blocks to the target file in index order.
+
+    The index is split into more ranges than workers so a range of heavy events does not leave the other workers idle.
+    Each range is stitched and its part file removed as soon as it and every range before it have finished. The part
+    files are written to a temporary directory of their own, which is removed with anything left in it if a worker
+    fails.
+
+    :param bin_path: (str) the path to footprint.bin
+    :param target: (BinaryIO) the open file the compressed blocks are appended to
+    :param index: (np.ndarray) the footprint.idx entries of the events to compress, in output order
+    :param compression_level: (int) the zlib compression level
+    :param workers: (int) the number of worker processes
+    :param part_path: (str) the directory the temporary directory of the part files is made in
+    :return: (np.ndarray) the compressed size of each event
+    """
+    ranges: List[np.ndarray] = np.array_split(index, min(len(index), workers * 4))
+    compressed_sizes: List[np.ndarray] = []
+
+    # the pool is terminated before the directory is removed so no worker is still writing a part file into it
+    with tempfile.TemporaryDirectory(dir=part_path, prefix="footprint.bin.z.parts.") as parts_directory, \
+            Pool(processes=workers) as pool:
+        tasks = [(bin_path, event_range, compression_level, parts_directory) for event_range in ranges]
+        for part_file, part_sizes in pool.imap(_compress_event_range, tasks):
+            with open(part_file, "rb") as part:
+                shutil.copyfileobj(part, target, length=COPY_CHUNK_SIZE)
+            os.remove(part_file)
+            compressed_sizes.append(part_sizes)
+
+    return np.concatenate(compressed_sizes)
+
+
+def _build_compressed_index(index: np.ndarray, compressed_sizes: np.ndarray) -> np.ndarray:
+    """
+    Builds the footprint.idx.z entries for events written back to back after the footprint header.
+
+    :param index: (np.ndarray) the footprint.idx entries of the events, in output order
+    :param compressed_sizes: (np.ndarray) the compressed size of each event
+    :return: (np.ndarray) the footprint.idx.z entries
+    """
+    compressed_index: np.ndarray = np.empty(len(index), dtype=ZFootprintIndex)
+    compressed_index["event_id"] = index["event_id"]
+    compressed_index["offset"] = FOOTPRINT_HEADER_SIZE + np.cumsum(compressed_sizes) - compressed_sizes
+    compressed_index["size"] = compressed_sizes
+    compressed_index["d_size"] = index["size"]
+    return compressed_index
+
+
+def _hash_events(source: BinaryIO, index: np.ndarray) -> np.ndarray:
+    """
+    Hashes the bytes of every event referenced by the index.
+
+    :param source: (BinaryIO) the open footprint.bin file
+    :param index: (np.ndarray) the footprint.idx entries of the events to hash
+    :return: (np.ndarray) a 128 bit blake2b hash per event as two unsigned 64 bit integers
+    """
+    hashes: np.ndarray = np.empty((len(index), 2), dtype="<u8")
+    for i, (event_id, offset, size) in enumerate(index.tolist()):
+        source.seek(offset)
+        data: bytes = source.read(size)
+        if len(data) != size:
+            raise ValueError(f"event {event_id} runs past the end of the footprint file")
+        hashes[i] = np.frombuffer(hashlib.blake2b(data, digest_size=16).digest(), dtype="<u8")
+    return hashes
+
+
+def _hash_event_range(task: Tuple[str, np.ndarray]) -> np.ndarray:
+    """
+    Hashes a contiguous range of events, this is run by the worker processes.
+
+    :param task: (Tuple[str, np.ndarray]) the footprint.bin path and the footprint.idx entries of the range
+    :return: (np.ndarray) a 128 bit blake2b hash per event of the range as two unsigned 64 bit integers
+    """
+    bin_path, index = task
+    with open(bin_path, "rb") as source:
+        return _hash_events(source=source, index=index)
+
+
+def hash_footprint_events(bin_path: str, index: np.ndarray, workers: int = 1) -> np.ndarray:
+    """
+    Hashes the bytes of every event in footprint.bin, across a process pool if there is more than one worker.
+
+    :param bin_path: (str) the path to footprint.bin
+    :param index: (np.ndarray) the footprint.idx entries of the events to hash
+    :param workers: (int) the number of processes the events are split across
+    :return: (np.ndarray) a 128 bit blake2b hash per event as two unsigned 64 bit integers
+    """
+    if workers <= 1 or len(index) <= 1:
+        return _hash_event_range((bin_path, index))
+    ranges: List[np.ndarray] = np.array_split(index, min(len(index), workers * 4))
+    with Pool(processes=workers) as pool:
+        return np.concatenate(pool.map(_hash_event_range, [(bin_path, event_range) for event_range in ranges]))
+
+
+def load_compression_manifest(output_path: str, header: bytes, compression_level: int) -> Optional[np.ndarray]:
+    """
+    Loads the manifest of the footprint.bin.z in a directory if it still describes that file.
+
+    :param output_path: (str) the directory housing footprint.bin.z and its manifest
+    :param header: (bytes) the header the new footprint.bin.z will be written with
+    :param compression_level: (int) the zlib compression level the new footprint.bin.z will be written with
+    :return: (Optional[np.ndarray]) the manifest entries, None if there is no manifest or footprint.bin.z has been
+             written since or with a different header or compression level
+    """
+    manifest_path: str = os.path.join(output_path, COMPRESSION_MANIFEST_FILE)
+    bin_z_path: str = os.path.join(output_path, "footprint.bin.z")
+    if not os.path.isfile(manifest_path) or not os.path.isfile(bin_z_path):
+        return None
+    stat: os.stat_result = os.stat(bin_z_path)
+    with np.load(manifest_path) as manifest:
+        if manifest["header"].tobytes() != header or int(manifest["compression_level"]) != compression_level \
+                or int(manifest["bin_z_size"]) != stat.st_size or int(manifest["bin_z_mtime_ns"]) != stat.st_mtime_ns:
+            return None
+        return manifest["entries"]
+
+
+def write_compression_manifest(output_path: str, entries: np.ndarray, header: bytes, compression_level: int) -> None:
+    """
+    Writes the manifest of the footprint.bin.z in a directory, tying it to the size and modification time of the file.
+
+    :param output_path: (str) the directory housing footprint.bin.z
+    :param entries: (np.ndarray) the event ID, hash, offset and compressed size of every event
+    :param header: (bytes) the header footprint.bin.z was written with
+    :param compression_level: (int) the zlib compression level footprint.bin.z was written with
+    :return: None
+    """
+    stat: os.stat_result = os.stat(os.path.join(output_path, "footprint.bin.z"))
+    manifest_path: str = os.path.join(output_path, COMPRESSION_MANIFEST_FILE)
+    temporary_path: str = f"{manifest_path}.{os.getpid()}.tmp"
+    with open(temporary_path, "wb") as file:
+        np.savez(file, entries=entries, header=np.frombuffer(header, dtype=np.uint8),
+                 compression_level=compression_level, bin_z_size=stat.st_size, bin_z_mtime_ns=stat.st_mtime_ns)
+    os.replace(temporary_path, manifest_path)
+
+
+def _copy_byte_range(source: int, target: int, offset: int, length: int) -> None:
+    """
+    Appends a range of one file to another at the target's current position. copy_file_range lets the kernel copy
+    the range without it passing through Python, and on file systems that support it without copying the data at
+    all. A plain read and write loop is used where it is not supported.
+
+    :param source: (int) the descriptor of the file being copied from
+    :param target: (int) the descriptor of the file being appended to
+    :param offset: (int) the first byte of the range in the source
+    :param length: (int) the number of bytes in the range
+    :return: None
+    """
+    copied: int = 0
+    try:
+        while copied < length:
+            sent: int = os.copy_file_range(source, target, length - copied, offset + copied)
+            if sent == 0:
+                raise ValueError(f"the range at {offset} runs past the end of the compressed footprint")
+            copied += sent
+        return
+    except AttributeError:
+        # copy_file_range is only available on Linux
+        pass
+    except OSError as error:
+        if error.errno not in (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP):
+            raise
+    while copied < length:
+        data: bytes = os.pread(source, min(COPY_CHUNK_SIZE, length - copied), offset + copied)
+        if len(data) == 0:
+            raise ValueError(f"the range at {offset} runs past the end of the compressed footprint")
+        os.write(target, data)
+        copied += len(data)
+
+
+def incremental_compress_footprint_file(static_path: str, intensity_bins: int, output_path: Optional[str] = None,
+                                        compression_level: int = -1, workers: int = 1) -> Dict[str, int]:
+    """
+    Compresses the footprint file, only compressing the events whose bytes changed since the last incremental
+    compression into output_path. Every event of footprint.bin is hashed and looked up in the manifest of the
+    existing footprint.bin.z, the changed and new events are compressed, and the new footprint.bin.z is built by
+    copying runs of contiguous blocks from the old footprint.bin.z and the newly compressed blocks. The new files are
+    written under temporary names and renamed into place so a failed run leaves the old files and manifest intact.
+    Without a manifest that matches footprint.bin.z every event is compressed and a manifest is written for next time.
+
+    The output is byte identical to native_compress_footprint_file with the same compression level.
+
+    :param static_path: (str) the path to the static file
+    :param intensity_bins: (int) the number of intensity bins
+    :param output_path: (Optional[str]) the directory the compressed files are written to, defaults to static_path
+    :param compression_level: (int) the zlib compression level, -1 is the zlib default used by ktools
+    :param workers: (int) the number of processes the events are hashed and compressed across
+    :return: (Dict[str, int]) the number of events, how many were compressed and reused and the number of range copies
+    """
+    output_path = static_path if output_path is None else output_path
+    bin_path: str = os.path.join(static_path, "footprint.bin")
+    index: np.ndarray = load_footprint_index(os.path.join(static_path, "footprint.idx"))
+    _, options = read_footprint_header(bin_path)
+    header: bytes = pack_footprint_header(
+        num_intensity_bins=intensity_bins,
+        options=(options & INTENSITY_UNCERTAINTY_MASK) | UNCOMPRESSED_SIZE_MASK
+    )
+    hashes: np.ndarray = hash_footprint_events(bin_path=bin_path, index=index, workers=workers)
+    manifest: Optional[np.ndarray] = load_compression_manifest(output_path=output_path, header=header,
+                                                               compression_level=compression_level)
+
+    # the old position of every event, -1 where the event is new or its bytes changed
+    reused_rows: np.ndarray = np.full(len(index), -1, dtype=np.int64)
+    if manifest is not None and len(manifest) > 0:
+        order: np.ndarray = np.argsort(manifest["event_id"], kind="stable")
+        positions: np.ndarray = np.minimum(np.searchsorted(manifest["event_id"], index["event_id"], sorter=order),
+                                           len(manifest) - 1)
+        rows: np.ndarray = order[positions]
+        same: np.ndarray = (manifest["event_id"][rows] == index["event_id"]) & \
+            (manifest["hash"][rows] == hashes).all(axis=1)
+        reused_rows[same] = rows[same]
+    changed: np.ndarray = reused_rows < 0
+
+    bin_z_path: str = os.path.join(output_path, "footprint.bin.z")
+    idx_z_path: str = os.path.join(output_path, "footprint.idx.z")
+    temporary_bin_z: str = f"{bin_z_path}.{os.getpid()}.tmp"
+    temporary_idx_z: str = f"{idx_z_path}.{os.getpid()}.tmp"
+    compressed_sizes: np.ndarray = np.zeros(len(index), dtype=np.int64)
+    copies: int = 0
+    try:
+        with tempfile.NamedTemporaryFile(dir=output_path, prefix="footprint.bin.z.", suffix=".changed") as fresh:
+            # the changed events are compressed in output order so runs of them are contiguous in the fresh file too
+            changed_index: np.ndarray = index[changed]
+            if len(changed_index) > 0:
+                if workers > 1 and len(changed_index) > 1:
+                    compressed_sizes[changed] = _parallel_compress_events(
+                        bin_path=bin_path, target=fresh, index=changed_index, compression_level=compression_level,
+                        workers=workers, part_path=output_path
+                    )
+                else:
+                    with open(bin_path, "rb") as source:
+                        compressed_sizes[changed] = _compress_events(source=source, target=fresh, index=changed_index,
+                                                                     compression_level=compression_level)
+                fresh.flush()
+
+            source_offsets: np.ndarray = np.zeros(len(index), dtype=np.int64)
+            changed_sizes: np.ndarray = compressed_sizes[changed]
+            source_offsets[changed] = np.cumsum(changed_sizes) - changed_sizes
+            if manifest is not None:
+                compressed_sizes[~changed] = manifest["size"][reused_rows[~changed]]
+                source_offsets[~changed] = manifest["offset"][reused_rows[~changed]]
+
+            # a run of events is copied in one go while it comes from the same file and its blocks sit back to back
+            starts: np.ndarray = np.ones(len(index), dtype=bool)
+            starts[1:] = (changed[1:] != changed[:-1]) | \
+                (source_offsets[1:] != source_offsets[:-1] + compressed_sizes[:-1])
+            run_starts: np.ndarray = np.flatnonzero(starts)
+            run_lengths: np.ndarray = np.add.reduceat(compressed_sizes, run_starts) if len(index) > 0 \
+                else np.empty(0, dtype=np.int64)
+            copies = len(run_starts)
+
+            old_file: Optional[int] = os.open(bin_z_path, os.O_RDONLY) if manifest is not None else None
+            try:
+                with open(temporary_bin_z, "wb") as target:
+                    target.write(header)
+                    target.flush()
+                    for start, length in zip(run_starts.tolist(), run_lengths.tolist()):
+                        source_file: int = fresh.fileno() if changed[start] else old_file
+                        _copy_byte_range(source=source_file, target=target.fileno(),
+                                         offset=int(source_offsets[start]), length=length)
+            finally:
+                if old_file is not None:
+                    os.close(old_file)
+
+        _build_compressed_index(index=index, compressed_sizes=compressed_sizes).tofile(temporary_idx_z)
+        os.replace(temporary_bin_z, bin_z_path)
+        os.replace(temporary_idx_z, idx_z_path)
+    except BaseException:
+        for path in (temporary_bin_z, temporary_idx_z):
+            if os.path.exists(path):
+                os.remove(path)
+        raise
+
+    entries: np.ndarray = np.empty(len(index), dtype=CompressionManifestEntry)
+    entries["event_id"] = index["event_id"]
+    entries["hash"] = hashes
+    entries["offset"] = FOOTPRINT_HEADER_SIZE + np.cumsum(compressed_sizes) - compressed_sizes
+    entries["size"] = compressed_sizes
+    write_compression_manifest(output_path=output_path, entries=entries, header=header,
+                               compression_level=compression_level)
+    return {
+        "events": len(index),
+        "compressed": int(changed.sum()),
+        "reused": int((~changed).sum()),
+        "copies": copies
+    }
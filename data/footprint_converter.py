@@ -0,0 +1,561 @@
+"""
+This file converts footprints between the bin, bin.z, csv and parquet formats. Events are streamed one at a time so
+footprints larger than the available memory can be converted, and conversions can be verified to be bit exact. The
+file imports the data package so it is run as a module from the root of the repo:
+
+    python -m data.footprint_converter bin parquet --static-path ./static/ --target-path ./converted/
+"""
+import argparse
+import json
+import os
+import shutil
+import zlib
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from data.footprint_format import (INTENSITY_UNCERTAINTY_MASK, UNCOMPRESSED_SIZE_MASK, EventRecord, FootprintIndex,
+                                   ZFootprintIndex, pack_footprint_header)
+from data.footprint_reader import FootprintReader
+
+FOOTPRINT_FORMATS: Tuple[str, ...] = ("bin", "bin.z", "csv", "parquet")
+PARQUET_LAYOUTS: Tuple[str, ...] = ("partitioned", "row_groups")
+PARQUET_DIRECTORY: str = "footprint.parquet"
+PARQUET_META_FILE: str = "footprint_parquet_meta.json"
+CSV_COLUMNS: List[str] = ["event_id", "areaperil_id", "intensity_bin_id", "probability"]
+
+
+class BinFootprintWriter:
+    """
+    This class is responsible for writing events to footprint.bin/idx or, when compressed, footprint.bin.z/idx.z.
+
+    Attributes:
+        static_path (str): the path to the folder the footprint is written to
+        compressed (bool): True if zlib compressed footprint.bin.z and footprint.idx.z files are written
+        compression_level (int): the zlib compression level used for compressed footprints
+    """
+    def __init__(self, static_path: str, num_intensity_bins: int, has_intensity_uncertainty: bool = True,
+                 compressed: bool = False, compression_level: int = -1) -> None:
+        """
+        The constructor of the BinFootprintWriter.
+
+        :param static_path: (str) the path to the folder the footprint is written to
+        :param num_intensity_bins: (int) the number of intensity bins written to the header
+        :param has_intensity_uncertainty: (bool) the intensity uncertainty flag written to the header
+        :param compressed: (bool) if set to True the compressed .z files are written
+        :param compression_level: (int) the zlib compression level used for compressed footprints
+        """
+        self.static_path: str = static_path
+        self.compressed: bool = compressed
+        self.compression_level: int = compression_level
+        self._index: List[Tuple[int, ...]] = []
+
+        suffix: str = ".z" if compressed is True else ""
+        options: int = INTENSITY_UNCERTAINTY_MASK if has_intensity_uncertainty is True else 0
+        if compressed is True:
+            options |= UNCOMPRESSED_SIZE_MASK
+        self._idx_path: str = os.path.join(static_path, f"footprint.idx{suffix}")
+        self._file = open(os.path.join(static_path, f"footprint.bin{suffix}"), "wb")
+        self._file.write(pack_footprint_header(num_intensity_bins=num_intensity_bins, options=options))
+        self._offset: int = self._file.tell()
+
+    def __enter__(self) -> "BinFootprintWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    def write_event(self, event_id: int, records: np.ndarray) -> None:
+        """
+        Appends an event to the footprint.
+
+        :param event_id: (int) the ID of the event
+        :param records: (np.ndarray) the EventRecord array of the event
+        :return: None
+        """
+        data: bytes = np.ascontiguousarray(records, dtype=EventRecord).tobytes()
+        if self.compressed is True:
+            compressed: bytes = zlib.compress(data, self.compression_level)
+            self._file.write(compressed)
+            self._index.append((event_id, self._offset, len(compressed), len(data)))
+            self._offset += len(compressed)
+        else:
+            self._file.write(data)
+            self._index.append((event_id, self._offset, len(data)))
+            self._offset += len(data)
+
+    def close(self) -> None:
+        """
+        Closes the footprint and writes its index.
+
+        :return: None
+        """
+        if self._file.closed:
+            return
+        self._file.close()
+        dtype: np.dtype = ZFootprintIndex if self.compressed is True else FootprintIndex
+        np.array(self._index, dtype=dtype).tofile(self._idx_path)
+
+
+class CsvFootprintWriter:
+    """
+    This class is responsible for writing events to footprint.csv. Probabilities are written with enough digits to be
+    read back to the same float32 value.
+
+    Attributes:
+        static_path (str): the path to the folder the footprint is written to
+    """
+    def __init__(self, static_path: str) -> None:
+        """
+        The constructor of the CsvFootprintWriter.
+
+        :param static_path: (str) the path to the folder the footprint is written to
+        """
+        self.static_path: str = static_path
+        self._file = open(os.path.join(static_path, "footprint.csv"), "w")
+        self._file.write(",".join(CSV_COLUMNS) + "\n")
+
+    def __enter__(self) -> "CsvFootprintWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    def write_event(self, event_id: int, records: np.ndarray) -> None:
+        """
+        Appends an event to the footprint.
+
+        :param event_id: (int) the ID of the event
+        :param records: (np.ndarray) the EventRecord array of the event
+        :return: None
+        """
+        pd.DataFrame({
+            "event_id": np.full(len(records), event_id, dtype=np.int32),
+            "areaperil_id": records["areaperil_id"],
+            "intensity_bin_id": records["intensity_bin_id"],
+            "probability": records["probability"]
+        }).to_csv(self._file, header=False, index=False, float_format="%.9g")
+
+    def close(self) -> None:
+        """
+        Closes the footprint.
+
+        :return: None
+        """
+        self._file.close()
+
+
+class ParquetFootprintWriter:
+    """
+    This class is responsible for writing events to the footprint.parquet dataset and its meta data file.
+
+    With the partitioned layout every event is written to its own event_id=<id> hive partition, which is the layout
+    read by modelpy. With the row_groups layout events are appended to part files with an event_id column and every
+    row group holds whole events, so readers can skip row groups on their event_id statistics.
+
+    An existing footprint.parquet in the folder is removed first, as the two layouts cannot be read back mixed and
+    partitions of events no longer in the footprint would otherwise be left behind.
+
+    Attributes:
+        static_path (str): the path to the folder the footprint is written to
+        layout (str): either partitioned or row_groups
+        row_group_size (int): the rows per row group, the row_groups layout closes a row group at the first event
+                              boundary after this many rows
+        max_rows_per_file (int): the number of rows after which the row_groups layout starts a new part file
+        compression (str): the parquet compression codec
+        use_dictionary (bool): if dictionary encoding is used
+        column_encoding (Optional[Dict[str, str]]): the parquet encoding per column, such as BYTE_STREAM_SPLIT
+    """
+    def __init__(self, static_path: str, num_intensity_bins: int, has_intensity_uncertainty: bool = True,
+                 layout: str = "partitioned", row_group_size: int = 1_000_000, max_rows_per_file: int = 50_000_000,
+                 compression: str = "snappy", use_dictionary: bool = True,
+                 column_encoding: Optional[Dict[str, str]] = None) -> None:
+        """
+        The constructor of the ParquetFootprintWriter.
+
+        :param static_path: (str) the path to the folder the footprint is written to
+        :param num_intensity_bins: (int) the number of intensity bins written to the meta data
+        :param has_intensity_uncertainty: (bool) the intensity uncertainty flag written to the meta data
+        :param layout: (str) either partitioned or row_groups
+        :param row_group_size: (int) the rows per row group
+        :param max_rows_per_file: (int) the number of rows after which the row_groups layout starts a new part file
+        :param compression: (str) the parquet compression codec
+        :param use_dictionary: (bool) if dictionary encoding is used
+        :param column_encoding: (Optional[Dict[str, str]]) the parquet encoding per column
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        if layout not in PARQUET_LAYOUTS:
+            raise ValueError(f"{layout} is not one of the parquet layouts {PARQUET_LAYOUTS}")
+
+        self._pa = pa
+        self._pq = pq
+        self.static_path: str = static_path
+        self.layout: str = layout
+        self.row_group_size: int = row_group_size
+        self.max_rows_per_file: int = max_rows_per_file
+        self.compression: str = compression
+        self.use_dictionary: bool = use_dictionary
+        self.column_encoding: Optional[Dict[str, str]] = column_encoding
+        self._directory: str = os.path.join(static_path, PARQUET_DIRECTORY)
+        self._buffer: List[Tuple[int, np.ndarray]] = []
+        self._buffered_rows: int = 0
+        self._writer = None
+        self._file_rows: int = 0
+        self._file_number: int = 0
+        self._closed: bool = False
+
+        if os.path.isdir(self._directory):
+            shutil.rmtree(self._directory)
+        os.makedirs(self._directory)
+        with open(os.path.join(static_path, PARQUET_META_FILE), "w") as file:
+            json.dump({
+                "num_intensity_bins": num_intensity_bins,
+                "has_intensity_uncertainty": int(has_intensity_uncertainty),
+                "layout": layout
+            }, file)
+
+    def __enter__(self) -> "ParquetFootprintWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    def _to_table(self, records: np.ndarray, event_ids: Optional[np.ndarray] = None):
+        """
+        Converts records into an arrow table.
+
+        :param records: (np.ndarray) the EventRecord array to convert
+        :param event_ids: (Optional[np.ndarray]) the event ID of every record, left out of the table if None
+        :return: (pyarrow.Table) the table of the records
+        """
+        columns = dict()
+        if event_ids is not None:
+            columns["event_id"] = self._pa.array(event_ids, type=self._pa.int32())
+        for name in EventRecord.names:
+            columns[name] = self._pa.array(np.ascontiguousarray(records[name]))
+        return self._pa.table(columns)
+
+    def _write_options(self) -> dict:
+        options = dict(compression=self.compression, use_dictionary=self.use_dictionary)
+        if self.column_encoding is not None:
+            options["column_encoding"] = self.column_encoding
+        return options
+
+    def write_event(self, event_id: int, records: np.ndarray) -> None:
+        """
+        Appends an event to the footprint.
+
+        :param event_id: (int) the ID of the event
+        :param records: (np.ndarray) the EventRecord array of the event
+        :return: None
+        """
+        if self.layout == "partitioned":
+            partition_path: str = os.path.join(self._directory, f"event_id={event_id}")
+            os.makedirs(partition_path, exist_ok=True)
+            self._pq.write_table(self._to_table(records), os.path.join(partition_path, "part-0.parquet"),
+                                 row_group_size=self.row_group_size, **self._write_options())
+            return
+
+        self._buffer.append((event_id, records))
+        self._buffered_rows += len(records)
+        if self._buffered_rows >= self.row_group_size:
+            self._flush_row_group()
+
+    def _flush_row_group(self) -> None:
+        """
+        Writes the buffered events as one row group, starting a new part file when the current one is full.
+
+        :return: None
+        """
+        if self._buffered_rows == 0:
+            return
+        event_ids: np.ndarray = np.concatenate([np.full(len(records), event_id, dtype=np.int32)
+                                                for event_id, records in self._buffer])
+        table = self._to_table(np.concatenate([records for _, records in self._buffer]), event_ids=event_ids)
+
+        if self._writer is None:
+            self._writer = self._pq.ParquetWriter(
+                os.path.join(self._directory, f"part-{self._file_number:05d}.parquet"), table.schema,
+                **self._write_options()
+            )
+        self._writer.write_table(table, row_group_size=max(len(table), 1))
+        self._file_rows += len(table)
+        self._buffer = []
+        self._buffered_rows = 0
+
+        if self._file_rows >= self.max_rows_per_file:
+            self._writer.close()
+            self._writer = None
+            self._file_rows = 0
+            self._file_number += 1
+
+    def close(self) -> None:
+        """
+        Writes any buffered events and closes the dataset.
+
+        :return: None
+        """
+        if self._closed is True:
+            return
+        self._flush_row_group()
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        self._closed = True
+
+
+def open_footprint_writer(static_path: str, file_format: str, num_intensity_bins: int,
+                          has_intensity_uncertainty: bool = True, **options):
+    """
+    Opens a writer for a footprint format.
+
+    :param static_path: (str) the path to the folder the footprint is written to
+    :param file_format: (str) one of bin, bin.z, csv or parquet
+    :param num_intensity_bins: (int) the number of intensity bins
+    :param has_intensity_uncertainty: (bool) the intensity uncertainty flag
+    :param options: the parquet layout and encoding options or the bin.z compression_level
+    :return: the writer with write_event and close methods
+    """
+    if file_format == "bin":
+        return BinFootprintWriter(static_path, num_intensity_bins, has_intensity_uncertainty)
+    if file_format == "bin.z":
+        return BinFootprintWriter(static_path, num_intensity_bins, has_intensity_uncertainty, compressed=True,
+                                  compression_level=options.get("compression_level", -1))
+    if file_format == "csv":
+        return CsvFootprintWriter(static_path)
+    if file_format == "parquet":
+        return ParquetFootprintWriter(static_path, num_intensity_bins, has_intensity_uncertainty, **options)
+    raise ValueError(f"{file_format} is not one of the footprint formats {FOOTPRINT_FORMATS}")
+
+
+def read_footprint_settings(static_path: str, file_format: str) -> Optional[Tuple[int, bool]]:
+    """
+    Reads the number of intensity bins and the intensity uncertainty flag of a footprint.
+
+    :param static_path: (str) the path to the folder the footprint is housed in
+    :param file_format: (str) one of bin, bin.z, csv or parquet
+    :return: (Optional[Tuple[int, bool]]) the settings, None for csv footprints which do not store them
+    """
+    if file_format in ("bin", "bin.z"):
+        with FootprintReader(static_path, compressed=file_format == "bin.z") as reader:
+            return reader.num_intensity_bins, reader.has_intensity_uncertainty
+    if file_format == "parquet":
+        with open(os.path.join(static_path, PARQUET_META_FILE), "r") as file:
+            meta_data: dict = json.load(file)
+        return int(meta_data["num_intensity_bins"]), bool(meta_data["has_intensity_uncertainty"]
+                                                          & INTENSITY_UNCERTAINTY_MASK)
+    return None
+
+
+def _group_events(chunks: Iterator[Tuple[np.ndarray, np.ndarray]]) -> Iterator[Tuple[int, np.ndarray]]:
+    """
+    Splits chunks of records into events, carrying an event that straddles two chunks over to the next chunk.
+
+    :param chunks: (Iterator[Tuple[np.ndarray, np.ndarray]]) the event ID of every record and the EventRecord array
+    :return: (Iterator[Tuple[int, np.ndarray]]) the ID and EventRecord array of each event in ascending event order
+    """
+    carry_ids: np.ndarray = np.empty(0, dtype=np.int32)
+    carry_records: np.ndarray = np.empty(0, dtype=EventRecord)
+    last_event_id: Optional[int] = None
+
+    for event_ids, records in chunks:
+        event_ids = np.concatenate((carry_ids, event_ids))
+        records = np.concatenate((carry_records, records))
+        if len(event_ids) == 0:
+            continue
+        starts: np.ndarray = np.concatenate(([0], np.flatnonzero(np.diff(event_ids)) + 1))
+        # the last event of the chunk may carry on into the next chunk
+        for start, end in zip(starts[:-1].tolist(), starts[1:].tolist()):
+            event_id: int = int(event_ids[start])
+            if last_event_id is not None and event_id <= last_event_id:
+                raise ValueError(f"footprint events must be in ascending event id order, found {event_id} "
+                                 f"after {last_event_id}")
+            last_event_id = event_id
+            yield event_id, records[start:end]
+        carry_ids = event_ids[starts[-1]:]
+        carry_records = records[starts[-1]:]
+
+    if len(carry_ids) > 0:
+        event_id = int(carry_ids[0])
+        if last_event_id is not None and event_id <= last_event_id:
+            raise ValueError(f"footprint events must be in ascending event id order, found {event_id} "
+                             f"after {last_event_id}")
+        yield event_id, carry_records
+
+
+def _to_records(areaperil_ids: np.ndarray, intensity_bin_ids: np.ndarray, probabilities: np.ndarray) -> np.ndarray:
+    records: np.ndarray = np.empty(len(areaperil_ids), dtype=EventRecord)
+    records["areaperil_id"] = areaperil_ids
+    records["intensity_bin_id"] = intensity_bin_ids
+    records["probability"] = probabilities
+    return records
+
+
+def _iter_csv_chunks(static_path: str, chunk_size: int) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    reader = pd.read_csv(os.path.join(static_path, "footprint.csv"), names=CSV_COLUMNS, header=0,
+                         skipinitialspace=True, chunksize=chunk_size,
+                         dtype={"event_id": np.int32, "areaperil_id": np.uint32, "intensity_bin_id": np.int32,
+                                "probability": np.float32})
+    for chunk in reader:
+        yield chunk["event_id"].to_numpy(), _to_records(chunk["areaperil_id"].to_numpy(),
+                                                        chunk["intensity_bin_id"].to_numpy(),
+                                                        chunk["probability"].to_numpy())
+
+
+def _iter_parquet_events(static_path: str, chunk_size: int) -> Iterator[Tuple[int, np.ndarray]]:
+    import pyarrow.parquet as pq
+    directory: str = os.path.join(static_path, PARQUET_DIRECTORY)
+    partitions: List[Tuple[int, str]] = []
+    part_files: List[str] = []
+    for entry in os.scandir(directory):
+        if entry.is_dir() and entry.name.startswith("event_id="):
+            partitions.append((int(entry.name.split("=", 1)[1]), entry.path))
+        elif entry.is_file() and entry.name.endswith(".parquet"):
+            part_files.append(entry.path)
+
+    for event_id, partition_path in sorted(partitions):
+        table = pq.read_table(partition_path, columns=list(EventRecord.names))
+        yield event_id, _to_records(table.column("areaperil_id").to_numpy(),
+                                    table.column("intensity_bin_id").to_numpy(),
+                                    table.column("probability").to_numpy())
+
+    def iter_chunks() -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        for part_file in sorted(part_files):
+            for batch in pq.ParquetFile(part_file).iter_batches(batch_size=chunk_size):
+                yield batch.column("event_id").to_numpy(), _to_records(batch.column("areaperil_id").to_numpy(),
+                                                                       batch.column("intensity_bin_id").to_numpy(),
+                                                                       batch.column("probability").to_numpy())
+
+    yield from _group_events(iter_chunks())
+
+
+def iter_footprint_events(static_path: str, file_format: str,
+                          chunk_size: int = 1_000_000) -> Iterator[Tuple[int, np.ndarray]]:
+    """
+    Streams the events of a footprint in ascending event id order. csv and row grouped parquet footprints have to be
+    written in ascending event id order, as ktools and the ParquetFootprintWriter do.
+
+    :param static_path: (str) the path to the folder the footprint is housed in
+    :param file_format: (str) one of bin, bin.z, csv or parquet
+    :param chunk_size: (int) the number of rows read at a time from csv and row grouped parquet footprints
+    :return: (Iterator[Tuple[int, np.ndarray]]) the ID and EventRecord array of each event
+    """
+    if file_format in ("bin", "bin.z"):
+        with FootprintReader(static_path, compressed=file_format == "bin.z", cache_size=0) as reader:
+            yield from reader.iter_events()
+    elif file_format == "csv":
+        yield from _group_events(_iter_csv_chunks(static_path=static_path, chunk_size=chunk_size))
+    elif file_format == "parquet":
+        yield from _iter_parquet_events(static_path=static_path, chunk_size=chunk_size)
+    else:
+        raise ValueError(f"{file_format} is not one of the footprint formats {FOOTPRINT_FORMATS}")
+
+
+def verify_footprints(first_path: str, first_format: str, second_path: str, second_format: str) -> int:
+    """
+    Checks that two footprints hold bit identical events by streaming both in ascending event id order. Footprints
+    whose headers hold different settings are not compared and raise a ValueError.
+
+    :param first_path: (str) the path to the folder the first footprint is housed in
+    :param first_format: (str) the format of the first footprint
+    :param second_path: (str) the path to the folder the second footprint is housed in
+    :param second_format: (str) the format of the second footprint
+    :return: (int) the number of events that differ or are only in one of the footprints
+    """
+    first_settings = read_footprint_settings(first_path, first_format)
+    second_settings = read_footprint_settings(second_path, second_format)
+    # the events are read with the settings of their header so footprints with different headers are never identical
+    if first_settings is not None and second_settings is not None and first_settings != second_settings:
+        raise ValueError(f"the settings of the {first_format} and {second_format} footprints differ: "
+                         f"{first_settings} and {second_settings}")
+
+    first_events = iter_footprint_events(first_path, first_format)
+    second_events = iter_footprint_events(second_path, second_format)
+    first = next(first_events, None)
+    second = next(second_events, None)
+    differences: int = 0
+
+    while first is not None or second is not None:
+        if second is None or (first is not None and first[0] < second[0]):
+            differences += 1
+            first = next(first_events, None)
+        elif first is None or second[0] < first[0]:
+            differences += 1
+            second = next(second_events, None)
+        else:
+            if first[1].tobytes() != second[1].tobytes():
+                differences += 1
+            first = next(first_events, None)
+            second = next(second_events, None)
+    return differences
+
+
+def convert_footprint(source_path: str, source_format: str, target_path: str, target_format: str,
+                      num_intensity_bins: Optional[int] = None, has_intensity_uncertainty: Optional[bool] = None,
+                      verify: bool = True, **options) -> int:
+    """
+    Converts a footprint from one format to another, one event at a time.
+
+    :param source_path: (str) the path to the folder the source footprint is housed in
+    :param source_format: (str) one of bin, bin.z, csv or parquet
+    :param target_path: (str) the path to the folder the converted footprint is written to
+    :param target_format: (str) one of bin, bin.z, csv or parquet
+    :param num_intensity_bins: (Optional[int]) the number of intensity bins, read from the source if None
+    :param has_intensity_uncertainty: (Optional[bool]) the intensity uncertainty flag, read from the source if None
+    :param verify: (bool) if set to True the converted footprint is read back and compared to the source
+    :param options: the parquet layout and encoding options or the bin.z compression_level
+    :return: (int) the number of events converted
+    """
+    settings: Optional[Tuple[int, bool]] = read_footprint_settings(source_path, source_format)
+    if settings is not None:
+        num_intensity_bins = settings[0] if num_intensity_bins is None else num_intensity_bins
+        has_intensity_uncertainty = settings[1] if has_intensity_uncertainty is None else has_intensity_uncertainty
+    if num_intensity_bins is None:
+        raise ValueError(f"the number of intensity bins has to be supplied for {source_format} footprints")
+    has_intensity_uncertainty = True if has_intensity_uncertainty is None else has_intensity_uncertainty
+    # the writer truncates its files when it is opened so the source would be gone before it was read
+    if source_format == target_format and os.path.realpath(source_path) == os.path.realpath(target_path):
+        raise ValueError(f"the {source_format} footprint in {source_path} cannot be converted onto itself")
+
+    os.makedirs(target_path, exist_ok=True)
+    events: int = 0
+    with open_footprint_writer(target_path, target_format, num_intensity_bins, has_intensity_uncertainty,
+                               **options) as writer:
+        for event_id, records in iter_footprint_events(source_path, source_format):
+            writer.write_event(event_id, records)
+            events += 1
+
+    if verify is True:
+        differences: int = verify_footprints(source_path, source_format, target_path, target_format)
+        if differences > 0:
+            raise ValueError(f"{differences} events differ between the {source_format} and {target_format} footprints")
+    return events
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="converts a footprint between the bin, bin.z, csv and parquet formats")
+    parser.add_argument("source_format", choices=FOOTPRINT_FORMATS, help="the format of the source footprint")
+    parser.add_argument("target_format", choices=FOOTPRINT_FORMATS, help="the format to convert the footprint to")
+    parser.add_argument("--static-path", default="./static/", help="the directory housing the source footprint")
+    parser.add_argument("--target-path", required=True, help="the directory the converted footprint is written to")
+    parser.add_argument("--intensity-bins", type=int, default=None, help="the number of intensity bins for csv input")
+    parser.add_argument("--layout", choices=PARQUET_LAYOUTS, default="partitioned", help="the parquet layout")
+    parser.add_argument("--row-group-size", type=int, default=1_000_000, help="the maximum rows in a row group")
+    parser.add_argument("--compression", default="snappy", help="the parquet compression codec")
+    parser.add_argument("--no-dictionary", action="store_true", help="disables parquet dictionary encoding")
+    parser.add_argument("--no-verify", action="store_true", help="skips reading the converted footprint back")
+    args = parser.parse_args()
+
+    writer_options = dict()
+    if args.target_format == "parquet":
+        writer_options = dict(layout=args.layout, row_group_size=args.row_group_size, compression=args.compression,
+                              use_dictionary=not args.no_dictionary)
+    converted: int = convert_footprint(
+        source_path=args.static_path, source_format=args.source_format,
+        target_path=args.target_path,
+        target_format=args.target_format, num_intensity_bins=args.intensity_bins, verify=not args.no_verify,
+        **writer_options
+    )
+    print(f"converted {converted} events from {args.source_format} to {args.target_format}")
@@ -0,0 +1,60 @@
+"""
+This file defines the binary layout of the ktools footprint files so they can be read and written without the ktools
+binaries.
+
+footprint.bin starts with an 8 byte header (number of intensity bins, options) followed by the event records.
+footprint.idx holds one FootprintIndex entry per event pointing at its records in footprint.bin. The compressed
+footprint.bin.z has the same header followed by one zlib block per event, and footprint.idx.z holds one
+ZFootprintIndex entry per event which also carries the decompressed size of the block.
+"""
+from typing import Tuple
+
+import numpy as np
+
+FOOTPRINT_HEADER_SIZE: int = 8
+
+# bit flags stored in the second integer of the footprint header
+INTENSITY_UNCERTAINTY_MASK: int = 1
+UNCOMPRESSED_SIZE_MASK: int = 1 << 1
+
+EventRecord = np.dtype([("areaperil_id", "<u4"), ("intensity_bin_id", "<i4"), ("probability", "<f4")])
+FootprintIndex = np.dtype([("event_id", "<i4"), ("offset", "<i8"), ("size", "<i8")])
+ZFootprintIndex = np.dtype([("event_id", "<i4"), ("offset", "<i8"), ("size", "<i8"), ("d_size", "<i8")])
+
+
+def read_footprint_header(bin_path: str) -> Tuple[int, int]:
+    """
+    Reads the header of a footprint.bin or footprint.bin.z file.
+
+    :param bin_path: (str) the path to the footprint binary file
+    :return: (Tuple[int, int]) the number of intensity bins and the header options
+    """
+    with open(bin_path, "rb") as file:
+        header: bytes = file.read(FOOTPRINT_HEADER_SIZE)
+    if len(header) != FOOTPRINT_HEADER_SIZE:
+        raise ValueError(f"{bin_path} is too small to hold a footprint header")
+    num_intensity_bins, options = np.frombuffer(header, dtype="<i4").tolist()
+    return num_intensity_bins, options
+
+
+def pack_footprint_header(num_intensity_bins: int, options: int) -> bytes:
+    """
+    Packs the header written at the start of a footprint.bin or footprint.bin.z file.
+
+    :param num_intensity_bins: (int) the number of intensity bins
+    :param options: (int) the header options (see INTENSITY_UNCERTAINTY_MASK and UNCOMPRESSED_SIZE_MASK)
+    :return: (bytes) the packed header
+    """
+    return np.array([num_intensity_bins, options], dtype="<i4").tobytes()
+
+
+def load_footprint_index(idx_path: str, compressed: bool = False) -> np.ndarray:
+    """
+    Loads a footprint index file into a structured array.
+
+    :param idx_path: (str) the path to footprint.idx or footprint.idx.z
+    :param compressed: (bool) if set to True the index is read as a footprint.idx.z file
+    :return: (np.ndarray) the index entries in file order
+    """
+    dtype: np.dtype = ZFootprintIndex if compressed is True else FootprintIndex
+    return np.fromfile(idx_path, dtype=dtype)
@@ -0,0 +1,198 @@
+"""
+This file reads footprint files directly so footprints can be inspected without the ktools binaries.
+"""
+import mmap
+import os
+import zlib
+from collections import OrderedDict
+from typing import Iterator, Optional, Tuple
+
+import numpy as np
+
+from data.footprint_format import INTENSITY_UNCERTAINTY_MASK, EventRecord, FootprintIndex, ZFootprintIndex
+
+
+class FootprintReader:
+    """
+    This class is responsible for reading events from a footprint.bin or footprint.bin.z file through its index.
+
+    The footprint and its index are memory mapped. Event ids are resolved to byte ranges with a binary search over the
+    index sorted by event id. Events of an uncompressed footprint are returned as read only views of the memory map
+    so nothing is copied. Events of a compressed footprint are decompressed and kept in an LRU cache bounded by a byte
+    budget.
+
+    Attributes:
+        static_path (str): the path to the static folder where the footprint files are housed
+        compressed (bool): True if footprint.bin.z and footprint.idx.z are read
+        cache_size (int): the maximum number of decompressed bytes held in the cache
+        num_intensity_bins (int): the number of intensity bins from the footprint header
+        has_intensity_uncertainty (bool): the intensity uncertainty flag from the footprint header
+        cache_hits (int): the number of compressed events served from the cache
+        cache_misses (int): the number of compressed events that had to be decompressed
+    """
+    def __init__(self, static_path: str, compressed: Optional[bool] = None,
+                 cache_size: int = 256 * 1024 * 1024) -> None:
+        """
+        The constructor of the FootprintReader.
+
+        :param static_path: (str) the path to the static folder where the footprint files are housed
+        :param compressed: (Optional[bool]) reads the .z files if True, if None the .z files are read only when there
+                           is no footprint.bin
+        :param cache_size: (int) the maximum number of decompressed bytes held in the cache
+        """
+        self.static_path: str = static_path
+        if compressed is None:
+            compressed = not os.path.isfile(os.path.join(static_path, "footprint.bin"))
+        self.compressed: bool = compressed
+        self.cache_size: int = cache_size
+        self.cache_hits: int = 0
+        self.cache_misses: int = 0
+        self._cache: "OrderedDict[int, np.ndarray]" = OrderedDict()
+        self._cached_bytes: int = 0
+
+        suffix: str = ".z" if compressed is True else ""
+        with open(os.path.join(static_path, f"footprint.bin{suffix}"), "rb") as file:
+            self._footprint: mmap.mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        num_intensity_bins, options = np.frombuffer(self._footprint, dtype="<i4", count=2).tolist()
+        self.num_intensity_bins: int = num_intensity_bins
+        self.has_intensity_uncertainty: bool = bool(options & INTENSITY_UNCERTAINTY_MASK)
+
+        self._index: np.ndarray = self._load_index(os.path.join(static_path, f"footprint.idx{suffix}"))
+        self._event_ids: np.ndarray = self._index["event_id"]
+
+    def _load_index(self, idx_path: str) -> np.ndarray:
+        """
+        Memory maps the footprint index and makes sure it is sorted by event id for the binary search.
+
+        :param idx_path: (str) the path to the footprint index file
+        :return: (np.ndarray) the index entries sorted by event id
+        """
+        dtype: np.dtype = ZFootprintIndex if self.compressed is True else FootprintIndex
+        if os.path.getsize(idx_path) == 0:
+            return np.empty(0, dtype=dtype)
+        index: np.ndarray = np.memmap(idx_path, dtype=dtype, mode="r")
+        # the index is normally written in event order, only fall back to a sorted copy when it is not
+        if np.any(np.diff(index["event_id"]) <= 0):
+            index = index[np.argsort(index["event_id"], kind="stable")]
+        return index
+
+    def __enter__(self) -> "FootprintReader":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, event_id: int) -> bool:
+        return self._find(event_id) is not None
+
+    def close(self) -> None:
+        """
+        Releases the cache, the index and the memory map of the footprint. If arrays returned by get_event are still
+        referenced the memory map is left for the garbage collector to close once they are gone.
+
+        :return: None
+        """
+        self._cache.clear()
+        self._cached_bytes = 0
+        self._index = self._index[:0]
+        self._event_ids = self._index["event_id"]
+        try:
+            self._footprint.close()
+        except BufferError:
+            pass
+
+    @property
+    def event_ids(self) -> np.ndarray:
+        return self._event_ids
+
+    @property
+    def index(self) -> np.ndarray:
+        return self._index
+
+    def _find(self, event_id: int) -> Optional[int]:
+        """
+        Finds the position of an event in the sorted index.
+
+        :param event_id: (int) the ID of the event
+        :return: (Optional[int]) the position of the event in the index, None if the event is not in the footprint
+        """
+        position: int = int(np.searchsorted(self._event_ids, event_id))
+        if position < len(self._event_ids) and self._event_ids[position] == event_id:
+            return position
+        return None
+
+    def event_byte_range(self, event_id: int) -> Optional[Tuple[int, int]]:
+        """
+        Gets where the event is stored in the footprint file.
+
+        :param event_id: (int) the ID of the event
+        :return: (Optional[Tuple[int, int]]) the offset and size of the event in bytes, None if it is not present
+        """
+        position: Optional[int] = self._find(event_id)
+        if position is None:
+            return None
+        entry = self._index[position]
+        return int(entry["offset"]), int(entry["size"])
+
+    def get_event(self, event_id: int) -> Optional[np.ndarray]:
+        """
+        Gets the records of an event.
+
+        :param event_id: (int) the ID of the event
+        :return: (Optional[np.ndarray]) the read only EventRecord array of the event, None if it is not present
+        """
+        position: Optional[int] = self._find(event_id)
+        if position is None:
+            return None
+        if self.compressed is False:
+            entry = self._index[position]
+            return np.frombuffer(self._footprint, dtype=EventRecord, count=int(entry["size"]) // EventRecord.itemsize,
+                                 offset=int(entry["offset"]))
+        return self._get_compressed_event(position=position)
+
+    def _get_compressed_event(self, position: int) -> np.ndarray:
+        """
+        Gets the records of a compressed event through the LRU cache.
+
+        :param position: (int) the position of the event in the index
+        :return: (np.ndarray) the read only EventRecord array of the event
+        """
+        event_id: int = int(self._event_ids[position])
+        records: Optional[np.ndarray] = self._cache.get(event_id)
+        if records is not None:
+            self._cache.move_to_end(event_id)
+            self.cache_hits += 1
+            return records
+
+        self.cache_misses += 1
+        entry = self._index[position]
+        offset: int = int(entry["offset"])
+        data: bytes = zlib.decompress(self._footprint[offset: offset + int(entry["size"])])
+        records = np.frombuffer(data, dtype=EventRecord)
+
+        if records.nbytes <= self.cache_size:
+            self._cache[event_id] = records
+            self._cached_bytes += records.nbytes
+            while self._cached_bytes > self.cache_size:
+                _, evicted = self._cache.popitem(last=False)
+                self._cached_bytes -= evicted.nbytes
+        return records
+
+    def iter_events(self) -> Iterator[Tuple[int, np.ndarray]]:
+        """
+        Iterates through the events in event id order. Compressed events read this way bypass the cache so a full scan
+        does not evict the events that are being reused.
+
+        :return: (Iterator[Tuple[int, np.ndarray]]) the ID and read only EventRecord array of each event
+        """
+        for event_id, offset, size in zip(self._event_ids.tolist(), self._index["offset"].tolist(),
+                                          self._index["size"].tolist()):
+            if self.compressed is False:
+                yield event_id, np.frombuffer(self._footprint, dtype=EventRecord,
+                                              count=size // EventRecord.itemsize, offset=offset)
+            else:
+                yield event_id, np.frombuffer(zlib.decompress(self._footprint[offset: offset + size]),
+                                              dtype=EventRecord)
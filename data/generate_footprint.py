@@ -0,0 +1,209 @@
+"""
+This file generates synthetic footprints so the footprint benchmarks can run without a real model's static directory.
+Events are generated in fixed size blocks, each seeded from the footprint seed and its block number, and streamed
+straight to the footprint writers, so footprints of any size can be generated with little memory and repeated exactly.
+It is run as a module from the root of the repo:
+
+    python -m data.generate_footprint --static-path ./static/ --target-gb 2
+"""
+import argparse
+import math
+import os
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from data.footprint_converter import FOOTPRINT_FORMATS, PARQUET_LAYOUTS, open_footprint_writer
+from data.footprint_format import EventRecord
+
+PROBABILITY_SHAPES: Tuple[str, ...] = ("uniform", "triangular", "random")
+
+
+class FootprintGenerator:
+    """
+    This class is responsible for generating a seeded synthetic footprint.
+
+    Every event hits a contiguous run of areaperils starting at a random areaperil. The number of areaperils an event
+    hits is lognormal so a few events are far larger than the rest, like real footprints. Each areaperil has
+    bins_per_areaperil intensity bins centred on a random bin with probabilities following probability_shape.
+
+    Attributes:
+        num_events (int): the number of events in the footprint
+        num_areaperils (int): the number of areaperils events are spread over
+        mean_areaperils (float): the mean number of areaperils an event hits
+        areaperil_sigma (float): the sigma of the lognormal number of areaperils an event hits, 0 for no skew
+        num_intensity_bins (int): the number of intensity bins
+        bins_per_areaperil (int): the number of intensity bins with a probability for each areaperil
+        probability_shape (str): how the probability is spread over the bins of an areaperil
+        seed (int): the seed the whole footprint is generated from
+        block_size (int): the number of events generated from one random stream
+    """
+    def __init__(self, num_events: int, num_areaperils: int = 1_000_000, mean_areaperils: float = 1000.0,
+                 areaperil_sigma: float = 1.0, num_intensity_bins: int = 50, bins_per_areaperil: int = 5,
+                 probability_shape: str = "triangular", seed: int = 0, block_size: int = 1000) -> None:
+        """
+        The constructor of the FootprintGenerator.
+
+        :param num_events: (int) the number of events in the footprint
+        :param num_areaperils: (int) the number of areaperils events are spread over
+        :param mean_areaperils: (float) the mean number of areaperils an event hits
+        :param areaperil_sigma: (float) the sigma of the lognormal number of areaperils an event hits, 0 for no skew
+        :param num_intensity_bins: (int) the number of intensity bins
+        :param bins_per_areaperil: (int) the number of intensity bins with a probability for each areaperil
+        :param probability_shape: (str) one of uniform, triangular or random
+        :param seed: (int) the seed the whole footprint is generated from
+        :param block_size: (int) the number of events generated from one random stream, changing it changes the events
+        """
+        if probability_shape not in PROBABILITY_SHAPES:
+            raise ValueError(f"{probability_shape} is not one of the probability shapes {PROBABILITY_SHAPES}")
+        if bins_per_areaperil > num_intensity_bins:
+            raise ValueError(f"{bins_per_areaperil} bins per areaperil is more than {num_intensity_bins} bins")
+        self.num_events: int = num_events
+        self.num_areaperils: int = num_areaperils
+        self.mean_areaperils: float = mean_areaperils
+        self.areaperil_sigma: float = areaperil_sigma
+        self.num_intensity_bins: int = num_intensity_bins
+        self.bins_per_areaperil: int = bins_per_areaperil
+        self.probability_shape: str = probability_shape
+        self.seed: int = seed
+        self.block_size: int = block_size
+
+    @classmethod
+    def events_for_size(cls, target_bytes: int, mean_areaperils: float, bins_per_areaperil: int) -> int:
+        """
+        Works out the number of events that gives an uncompressed footprint.bin of roughly the target size.
+
+        :param target_bytes: (int) the size of footprint.bin wanted
+        :param mean_areaperils: (float) the mean number of areaperils an event hits
+        :param bins_per_areaperil: (int) the number of intensity bins with a probability for each areaperil
+        :return: (int) the number of events
+        """
+        return max(1, math.ceil(target_bytes / (mean_areaperils * bins_per_areaperil * EventRecord.itemsize)))
+
+    @property
+    def has_intensity_uncertainty(self) -> bool:
+        return self.bins_per_areaperil > 1
+
+    def _bin_probabilities(self, rng: np.random.Generator, num_areaperils: int) -> np.ndarray:
+        """
+        Builds the probabilities of the bins of each areaperil, each row summing to one.
+
+        :param rng: (np.random.Generator) the random stream of the block
+        :param num_areaperils: (int) the number of areaperils in the event
+        :return: (np.ndarray) a num_areaperils by bins_per_areaperil array of probabilities
+        """
+        bins: int = self.bins_per_areaperil
+        if self.probability_shape == "uniform":
+            weights: np.ndarray = np.ones((num_areaperils, bins))
+        elif self.probability_shape == "triangular":
+            weights = np.broadcast_to(bins / 2 + 0.5 - np.abs(np.arange(bins) - (bins - 1) / 2),
+                                      (num_areaperils, bins))
+        else:
+            weights = rng.gamma(shape=1.0, size=(num_areaperils, bins))
+        return (weights / weights.sum(axis=1, keepdims=True)).astype(np.float32)
+
+    def generate_event(self, rng: np.random.Generator) -> np.ndarray:
+        """
+        Generates the records of one event sorted by areaperil and intensity bin.
+
+        :param rng: (np.random.Generator) the random stream of the block the event is in
+        :return: (np.ndarray) the EventRecord array of the event
+        """
+        sigma: float = self.areaperil_sigma
+        mean_log: float = math.log(self.mean_areaperils) - sigma ** 2 / 2
+        num_areaperils: int = int(min(self.num_areaperils, max(1, round(rng.lognormal(mean_log, sigma)))))
+        first_areaperil: int = int(rng.integers(1, self.num_areaperils - num_areaperils + 2))
+
+        bins: int = self.bins_per_areaperil
+        centres: np.ndarray = rng.integers(1, self.num_intensity_bins + 1, size=num_areaperils)
+        # the bins of an areaperil are consecutive and shifted to fit between 1 and num_intensity_bins
+        first_bins: np.ndarray = np.clip(centres - bins // 2, 1, self.num_intensity_bins - bins + 1)
+
+        records: np.ndarray = np.empty(num_areaperils * bins, dtype=EventRecord)
+        records["areaperil_id"] = np.repeat(np.arange(first_areaperil, first_areaperil + num_areaperils), bins)
+        records["intensity_bin_id"] = (first_bins[:, None] + np.arange(bins)).ravel()
+        records["probability"] = self._bin_probabilities(rng=rng, num_areaperils=num_areaperils).ravel()
+        return records
+
+    def iter_events(self) -> Iterator[Tuple[int, np.ndarray]]:
+        """
+        Generates the events in event ID order.
+
+        :return: (Iterator[Tuple[int, np.ndarray]]) the event ID and EventRecord array of each event
+        """
+        for block in range(math.ceil(self.num_events / self.block_size)):
+            rng: np.random.Generator = np.random.default_rng(
+                np.random.SeedSequence(entropy=self.seed, spawn_key=(block,))
+            )
+            first_event: int = block * self.block_size + 1
+            for event_id in range(first_event, min(first_event + self.block_size, self.num_events + 1)):
+                yield event_id, self.generate_event(rng=rng)
+
+    def write(self, static_path: str, file_formats: Optional[List[str]] = None, compression_level: int = -1,
+              parquet_options: Optional[dict] = None) -> Dict[str, int]:
+        """
+        Streams the footprint to every format asked for in one pass.
+
+        :param static_path: (str) the path to the folder the footprint is written to
+        :param file_formats: (Optional[List[str]]) the formats written, just bin if None
+        :param compression_level: (int) the zlib compression level of the bin.z footprint
+        :param parquet_options: (Optional[dict]) the layout and encoding options of the parquet footprint
+        :return: (Dict[str, int]) the number of events and records written
+        """
+        file_formats = ["bin"] if file_formats is None else file_formats
+        os.makedirs(static_path, exist_ok=True)
+        writers: list = []
+        try:
+            for file_format in file_formats:
+                options: dict = {}
+                if file_format == "bin.z":
+                    options = dict(compression_level=compression_level)
+                elif file_format == "parquet":
+                    options = parquet_options if parquet_options is not None else {}
+                writers.append(open_footprint_writer(static_path, file_format, self.num_intensity_bins,
+                                                     self.has_intensity_uncertainty, **options))
+            events: int = 0
+            records: int = 0
+            for event_id, event_records in self.iter_events():
+                for writer in writers:
+                    writer.write_event(event_id, event_records)
+                events += 1
+                records += len(event_records)
+        finally:
+            for writer in writers:
+                writer.close()
+        return {"events": events, "records": records}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic footprint")
+    parser.add_argument("--static-path", default="./static/", help="the directory the footprint is written to")
+    size = parser.add_mutually_exclusive_group(required=True)
+    size.add_argument("--events", type=int, help="the number of events")
+    size.add_argument("--target-gb", type=float, help="the rough size of footprint.bin in gigabytes")
+    parser.add_argument("--areaperils", type=int, default=1_000_000, help="the number of areaperils")
+    parser.add_argument("--mean-areaperils", type=float, default=1000.0, help="the mean areaperils hit by an event")
+    parser.add_argument("--areaperil-sigma", type=float, default=1.0, help="the skew of the areaperils per event")
+    parser.add_argument("--intensity-bins", type=int, default=50, help="the number of intensity bins")
+    parser.add_argument("--bins-per-areaperil", type=int, default=5, help="the bins with a probability per areaperil")
+    parser.add_argument("--probability-shape", choices=PROBABILITY_SHAPES, default="triangular",
+                        help="how the probability is spread over the bins of an areaperil")
+    parser.add_argument("--seed", type=int, default=0, help="the seed the footprint is generated from")
+    parser.add_argument("--formats", nargs="+", choices=FOOTPRINT_FORMATS, default=["bin"], help="the formats written")
+    parser.add_argument("--compression-level", type=int, default=-1, help="the zlib level of the bin.z footprint")
+    parser.add_argument("--layout", choices=PARQUET_LAYOUTS, default="partitioned", help="the parquet layout")
+    args = parser.parse_args()
+
+    num_events: int = args.events if args.events is not None else FootprintGenerator.events_for_size(
+        target_bytes=int(args.target_gb * 1024 ** 3), mean_areaperils=args.mean_areaperils,
+        bins_per_areaperil=args.bins_per_areaperil
+    )
+    generator = FootprintGenerator(
+        num_events=num_events, num_areaperils=args.areaperils, mean_areaperils=args.mean_areaperils,
+        areaperil_sigma=args.areaperil_sigma, num_intensity_bins=args.intensity_bins,
+        bins_per_areaperil=args.bins_per_areaperil, probability_shape=args.probability_shape, seed=args.seed
+    )
+    written: Dict[str, int] = generator.write(static_path=args.static_path, file_formats=args.formats,
+                                              compression_level=args.compression_level,
+                                              parquet_options=dict(layout=args.layout))
+    print(f"wrote {written['events']} events and {written['records']} records as {', '.join(args.formats)}")
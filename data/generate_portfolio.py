@@ -0,0 +1,273 @@
+"""
+This file generates synthetic OED location and account files of any size. Locations are generated in fixed size blocks
+with NumPy, each block seeded from the portfolio seed and its block number, so the same seed always gives the same
+portfolio however it is written out, and portfolios of millions of locations are streamed to CSV or parquet in chunks.
+"""
+import argparse
+import math
+from typing import Dict, Iterator, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+LOCATION_COLUMNS: Tuple[str, ...] = (
+    "PortNumber", "AccNumber", "LocNumber", "LocName", "Latitude", "Longitude", "ConstructionCode", "BuildingTIV",
+    "OtherTIV", "ContentsTIV", "BITIV", "LocPerilsCovered", "LocCurrency", "CountryCode", "LocDed6All", "LocLimit6All"
+)
+ACCOUNT_COLUMNS: Tuple[str, ...] = (
+    "PortNumber", "AccNumber", "AccCurrency", "PolNumber", "PolPerilsCovered", "PolDed6All", "PolLimit6All"
+)
+# the bounding box of central Paris as (min latitude, min longitude, max latitude, max longitude)
+PARIS_BOUNDING_BOX: Tuple[float, float, float, float] = (48.815, 2.224, 48.902, 2.470)
+# spawn keys above any block number so removing locations never draws from the same stream as a block
+REMOVAL_SPAWN_KEY: int = 2 ** 32
+
+
+class PortfolioGenerator:
+    """
+    This class is responsible for generating a seeded synthetic OED portfolio.
+
+    Attributes:
+        num_locations (int): the number of locations in the portfolio
+        seed (int): the seed the whole portfolio is generated from
+        locations_per_account (int): the number of locations in each account
+        bounding_box (Tuple[float, float, float, float]): the min latitude, min longitude, max latitude and max
+                                                         longitude the locations are spread over
+        tiv_median (float): the median building TIV
+        tiv_sigma (float): the sigma of the lognormal building TIV distribution
+        contents_ratio (float): the contents TIV as a fraction of the building TIV
+        bi_ratio (float): the business interruption TIV as a fraction of the building TIV
+        construction_codes (Dict[int, float]): the OED construction codes and the share of locations using each one
+        deductibles (Dict[float, float]): the location deductibles and the share of locations with each one
+        limit_ratios (Dict[float, float]): the location limits as fractions of the building TIV, 0 for no limit, and
+                                           the share of locations with each one
+        block_size (int): the number of locations generated at a time
+    """
+    def __init__(self, num_locations: int, seed: int = 0, locations_per_account: int = 100,
+                 bounding_box: Tuple[float, float, float, float] = PARIS_BOUNDING_BOX,
+                 tiv_median: float = 1_000_000.0, tiv_sigma: float = 0.8, contents_ratio: float = 0.0,
+                 bi_ratio: float = 0.0, construction_codes: Optional[Dict[int, float]] = None,
+                 deductibles: Optional[Dict[float, float]] = None, limit_ratios: Optional[Dict[float, float]] = None,
+                 peril: str = "WTC", currency: str = "EUR", country: str = "FR", block_size: int = 100_000) -> None:
+        """
+        The constructor of the PortfolioGenerator.
+
+        :param num_locations: (int) the number of locations in the portfolio
+        :param seed: (int) the seed the whole portfolio is generated from
+        :param locations_per_account: (int) the number of locations in each account
+        :param bounding_box: (Tuple[float, float, float, float]) the area the locations are spread over
+        :param tiv_median: (float) the median building TIV
+        :param tiv_sigma: (float) the sigma of the lognormal building TIV distribution
+        :param contents_ratio: (float) the contents TIV as a fraction of the building TIV
+        :param bi_ratio: (float) the business interruption TIV as a fraction of the building TIV
+        :param construction_codes: (Optional[Dict[int, float]]) construction codes and their shares
+        :param deductibles: (Optional[Dict[float, float]]) location deductibles and their shares
+        :param limit_ratios: (Optional[Dict[float, float]]) limits as fractions of building TIV and their shares
+        :param peril: (str) the OED peril code covered by every location and policy
+        :param currency: (str) the currency of every location and account
+        :param country: (str) the country code of every location
+        :param block_size: (int) the number of locations generated at a time, changing it changes the portfolio
+        """
+        self.num_locations: int = num_locations
+        self.seed: int = seed
+        self.locations_per_account: int = locations_per_account
+        self.bounding_box: Tuple[float, float, float, float] = bounding_box
+        self.tiv_median: float = tiv_median
+        self.tiv_sigma: float = tiv_sigma
+        self.contents_ratio: float = contents_ratio
+        self.bi_ratio: float = bi_ratio
+        self.construction_codes: Dict[int, float] = construction_codes if construction_codes is not None \
+            else {5050: 0.3, 5100: 0.3, 5150: 0.4}
+        self.deductibles: Dict[float, float] = deductibles if deductibles is not None \
+            else {0.0: 0.4, 10_000.0: 0.4, 25_000.0: 0.2}
+        self.limit_ratios: Dict[float, float] = limit_ratios if limit_ratios is not None \
+            else {0.0: 0.5, 0.5: 0.3, 1.0: 0.2}
+        self.peril: str = peril
+        self.currency: str = currency
+        self.country: str = country
+        self.block_size: int = block_size
+
+    @property
+    def num_blocks(self) -> int:
+        return math.ceil(self.num_locations / self.block_size)
+
+    @property
+    def num_accounts(self) -> int:
+        return math.ceil(self.num_locations / self.locations_per_account)
+
+    def _rng(self, spawn_key: int) -> np.random.Generator:
+        return np.random.default_rng(np.random.SeedSequence(entropy=self.seed, spawn_key=(spawn_key,)))
+
+    @staticmethod
+    def _draw(rng: np.random.Generator, mix: Dict[float, float], size: int) -> np.ndarray:
+        values: np.ndarray = np.array(list(mix.keys()))
+        weights: np.ndarray = np.array(list(mix.values()), dtype=np.float64)
+        return values[rng.choice(len(values), size=size, p=weights / weights.sum())]
+
+    def generate_block(self, block: int) -> pd.DataFrame:
+        """
+        Generates one block of locations. A block only depends on the seed and its number.
+
+        :param block: (int) the number of the block starting from zero
+        :return: (pd.DataFrame) the locations of the block
+        """
+        start: int = block * self.block_size
+        size: int = min(self.block_size, self.num_locations - start)
+        rng: np.random.Generator = self._rng(spawn_key=block)
+        min_latitude, min_longitude, max_latitude, max_longitude = self.bounding_box
+
+        loc_numbers: np.ndarray = np.arange(start + 1, start + size + 1, dtype=np.int64)
+        building_tiv: np.ndarray = np.round(rng.lognormal(mean=math.log(self.tiv_median), sigma=self.tiv_sigma,
+                                                          size=size))
+        limits: np.ndarray = np.round(building_tiv * self._draw(rng, self.limit_ratios, size))
+        return pd.DataFrame({
+            "PortNumber": 1,
+            "AccNumber": (loc_numbers - 1) // self.locations_per_account + 1,
+            "LocNumber": loc_numbers,
+            "LocName": "Location " + pd.Series(loc_numbers).astype(str),
+            "Latitude": np.round(rng.uniform(min_latitude, max_latitude, size), 6),
+            "Longitude": np.round(rng.uniform(min_longitude, max_longitude, size), 6),
+            "ConstructionCode": self._draw(rng, self.construction_codes, size),
+            "BuildingTIV": building_tiv,
+            "OtherTIV": 0.0,
+            "ContentsTIV": np.round(building_tiv * self.contents_ratio),
+            "BITIV": np.round(building_tiv * self.bi_ratio),
+            "LocPerilsCovered": self.peril,
+            "LocCurrency": self.currency,
+            "CountryCode": self.country,
+            "LocDed6All": self._draw(rng, self.deductibles, size),
+            "LocLimit6All": limits
+        }, columns=list(LOCATION_COLUMNS))
+
+    def removed_locations(self, count: int) -> np.ndarray:
+        """
+        Picks the locations dropped from the portfolio for the reduced variant. The same seed and count always pick
+        the same locations.
+
+        :param count: (int) the number of locations to drop
+        :return: (np.ndarray) the sorted LocNumbers of the dropped locations
+        """
+        if count > self.num_locations:
+            raise ValueError(f"cannot remove {count} locations from a portfolio of {self.num_locations}")
+        rng: np.random.Generator = self._rng(spawn_key=REMOVAL_SPAWN_KEY)
+        return np.sort(rng.choice(self.num_locations, size=count, replace=False)) + 1
+
+    def iter_locations(self, remove: int = 0) -> Iterator[pd.DataFrame]:
+        """
+        Generates the locations a block at a time.
+
+        :param remove: (int) the number of locations dropped for the reduced variant of the portfolio
+        :return: (Iterator[pd.DataFrame]) the blocks of locations
+        """
+        removed: np.ndarray = self.removed_locations(count=remove)
+        for block in range(self.num_blocks):
+            locations: pd.DataFrame = self.generate_block(block=block)
+            if remove > 0:
+                locations = locations[~np.isin(locations["LocNumber"].to_numpy(), removed)]
+            yield locations
+
+    def generate_accounts(self) -> pd.DataFrame:
+        """
+        Generates the accounts with one policy each. Policies have no deductible or limit so the location terms
+        are the only financial terms.
+
+        :return: (pd.DataFrame) the accounts
+        """
+        acc_numbers: np.ndarray = np.arange(1, self.num_accounts + 1, dtype=np.int64)
+        return pd.DataFrame({
+            "PortNumber": 1,
+            "AccNumber": acc_numbers,
+            "AccCurrency": self.currency,
+            "PolNumber": acc_numbers,
+            "PolPerilsCovered": self.peril,
+            "PolDed6All": 0.0,
+            "PolLimit6All": 0.0
+        }, columns=list(ACCOUNT_COLUMNS))
+
+    def write_locations(self, path: str, remove: int = 0) -> int:
+        """
+        Streams the locations to a CSV file, or a parquet file if the path ends in .parquet.
+
+        :param path: (str) the path the location file is written to
+        :param remove: (int) the number of locations dropped for the reduced variant of the portfolio
+        :return: (int) the number of locations written
+        """
+        return write_frames(frames=self.iter_locations(remove=remove), path=path)
+
+    def write_accounts(self, path: str) -> int:
+        """
+        Writes the accounts to a CSV file, or a parquet file if the path ends in .parquet.
+
+        :param path: (str) the path the account file is written to
+        :return: (int) the number of accounts written
+        """
+        return write_frames(frames=iter([self.generate_accounts()]), path=path)
+
+
+def write_frames(frames: Iterator[pd.DataFrame], path: str) -> int:
+    """
+    Writes data frames one after another to a single CSV or parquet file.
+
+    :param frames: (Iterator[pd.DataFrame]) the frames written in order
+    :param path: (str) the path written to, parquet if it ends in .parquet and CSV otherwise
+    :return: (int) the number of rows written
+    """
+    rows: int = 0
+    if path.endswith(".parquet"):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        writer = None
+        try:
+            for frame in frames:
+                table = pa.Table.from_pandas(frame, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(path, table.schema)
+                writer.write_table(table)
+                rows += len(frame)
+        finally:
+            if writer is not None:
+                writer.close()
+        return rows
+
+    with open(path, "w", newline="") as file:
+        # counting rows is not enough to know if the header was written as a block can have all its rows removed
+        header: bool = True
+        for frame in frames:
+            frame.to_csv(file, index=False, header=header)
+            header = False
+            rows += len(frame)
+    return rows
+
+
+def _parse_mix(values: Optional[Sequence[str]]) -> Optional[Dict[float, float]]:
+    if values is None:
+        return None
+    return {float(value): float(weight) for value, weight in (item.split(":") for item in values)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic OED portfolio")
+    parser.add_argument("--num-locations", type=int, required=True, help="the number of locations")
+    parser.add_argument("--seed", type=int, default=0, help="the seed the portfolio is generated from")
+    parser.add_argument("--remove", type=int, default=0, help="the number of locations dropped from the portfolio")
+    parser.add_argument("--location-path", default="./location.csv", help="where the location file is written")
+    parser.add_argument("--account-path", default="./account.csv", help="where the account file is written")
+    parser.add_argument("--locations-per-account", type=int, default=100, help="the number of locations per account")
+    parser.add_argument("--bounding-box", type=float, nargs=4, default=list(PARIS_BOUNDING_BOX),
+                        metavar=("MIN_LAT", "MIN_LON", "MAX_LAT", "MAX_LON"), help="where the locations are")
+    parser.add_argument("--tiv-median", type=float, default=1_000_000.0, help="the median building TIV")
+    parser.add_argument("--tiv-sigma", type=float, default=0.8, help="the sigma of the lognormal building TIV")
+    parser.add_argument("--construction-codes", nargs="+", default=None, help="CODE:SHARE pairs")
+    parser.add_argument("--deductibles", nargs="+", default=None, help="DEDUCTIBLE:SHARE pairs")
+    parser.add_argument("--limit-ratios", nargs="+", default=None, help="FRACTION_OF_TIV:SHARE pairs, 0 for no limit")
+    args = parser.parse_args()
+
+    construction_codes: Optional[Dict[float, float]] = _parse_mix(args.construction_codes)
+    generator = PortfolioGenerator(
+        num_locations=args.num_locations, seed=args.seed, locations_per_account=args.locations_per_account,
+        bounding_box=tuple(args.bounding_box), tiv_median=args.tiv_median, tiv_sigma=args.tiv_sigma,
+        construction_codes=None if construction_codes is None else {int(k): v for k, v in construction_codes.items()},
+        deductibles=_parse_mix(args.deductibles), limit_ratios=_parse_mix(args.limit_ratios)
+    )
+    print(f"wrote {generator.write_locations(path=args.location_path, remove=args.remove)} locations")
+    print(f"wrote {generator.write_accounts(path=args.account_path)} accounts")
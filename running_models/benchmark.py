@@ -0,0 +1,681 @@
+"""
+This script is for declaring benchmark scenarios of model runs as data and running them with warm up runs, repeated
+runs and a randomised variant order, reporting the statistics of the timings in a JSON report. Scenarios should be run
+in the same directory as the model data.
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from running_models.benchmark_history import BenchmarkHistory
+from running_models.cpu_profile import diff_hot_functions, hot_functions, merge_profiles, print_profile_diff
+from running_models.data_server import DataServer
+from running_models.event_partitioner import partition_run
+from running_models.file_operations import ModelRunFileManager
+from running_models.memory_profiler import MemoryProfile, MemoryProfiler
+from running_models.output_tap import summarise_taps
+from running_models.page_cache import CACHE_STATES, list_files, set_cache_state
+from running_models.pipeline_launcher import PipelineLauncher, build_modelpy_commands
+
+FOOTPRINT_FILES: List[str] = [
+    "footprint.bin", "footprint.idx", "footprint.bin.z", "footprint.idx.z", "footprint.csv", "footprint.parquet"
+]
+
+
+class Variant:
+    """
+    This class is responsible for describing one way of running the model that is benchmarked against the others.
+
+    Attributes:
+        name (str): the name the variant is reported under
+        footprint_files (Optional[List[str]]): the footprint files left in the static directory, None leaves them all
+        modelpy_args (str): the arguments passed to modelpy
+        data_server (bool): if the modelpy processes are served their data by servedata
+        total_processes (int): the number of eve | modelpy pipelines the events are split across
+        partitioning (str): eve splits the events with eve, footprint balances them by footprint size
+        storage (str): disk runs on the static directory, ram runs on a copy of the variant's files staged in memory
+    """
+    def __init__(self, name: str, footprint_files: Optional[List[str]] = None, modelpy_args: str = "",
+                 data_server: bool = False, total_processes: int = 4, partitioning: str = "eve",
+                 storage: str = "disk") -> None:
+        """
+        The constructor of the Variant.
+
+        :param name: (str) the name the variant is reported under
+        :param footprint_files: (Optional[List[str]]) the footprint files left in the static directory, the others
+                                are stashed for the run, None leaves them all
+        :param modelpy_args: (str) the arguments passed to modelpy
+        :param data_server: (bool) if the modelpy processes are served their data by servedata
+        :param total_processes: (int) the number of eve | modelpy pipelines the events are split across
+        :param partitioning: (str) either eve or footprint, how the events are split across the pipelines
+        :param storage: (str) either disk or ram, where the static files the pipelines read are housed
+        """
+        if partitioning not in ("eve", "footprint"):
+            raise ValueError(f"{partitioning} is not eve or footprint")
+        if storage not in ("disk", "ram"):
+            raise ValueError(f"{storage} is not disk or ram")
+        self.name: str = name
+        self.footprint_files: Optional[List[str]] = footprint_files
+        self.modelpy_args: str = modelpy_args
+        self.data_server: bool = data_server
+        self.total_processes: int = total_processes
+        self.partitioning: str = partitioning
+        self.storage: str = storage
+
+    @property
+    def hidden_files(self) -> List[str]:
+        if self.footprint_files is None:
+            return []
+        return [file_name for file_name in FOOTPRINT_FILES if file_name not in self.footprint_files]
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "footprint_files": self.footprint_files,
+            "modelpy_args": self.modelpy_args,
+            "data_server": self.data_server,
+            "total_processes": self.total_processes,
+            "partitioning": self.partitioning,
+            "storage": self.storage
+        }
+
+
+class Scenario:
+    """
+    This class is responsible for describing a set of variants that are benchmarked against each other.
+
+    Attributes:
+        name (str): the name of the scenario
+        variants (List[Variant]): the variants being compared, the first one is the baseline
+        static_path (str): the path to the static folder where the data files are housed
+        repetitions (int): the number of measured runs of every variant
+        warmup (int): the number of unmeasured runs of every variant before the measured runs
+        shuffle (bool): if the order of the variants is randomised in every round of runs
+        seed (Optional[int]): the seed of the variant order and the bootstrap confidence intervals
+        profile_memory (bool): if the runs are profiled by the MemoryProfiler
+        report_path (Optional[str]): the path the JSON report is written to
+        isolation (str): overlay runs each variant in a throwaway run directory linking to its files, stash moves the
+                         files it should not see out of the static directory
+        overlay_link (str): either symlink or hardlink, how the files of an overlay are linked
+        timeout (Optional[float]): the number of seconds a run is given before its pipelines are killed
+        cancel_on_failure (bool): if a failed pipeline kills the other pipelines of its run
+        cache_states (List[str]): the page cache states every variant is run in, none leaves the cache alone, cold
+                                  evicts the footprint files before each run and warm reads them in before each run
+        staging_path (str): the RAM backed filesystem the files of ram variants are staged in
+        output_tap (Optional[str]): cdf or raw pipes the output of modelpy into an output tap that hashes and counts
+                                    it, None sends it to /dev/null
+        profile_cpu (bool): if every modelpy is run under cProfile, which slows the runs down
+        profile_path (str): the directory the merged cProfile stats of every run and variant are written to
+        server_startup_timeout (float): the seconds a data server is given to start listening before the run fails
+        history_path (Optional[str]): the SQLite benchmark history the report is recorded in, None records nothing
+    """
+    def __init__(self, name: str, variants: List[Variant], static_path: str = "./static/", repetitions: int = 5,
+                 warmup: int = 1, shuffle: bool = True, seed: Optional[int] = None, profile_memory: bool = True,
+                 report_path: Optional[str] = None, isolation: str = "overlay", overlay_link: str = "symlink",
+                 timeout: Optional[float] = None, cancel_on_failure: bool = True,
+                 cache_states: Optional[List[str]] = None, staging_path: str = "/dev/shm",
+                 output_tap: Optional[str] = None, profile_cpu: bool = False,
+                 profile_path: Optional[str] = None, server_startup_timeout: float = 60.0,
+                 history_path: Optional[str] = None) -> None:
+        """
+        The constructor of the Scenario.
+
+        :param name: (str) the name of the scenario
+        :param variants: (List[Variant]) the variants being compared, the first one is the baseline
+        :param static_path: (str) the path to the static folder where the data files are housed
+        :param repetitions: (int) the number of measured runs of every variant
+        :param warmup: (int) the number of unmeasured runs of every variant before the measured runs
+        :param shuffle: (bool) if the order of the variants is randomised in every round of runs
+        :param seed: (Optional[int]) the seed of the variant order and the bootstrap confidence intervals
+        :param profile_memory: (bool) if the runs are profiled by the MemoryProfiler
+        :param report_path: (Optional[str]) the path the JSON report is written to, defaults to <name>_report.json
+        :param isolation: (str) either overlay or stash, how a variant is limited to its footprint files
+        :param overlay_link: (str) either symlink or hardlink, how the files of an overlay are linked
+        :param timeout: (Optional[float]) the number of seconds a run is given, None waits forever
+        :param cancel_on_failure: (bool) if set to True a failed pipeline kills the other pipelines of its run
+        :param cache_states: (Optional[List[str]]) any of none, cold and warm, the page cache states every variant is
+                             run in, defaults to none
+        :param staging_path: (str) the RAM backed filesystem the files of ram variants are staged in
+        :param output_tap: (Optional[str]) either cdf, raw or None, how the output of modelpy is checked, cdf walks
+                           its records and gives a digest that does not depend on how the events were split, raw
+                           digests are only compared across variants that split the events the same way
+        :param profile_cpu: (bool) if set to True every modelpy is run under cProfile and the hot functions of every
+                            variant are reported and diffed against the baseline
+        :param profile_path: (Optional[str]) the directory the cProfile stats are written to, defaults to
+                             <name>_profiles
+        :param server_startup_timeout: (float) the seconds a data server is given to start listening
+        :param history_path: (Optional[str]) the SQLite benchmark history the report is recorded in
+        """
+        if isolation not in ("overlay", "stash"):
+            raise ValueError(f"{isolation} is not overlay or stash")
+        if output_tap not in (None, "cdf", "raw"):
+            raise ValueError(f"{output_tap} is not cdf, raw or None")
+        if len({variant.name for variant in variants}) != len(variants):
+            raise ValueError(f"the variant names of scenario {name} are not unique")
+        self.name: str = name
+        self.variants: List[Variant] = variants
+        self.static_path: str = static_path
+        self.repetitions: int = repetitions
+        self.warmup: int = warmup
+        self.shuffle: bool = shuffle
+        self.seed: Optional[int] = seed
+        self.profile_memory: bool = profile_memory
+        self.report_path: str = f"./{name}_report.json" if report_path is None else report_path
+        self.isolation: str = isolation
+        self.overlay_link: str = overlay_link
+        self.timeout: Optional[float] = timeout
+        self.cancel_on_failure: bool = cancel_on_failure
+        self.cache_states: List[str] = ["none"] if cache_states is None else cache_states
+        for cache_state in self.cache_states:
+            if cache_state not in CACHE_STATES:
+                raise ValueError(f"{cache_state} is not one of the cache states {CACHE_STATES}")
+        self.staging_path: str = staging_path
+        self.output_tap: Optional[str] = output_tap
+        self.profile_cpu: bool = profile_cpu
+        self.profile_path: str = f"./{name}_profiles/" if profile_path is None else profile_path
+        self.server_startup_timeout: float = server_startup_timeout
+        self.history_path: Optional[str] = history_path
+
+    @staticmethod
+    def label(variant: "Variant", cache_state: str) -> str:
+        return variant.name if cache_state == "none" else f"{variant.name}@{cache_state}"
+
+
+def summarise_timings(timings: List[float], confidence: float = 0.95, resamples: int = 10000,
+                      seed: Optional[int] = None) -> Dict[str, float]:
+    """
+    Works out the statistics of a set of timings, with bootstrap confidence intervals of the median and mean.
+
+    :param timings: (List[float]) the timings of the measured runs
+    :param confidence: (float) the confidence level of the intervals
+    :param resamples: (int) the number of bootstrap resamples
+    :param seed: (Optional[int]) the seed of the bootstrap
+    :return: (Dict[str, float]) the statistics of the timings
+    """
+    values: np.ndarray = np.asarray(timings, dtype=np.float64)
+    if len(values) == 0:
+        return {"runs": 0}
+    tail: float = (1 - confidence) / 2 * 100
+    samples: np.ndarray = np.random.default_rng(seed).choice(values, size=(resamples, len(values)), replace=True)
+    medians: np.ndarray = np.median(samples, axis=1)
+    means: np.ndarray = samples.mean(axis=1)
+    return {
+        "runs": len(values),
+        "median": float(np.median(values)),
+        "p95": float(np.percentile(values, 95)),
+        "mean": float(values.mean()),
+        "stdev": float(values.std(ddof=1)) if len(values) > 1 else 0.0,
+        "min": float(values.min()),
+        "max": float(values.max()),
+        "median_ci": [float(np.percentile(medians, tail)), float(np.percentile(medians, 100 - tail))],
+        "mean_ci": [float(np.percentile(means, tail)), float(np.percentile(means, 100 - tail))]
+    }
+
+
+def compare_timings(baseline: List[float], candidate: List[float], confidence: float = 0.95, resamples: int = 10000,
+                    seed: Optional[int] = None) -> Dict[str, float]:
+    """
+    Works out the ratio of the median timings of a candidate to a baseline with a bootstrap confidence interval.
+
+    :param baseline: (List[float]) the timings of the baseline
+    :param candidate: (List[float]) the timings of the candidate
+    :param confidence: (float) the confidence level of the interval
+    :param resamples: (int) the number of bootstrap resamples
+    :param seed: (Optional[int]) the seed of the bootstrap
+    :return: (Dict[str, float]) the median ratio and its confidence interval, above 1 means the candidate is slower
+    """
+    if len(baseline) == 0 or len(candidate) == 0:
+        return {}
+    rng = np.random.default_rng(seed)
+    tail: float = (1 - confidence) / 2 * 100
+    baseline_medians = np.median(rng.choice(baseline, size=(resamples, len(baseline))), axis=1)
+    candidate_medians = np.median(rng.choice(candidate, size=(resamples, len(candidate))), axis=1)
+    ratios: np.ndarray = candidate_medians / baseline_medians
+    return {
+        "median_ratio": float(np.median(candidate) / np.median(baseline)),
+        "median_ratio_ci": [float(np.percentile(ratios, tail)), float(np.percentile(ratios, 100 - tail))]
+    }
+
+
+class BenchmarkRunner:
+    """
+    This class is responsible for running the variants of a scenario and reporting on their timings.
+
+    Every round runs each variant once in each cache state, in a random order if the scenario shuffles, so drift in
+    the machine's state is spread across the variants rather than landing on whichever runs first. The first rounds
+    are warm up rounds whose runs are reported but left out of the statistics. A variant run in a cache state other
+    than none is reported under <variant>@<cache state> and compared with the baseline in the same cache state.
+
+    Attributes:
+        scenario (Scenario): the scenario being run
+        file_manager (ModelRunFileManager): hides the footprint files a variant should not see
+        runs (List[dict]): the result of every run in the order they were run
+    """
+    def __init__(self, scenario: Scenario) -> None:
+        """
+        The constructor of the BenchmarkRunner.
+
+        :param scenario: (Scenario) the scenario being run
+        """
+        self.scenario: Scenario = scenario
+        self.file_manager: ModelRunFileManager = ModelRunFileManager(static_path=scenario.static_path)
+        self.runs: List[dict] = []
+
+    @contextmanager
+    def _variant_files(self, variant: Variant) -> Iterator[Optional[str]]:
+        """
+        Limits the footprint files to the ones of a variant for the duration of a with block. A ram variant is run on
+        copies of its files staged in memory whatever the isolation of the scenario.
+
+        :param variant: (Variant) the variant being run
+        :return: (Iterator[Optional[str]]) the run directory to run in, None to run in the current directory
+        """
+        if variant.storage == "ram":
+            with self.file_manager.staged(exclude=variant.hidden_files,
+                                          staging_path=self.scenario.staging_path) as run_path:
+                yield run_path
+            return
+
+        if self.scenario.isolation == "overlay":
+            with self.file_manager.overlay(exclude=variant.hidden_files, link=self.scenario.overlay_link) as run_path:
+                yield run_path
+            return
+
+        with self.file_manager.stashed(file_names=variant.hidden_files):
+            yield None
+
+    def run_variant(self, variant: Variant) -> dict:
+        """
+        Runs the pipelines of a variant once with its footprint files in place.
+
+        :param variant: (Variant) the variant to run
+        :return: (dict) the timings, return codes and peak memory of the run
+        """
+        with self._variant_files(variant=variant) as run_path:
+            return self._run_pipelines(variant=variant, run_path=run_path)
+
+    def _run_pipelines(self, variant: Variant, run_path: Optional[str]) -> dict:
+        """
+        Runs the pipelines of a variant, and its data server if it has one, under the MemoryProfiler.
+
+        :param variant: (Variant) the variant to run
+        :param run_path: (Optional[str]) the directory the pipelines are run in, None for the current directory
+        :return: (dict) the timings, return codes and peak memory of the run
+        """
+        static_path: str = self.scenario.static_path
+        if run_path is not None:
+            static_path = os.path.basename(os.path.normpath(os.path.abspath(static_path)))
+
+        server: Optional[DataServer] = None
+        try:
+            if variant.data_server is True:
+                # the clients are only launched once the server is listening so its start up is timed on its own
+                server = DataServer(static_path=static_path, total_processes=variant.total_processes, cwd=run_path,
+                                    startup_timeout=self.scenario.server_startup_timeout)
+                server.start()
+                server.wait_until_ready()
+
+            with tempfile.TemporaryDirectory() as profile_directory:
+                events_files: Optional[List[str]] = None
+                shares: Optional[List[float]] = None
+                if variant.partitioning == "footprint":
+                    events_files, shares = partition_run(static_path=self.scenario.static_path,
+                                                         total_processes=variant.total_processes,
+                                                         output_path=profile_directory)
+                tap_reports: Optional[List[str]] = None
+                if self.scenario.output_tap is not None:
+                    tap_reports = [os.path.join(profile_directory, f"tap_{process}.json")
+                                   for process in range(variant.total_processes)]
+                profile_outputs: Optional[List[str]] = None
+                if self.scenario.profile_cpu is True:
+                    profile_outputs = [os.path.join(profile_directory, f"modelpy_{process}.prof")
+                                       for process in range(variant.total_processes)]
+                commands: List[str] = build_modelpy_commands(total_processes=variant.total_processes,
+                                                             modelpy_args=variant.modelpy_args,
+                                                             events_files=events_files, tap_reports=tap_reports,
+                                                             tap_format=self.scenario.output_tap or "cdf",
+                                                             profile_outputs=profile_outputs)
+                launcher = PipelineLauncher(commands=commands, cwd=run_path, timeout=self.scenario.timeout,
+                                            cancel_on_failure=self.scenario.cancel_on_failure)
+                launcher.fire()
+                profiler: Optional[MemoryProfiler] = None
+                if self.scenario.profile_memory is True:
+                    pids: List[int] = launcher.pids if server is None else launcher.pids + [server.pid]
+                    profiler = MemoryProfiler(pids=pids, output_path=os.path.join(profile_directory, "profile.npz"))
+                    profiler.start()
+
+                wall_seconds: float = launcher.wait()
+
+                memory: Dict[str, Dict[str, float]] = dict()
+                if profiler is not None:
+                    profiler.stop()
+                    profiler.join()
+                    memory = MemoryProfile.load(profiler.output_path).summary()
+
+                output: Optional[dict] = None
+                # a tap that was killed writes no report, so the output of a failed run is left unchecked
+                if tap_reports is not None and all(os.path.isfile(path) for path in tap_reports):
+                    reports: List[dict] = []
+                    for path in tap_reports:
+                        with open(path) as file:
+                            reports.append(json.load(file))
+                    output = summarise_taps(reports=reports)
+
+                cpu_profile: Optional[str] = None
+                if profile_outputs is not None:
+                    os.makedirs(self.scenario.profile_path, exist_ok=True)
+                    cpu_profile = os.path.join(self.scenario.profile_path, f"run_{len(self.runs)}.prof")
+                    if merge_profiles(paths=profile_outputs, output_path=cpu_profile) is None:
+                        cpu_profile = None
+        finally:
+            if server is not None:
+                server.stop()
+
+        pipeline_seconds: List[float] = launcher.wall_times
+        spread: dict = launcher.spread()
+        return {
+            "variant": variant.name,
+            "wall_seconds": wall_seconds,
+            "pipeline_seconds": pipeline_seconds,
+            # the slowest pipeline over the mean pipeline, 1 means the work was split evenly
+            "pipeline_imbalance": spread["imbalance"],
+            "pipeline_spread_seconds": spread["spread_seconds"],
+            "stages": launcher.stage_report(),
+            "predicted_pipeline_seconds": None if shares is None else
+            [share * sum(pipeline_seconds) for share in shares],
+            "return_codes": launcher.return_codes,
+            "succeeded": launcher.succeeded,
+            "timed_out": launcher.timed_out,
+            "cancelled": launcher.cancelled,
+            "peak_rss": memory.get("job", dict()).get("peak_rss"),
+            "peak_pss": memory.get("job", dict()).get("peak_pss"),
+            "pipeline_peak_pss": [self._pipeline_peak(memory=memory, pids=pids, metric="peak_pss")
+                                  for pids in launcher.pipeline_pids],
+            "output": output,
+            "server": None if server is None else server.to_dict(),
+            "cpu_profile": cpu_profile
+        }
+
+    @staticmethod
+    def _pipeline_peak(memory: Dict[str, Dict[str, float]], pids: List[int], metric: str) -> Optional[float]:
+        # the stages of a pipeline are profiled separately so their peaks are added up, which may overstate the peak
+        peaks: List[float] = [memory[str(pid)][metric] for pid in pids if metric in memory.get(str(pid), dict())]
+        return float(sum(peaks)) if len(peaks) > 0 else None
+
+    def _plan(self) -> List[List[Tuple[Variant, str]]]:
+        """
+        Works out the order the variants are run in, one list of variants and cache states per round.
+
+        :return: (List[List[Tuple[Variant, str]]]) the variants and cache states of every warm up and measured round
+        """
+        rng = random.Random(self.scenario.seed)
+        rounds: List[List[Tuple[Variant, str]]] = []
+        for _ in range(self.scenario.warmup + self.scenario.repetitions):
+            runs: List[Tuple[Variant, str]] = [(variant, cache_state) for variant in self.scenario.variants
+                                               for cache_state in self.scenario.cache_states]
+            if self.scenario.shuffle is True:
+                rng.shuffle(runs)
+            rounds.append(runs)
+        return rounds
+
+    def set_cache_state(self, variant: Variant, cache_state: str) -> None:
+        """
+        Puts the footprint files a variant reads into a page cache state. The page cache is left alone for ram
+        variants as they never read the files on disk.
+
+        :param variant: (Variant) the variant about to be run
+        :param cache_state: (str) one of none, cold or warm
+        :return: None
+        """
+        if variant.storage == "ram":
+            return
+        file_names: List[str] = FOOTPRINT_FILES if variant.footprint_files is None else variant.footprint_files
+        set_cache_state(paths=list_files(static_path=self.scenario.static_path, file_names=file_names),
+                        state=cache_state)
+
+    def run(self) -> dict:
+        """
+        Runs every round of the scenario and writes the report.
+
+        :return: (dict) the report of the scenario
+        """
+        for round_number, runs in enumerate(self._plan()):
+            warmup: bool = round_number < self.scenario.warmup
+            for variant, cache_state in runs:
+                self.set_cache_state(variant=variant, cache_state=cache_state)
+                result: dict = self.run_variant(variant=variant)
+                result["label"] = self.scenario.label(variant=variant, cache_state=cache_state)
+                result["cache_state"] = cache_state
+                result["round"] = round_number
+                result["warmup"] = warmup
+                self.runs.append(result)
+                state: str = "warm up" if warmup else "measured"
+                print(f"{result['label']} ({state} round {round_number}) took {result['wall_seconds']:.3f}s"
+                      + ("" if result["succeeded"] else f" and failed with {result['return_codes']}")
+                      + (" after timing out" if result["timed_out"] else ""))
+                if result["predicted_pipeline_seconds"] is not None:
+                    pipelines: str = ", ".join(
+                        f"{predicted:.2f}s/{measured:.2f}s" for predicted, measured
+                        in zip(result["predicted_pipeline_seconds"], result["pipeline_seconds"])
+                    )
+                    print(f"    predicted/measured pipeline seconds: {pipelines}")
+
+        report: dict = self.build_report()
+        with open(self.scenario.report_path, "w") as file:
+            json.dump(report, file, indent=4)
+        self.print_report(report=report)
+        if self.scenario.history_path is not None:
+            with BenchmarkHistory(path=self.scenario.history_path) as history:
+                print(f"recorded as run {history.record(report=report)} in {self.scenario.history_path}")
+        return report
+
+    def measured_timings(self, label: str) -> List[float]:
+        return [run["wall_seconds"] for run in self.runs
+                if run["label"] == label and run["warmup"] is False and run["succeeded"] is True]
+
+    def output_split(self, variant_name: str) -> Tuple:
+        """
+        Works out which runs the output digest of a variant can be compared with. A cdf digest does not depend on how
+        the events were split so every run is comparable, a raw digest is only comparable across runs that split the
+        events the same way.
+
+        :param variant_name: (str) the name of the variant that was run
+        :return: (Tuple) the key shared by the variants whose output digests are comparable
+        """
+        if self.scenario.output_tap == "cdf":
+            return ()
+        variant: Variant = next(variant for variant in self.scenario.variants if variant.name == variant_name)
+        return variant.total_processes, variant.partitioning
+
+    def build_report(self) -> dict:
+        """
+        Builds the report of the runs made so far.
+
+        :return: (dict) the scenario, the statistics of every variant and the result of every run
+        """
+        baseline: Variant = self.scenario.variants[0]
+        variants: Dict[str, dict] = dict()
+        for variant, cache_state in [(variant, cache_state) for cache_state in self.scenario.cache_states
+                                     for variant in self.scenario.variants]:
+            label: str = self.scenario.label(variant=variant, cache_state=cache_state)
+            timings: List[float] = self.measured_timings(label=label)
+            measured_runs: List[dict] = [run for run in self.runs if run["label"] == label and run["warmup"] is False]
+            peak_pss: List[float] = [run["peak_pss"] for run in measured_runs if run["peak_pss"] is not None]
+            imbalances: List[float] = [run["pipeline_imbalance"] for run in measured_runs]
+            startups: List[float] = [run["server"]["startup_seconds"] for run in measured_runs
+                                     if run["server"] is not None]
+            digests: List[str] = sorted({run["output"]["digest"] for run in measured_runs if run.get("output")})
+            variants[label] = {
+                "variant": variant.to_dict(),
+                "cache_state": cache_state,
+                "wall_seconds": summarise_timings(timings=timings, seed=self.scenario.seed),
+                "failed_runs": len([run for run in measured_runs if run["succeeded"] is False]),
+                "median_peak_pss": float(np.median(peak_pss)) if len(peak_pss) > 0 else None,
+                "median_pipeline_imbalance": float(np.median(imbalances)) if len(imbalances) > 0 else None,
+                "median_server_startup_seconds": float(np.median(startups)) if len(startups) > 0 else None,
+                "output_digests": digests,
+                "against_baseline": compare_timings(
+                    baseline=self.measured_timings(
+                        label=self.scenario.label(variant=baseline, cache_state=cache_state)
+                    ),
+                    candidate=timings,
+                    seed=self.scenario.seed
+                ) if variant is not baseline else {}
+            }
+        profiles: Dict[str, dict] = self.build_profiles() if self.scenario.profile_cpu is True else dict()
+        outputs_identical: Optional[bool] = None
+        if self.scenario.output_tap is not None:
+            # every measured run has to have been tapped and agree on a single digest with the runs it is comparable to
+            tapped: List[dict] = [run for run in self.runs if run["warmup"] is False]
+            outputs_identical = all(run.get("output") for run in tapped)
+            if outputs_identical is True:
+                digests: Dict[Tuple, set] = dict()
+                for run in tapped:
+                    digests.setdefault(self.output_split(variant_name=run["variant"]), set()).add(
+                        run["output"]["digest"]
+                    )
+                outputs_identical = all(len(split_digests) == 1 for split_digests in digests.values())
+        return {
+            "scenario": self.scenario.name,
+            "repetitions": self.scenario.repetitions,
+            "warmup": self.scenario.warmup,
+            "shuffle": self.scenario.shuffle,
+            "seed": self.scenario.seed,
+            "cache_states": self.scenario.cache_states,
+            "baseline": self.scenario.label(variant=baseline, cache_state=self.scenario.cache_states[0]),
+            "output_tap": self.scenario.output_tap,
+            "outputs_identical": outputs_identical,
+            "variants": variants,
+            "profiles": profiles,
+            "runs": self.runs
+        }
+
+    def build_profiles(self, sort: str = "tottime", limit: int = 20) -> Dict[str, dict]:
+        """
+        Merges the cProfile stats of the measured runs of every variant and diffs their hot functions against the
+        baseline in the same cache state.
+
+        :param sort: (str) one of tottime, cumtime or calls, the metric the functions are ranked and diffed on
+        :param limit: (int) the number of functions reported
+        :return: (Dict[str, dict]) the merged stats, hot functions and diff of every variant
+        """
+        functions: Dict[str, List[Dict[str, float]]] = dict()
+        profiles: Dict[str, dict] = dict()
+        for label in [self.scenario.label(variant=variant, cache_state=cache_state)
+                      for cache_state in self.scenario.cache_states for variant in self.scenario.variants]:
+            paths: List[str] = [run["cpu_profile"] for run in self.runs if run["label"] == label
+                                and run["warmup"] is False and run["cpu_profile"] is not None]
+            stats = merge_profiles(paths=paths,
+                                   output_path=os.path.join(self.scenario.profile_path, f"{label}.prof"))
+            if stats is None:
+                continue
+            # averaged over the runs so variants with different numbers of successful runs line up
+            functions[label] = hot_functions(stats=stats, runs=len(paths), sort=sort, limit=None)
+            profiles[label] = {
+                "path": os.path.join(self.scenario.profile_path, f"{label}.prof"),
+                "runs": len(paths),
+                "sort": sort,
+                "hot_functions": functions[label][:limit],
+                "baseline": None,
+                "against_baseline": []
+            }
+
+        baseline: Variant = self.scenario.variants[0]
+        for cache_state in self.scenario.cache_states:
+            baseline_label: str = self.scenario.label(variant=baseline, cache_state=cache_state)
+            for variant in self.scenario.variants[1:]:
+                label: str = self.scenario.label(variant=variant, cache_state=cache_state)
+                if label in functions and baseline_label in functions:
+                    profiles[label]["baseline"] = baseline_label
+                    profiles[label]["against_baseline"] = diff_hot_functions(
+                        left=functions[baseline_label], right=functions[label], sort=sort, limit=limit
+                    )
+        return profiles
+
+    @staticmethod
+    def print_report(report: dict) -> None:
+        """
+        Prints the statistics of every variant in a report.
+
+        :param report: (dict) the report built by build_report
+        :return: None
+        """
+        print(f"scenario {report['scenario']} against baseline {report['baseline']}:")
+        for name, variant in report["variants"].items():
+            timings: dict = variant["wall_seconds"]
+            if timings["runs"] == 0:
+                print(f"    {name}: no successful measured runs")
+                continue
+            line: str = f"    {name}: median {timings['median']:.3f}s " \
+                        f"(95% CI {timings['median_ci'][0]:.3f}-{timings['median_ci'][1]:.3f}), " \
+                        f"p95 {timings['p95']:.3f}s over {timings['runs']} runs, " \
+                        f"slowest pipeline {variant['median_pipeline_imbalance']:.2f}x the mean"
+            if variant["against_baseline"]:
+                comparison: dict = variant["against_baseline"]
+                line += f", {comparison['median_ratio']:.3f}x baseline " \
+                        f"(95% CI {comparison['median_ratio_ci'][0]:.3f}-{comparison['median_ratio_ci'][1]:.3f})"
+            if variant["median_server_startup_seconds"] is not None:
+                line += f", data server ready after {variant['median_server_startup_seconds']:.3f}s"
+            if len(variant["output_digests"]) > 0:
+                line += f", output {', '.join(digest[:12] for digest in variant['output_digests'])}"
+            print(line)
+        for name, profile in report["profiles"].items():
+            if profile["baseline"] is not None:
+                print_profile_diff(rows=profile["against_baseline"], left_name=profile["baseline"], right_name=name,
+                                   sort=profile["sort"])
+        if report["outputs_identical"] is not None:
+            print("every measured run produced identical output" if report["outputs_identical"] is True
+                  else "the measured runs did not all produce identical output")
+
+
+def run_scenario_from_command_line(scenario: Scenario) -> dict:
+    """
+    Runs a scenario, letting the command line override how many times it is run and where it is reported.
+
+    :param scenario: (Scenario) the scenario to run
+    :return: (dict) the report of the scenario
+    """
+    parser = argparse.ArgumentParser(description=f"runs the {scenario.name} benchmark scenario")
+    parser.add_argument("--repetitions", type=int, default=scenario.repetitions, help="the measured runs per variant")
+    parser.add_argument("--warmup", type=int, default=scenario.warmup, help="the warm up runs per variant")
+    parser.add_argument("--no-shuffle", action="store_true", help="runs the variants in the order they are declared")
+    parser.add_argument("--seed", type=int, default=scenario.seed, help="the seed of the variant order")
+    parser.add_argument("--report", default=scenario.report_path, help="the path the JSON report is written to")
+    parser.add_argument("--isolation", choices=("overlay", "stash"), default=scenario.isolation,
+                        help="how each variant is limited to its footprint files")
+    parser.add_argument("--timeout", type=float, default=scenario.timeout,
+                        help="the seconds a run is given before its pipelines are killed")
+    parser.add_argument("--cache-states", nargs="+", choices=CACHE_STATES, default=scenario.cache_states,
+                        help="the page cache states every variant is run in")
+    parser.add_argument("--output-tap", choices=("cdf", "raw"), default=scenario.output_tap,
+                        help="hashes and counts the output of modelpy instead of discarding it")
+    parser.add_argument("--profile-cpu", action="store_true", help="runs every modelpy under cProfile")
+    parser.add_argument("--history", default=scenario.history_path,
+                        help="the SQLite benchmark history the report is recorded in")
+    parser.add_argument("--staging-path", default=scenario.staging_path,
+                        help="the RAM backed filesystem the files of ram variants are staged in")
+    args = parser.parse_args()
+
+    scenario.repetitions = args.repetitions
+    scenario.warmup = args.warmup
+    scenario.shuffle = scenario.shuffle and not args.no_shuffle
+    scenario.seed = args.seed
+    scenario.report_path = args.report
+    scenario.staging_path = args.staging_path
+    scenario.output_tap = args.output_tap
+    scenario.profile_cpu = scenario.profile_cpu or args.profile_cpu
+    scenario.history_path = args.history
+    scenario.isolation = args.isolation
+    scenario.timeout = args.timeout
+    scenario.cache_states = args.cache_states
+    start: float = time.time()
+    report: dict = BenchmarkRunner(scenario=scenario).run()
+    print(f"the scenario took {time.time() - start:.1f}s")
+    return report
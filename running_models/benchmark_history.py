@@ -0,0 +1,366 @@
+"""
+This file keeps a history of benchmark reports in a local SQLite database so the timings of a scenario can be compared
+across versions of modelpy and oasislmf. Every report is stored with the git revision of these utils, the versions of
+the packages that were installed, the host it was run on and the timings and peak memory of every measured run.
+
+A new run is compared with a stored baseline run by a one sided permutation test on the medians of every variant and
+the comparison fails with a non-zero exit code if a variant is slower by more than a threshold with significance:
+
+    python benchmark_history.py record bin_vs_parquet_report.json
+    python benchmark_history.py compare bin_vs_parquet --threshold 0.05 --alpha 0.05
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import sqlite3
+import subprocess
+import time
+from importlib import metadata
+from math import comb
+from typing import Dict, List, Optional
+
+import numpy as np
+import psutil
+
+DEFAULT_HISTORY_PATH: str = os.path.expanduser("~/.cache/oasis_benchmark_history.sqlite")
+TRACKED_PACKAGES: tuple = ("oasislmf", "oasis-data-manager", "numpy", "numba", "pandas", "pyarrow")
+HISTORY_METRICS: tuple = ("wall_seconds", "peak_rss", "peak_pss")
+
+SCHEMA: str = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    scenario TEXT NOT NULL,
+    recorded_at REAL NOT NULL,
+    git_revision TEXT,
+    package_versions TEXT NOT NULL,
+    host TEXT NOT NULL,
+    report TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS results (
+    run_id INTEGER NOT NULL REFERENCES runs (id),
+    label TEXT NOT NULL,
+    variant TEXT NOT NULL,
+    cache_state TEXT NOT NULL,
+    round INTEGER NOT NULL,
+    succeeded INTEGER NOT NULL,
+    wall_seconds REAL NOT NULL,
+    peak_rss REAL,
+    peak_pss REAL
+);
+CREATE INDEX IF NOT EXISTS runs_scenario ON runs (scenario, id);
+CREATE INDEX IF NOT EXISTS results_run ON results (run_id, label);
+"""
+
+
+def git_revision(path: Optional[str] = None) -> Optional[str]:
+    """
+    Gets the git revision of a checkout, marked as dirty if it has uncommitted changes.
+
+    :param path: (Optional[str]) a directory in the checkout, defaults to the one housing this file
+    :return: (Optional[str]) the revision, None if the directory is not in a git checkout
+    """
+    path = os.path.dirname(os.path.abspath(__file__)) if path is None else path
+    try:
+        revision: str = subprocess.run(["git", "rev-parse", "HEAD"], cwd=path, capture_output=True, text=True,
+                                       check=True).stdout.strip()
+        status: str = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=path,
+                                     capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return revision if status == "" else f"{revision}-dirty"
+
+
+def package_versions(packages: tuple = TRACKED_PACKAGES) -> Dict[str, Optional[str]]:
+    """
+    Gets the installed versions of the packages a model run depends on.
+
+    :param packages: (tuple) the names of the packages
+    :return: (Dict[str, Optional[str]]) the version of every package, None if it is not installed
+    """
+    versions: Dict[str, Optional[str]] = dict()
+    for package in packages:
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            versions[package] = None
+    return versions
+
+
+def host_info() -> Dict[str, object]:
+    """
+    Describes the machine the benchmark is run on.
+
+    :return: (Dict[str, object]) the host name, platform, Python version, CPU and memory of the machine
+    """
+    processor: str = platform.processor()
+    if os.path.isfile("/proc/cpuinfo"):
+        with open("/proc/cpuinfo") as file:
+            for line in file:
+                if line.startswith("model name"):
+                    processor = line.split(":", 1)[1].strip()
+                    break
+    return {
+        "hostname": platform.node(),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "processor": processor,
+        "cpu_count": os.cpu_count(),
+        "memory": psutil.virtual_memory().total
+    }
+
+
+def permutation_test(baseline: List[float], candidate: List[float], resamples: int = 10000,
+                     seed: Optional[int] = None) -> float:
+    """
+    Tests if the candidate's median is greater than the baseline's by permuting the pooled values between the two.
+    Every split is tried if there are no more splits than resamples, otherwise random splits are drawn and the observed
+    split is counted as one of them so the p value is never 0.
+
+    :param baseline: (List[float]) the values of the baseline
+    :param candidate: (List[float]) the values of the candidate
+    :param resamples: (int) the number of random splits drawn if there are too many splits to try them all
+    :param seed: (Optional[int]) the seed of the random splits
+    :return: (float) the one sided p value
+    """
+    pooled: np.ndarray = np.asarray(list(baseline) + list(candidate), dtype=np.float64)
+    size: int = len(candidate)
+    observed: float = float(np.median(candidate) - np.median(baseline))
+    if comb(len(pooled), size) <= resamples:
+        splits = [np.array(indexes) for indexes in itertools.combinations(range(len(pooled)), size)]
+    else:
+        rng = np.random.default_rng(seed)
+        splits = [rng.permutation(len(pooled))[:size] for _ in range(resamples)]
+
+    mask: np.ndarray = np.zeros(len(pooled), dtype=bool)
+    at_least: int = 0
+    for indexes in splits:
+        mask[:] = False
+        mask[indexes] = True
+        if np.median(pooled[mask]) - np.median(pooled[~mask]) >= observed - 1e-12:
+            at_least += 1
+    if comb(len(pooled), size) <= resamples:
+        return at_least / len(splits)
+    return (at_least + 1) / (len(splits) + 1)
+
+
+def minimum_p_value(baseline_size: int, candidate_size: int, resamples: int = 10000) -> float:
+    """
+    Works out the smallest p value the permutation test can give for the numbers of values, which is the p value of a
+    candidate with every value above every baseline value. It is more than one over the number of splits as other
+    splits can have the same difference of medians. A comparison can only find a regression if this is at most the
+    significance level.
+
+    :param baseline_size: (int) the number of values of the baseline
+    :param candidate_size: (int) the number of values of the candidate
+    :param resamples: (int) the number of random splits drawn if there are too many splits to try them all
+    :return: (float) the smallest possible one sided p value
+    """
+    return permutation_test(baseline=list(range(baseline_size)),
+                            candidate=list(range(baseline_size, baseline_size + candidate_size)),
+                            resamples=resamples, seed=0)
+
+
+class BenchmarkHistory:
+    """
+    This class is responsible for storing benchmark reports in a SQLite database and comparing runs of a scenario.
+
+    Attributes:
+        path (str): the path to the SQLite database
+        connection (sqlite3.Connection): the connection to the database
+    """
+    def __init__(self, path: str = DEFAULT_HISTORY_PATH) -> None:
+        """
+        The constructor of the BenchmarkHistory.
+
+        :param path: (str) the path to the SQLite database, created if it does not exist
+        """
+        self.path: str = path
+        if os.path.dirname(path) != "":
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.connection: sqlite3.Connection = sqlite3.connect(path)
+        self.connection.executescript(SCHEMA)
+
+    def __enter__(self) -> "BenchmarkHistory":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.connection.close()
+
+    def record(self, report: dict) -> int:
+        """
+        Stores a report built by the BenchmarkRunner with the measured runs of every variant.
+
+        :param report: (dict) the report
+        :return: (int) the ID of the run in the history
+        """
+        variants: Dict[str, dict] = {label: variant["variant"] for label, variant in report["variants"].items()}
+        with self.connection:
+            cursor = self.connection.execute(
+                "INSERT INTO runs (scenario, recorded_at, git_revision, package_versions, host, report) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (report["scenario"], time.time(), git_revision(), json.dumps(package_versions()),
+                 json.dumps(host_info()), json.dumps({key: value for key, value in report.items() if key != "runs"}))
+            )
+            run_id: int = cursor.lastrowid
+            self.connection.executemany(
+                "INSERT INTO results (run_id, label, variant, cache_state, round, succeeded, wall_seconds, peak_rss, "
+                "peak_pss) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(run_id, run["label"], json.dumps(variants.get(run["label"])), run["cache_state"], run["round"],
+                  int(run["succeeded"]), run["wall_seconds"], run["peak_rss"], run["peak_pss"])
+                 for run in report["runs"] if run["warmup"] is False]
+            )
+        return run_id
+
+    def runs(self, scenario: str) -> List[dict]:
+        """
+        Lists the stored runs of a scenario, oldest first.
+
+        :param scenario: (str) the name of the scenario
+        :return: (List[dict]) the ID, time, git revision, package versions and host of every run
+        """
+        rows = self.connection.execute(
+            "SELECT id, recorded_at, git_revision, package_versions, host FROM runs WHERE scenario = ? ORDER BY id",
+            (scenario,)
+        ).fetchall()
+        return [
+            {"id": row[0], "recorded_at": row[1], "git_revision": row[2], "package_versions": json.loads(row[3]),
+             "host": json.loads(row[4])}
+            for row in rows
+        ]
+
+    def measurements(self, run_id: int, metric: str = "wall_seconds") -> Dict[str, List[float]]:
+        """
+        Gets a metric of the successful measured runs of every variant of a stored run.
+
+        :param run_id: (int) the ID of the run
+        :param metric: (str) one of wall_seconds, peak_rss or peak_pss
+        :return: (Dict[str, List[float]]) the values of the metric keyed by the label of the variant
+        """
+        if metric not in HISTORY_METRICS:
+            raise ValueError(f"{metric} is not one of {HISTORY_METRICS}")
+        values: Dict[str, List[float]] = dict()
+        for label, value in self.connection.execute(
+            f"SELECT label, {metric} FROM results WHERE run_id = ? AND succeeded = 1 AND {metric} IS NOT NULL "
+            "ORDER BY round", (run_id,)
+        ):
+            values.setdefault(label, []).append(value)
+        return values
+
+    def compare(self, baseline_run: int, candidate_run: int, metric: str = "wall_seconds", threshold: float = 0.05,
+                alpha: float = 0.05, seed: Optional[int] = None) -> dict:
+        """
+        Compares every variant of a candidate run with the same variant of a baseline run. A variant has regressed if
+        its median is more than the threshold above the baseline's and the permutation test is significant. Raises a
+        ValueError if a variant has too few measured runs for the permutation test to ever be significant at alpha.
+
+        :param baseline_run: (int) the ID of the baseline run
+        :param candidate_run: (int) the ID of the candidate run
+        :param metric: (str) one of wall_seconds, peak_rss or peak_pss
+        :param threshold: (float) the relative increase of the median that counts as a regression, 0.05 is 5%
+        :param alpha: (float) the significance level of the permutation test
+        :param seed: (Optional[int]) the seed of the permutation test
+        :return: (dict) the comparison of every variant and if any of them regressed
+        """
+        baseline: Dict[str, List[float]] = self.measurements(run_id=baseline_run, metric=metric)
+        candidate: Dict[str, List[float]] = self.measurements(run_id=candidate_run, metric=metric)
+        variants: Dict[str, dict] = dict()
+        for label in sorted(set(baseline) & set(candidate)):
+            smallest_p_value: float = minimum_p_value(baseline_size=len(baseline[label]),
+                                                      candidate_size=len(candidate[label]))
+            if smallest_p_value > alpha:
+                # the medians of 3 runs against 3 can at best give 1 in 10, so they can never be significant at 0.05
+                raise ValueError(f"{label} has {len(baseline[label])} baseline and {len(candidate[label])} candidate "
+                                 f"runs so its smallest possible p value is {smallest_p_value:.3f}, which is above "
+                                 f"alpha {alpha}, more measured runs are needed to find a regression")
+            baseline_median: float = float(np.median(baseline[label]))
+            candidate_median: float = float(np.median(candidate[label]))
+            change: float = candidate_median / baseline_median - 1 if baseline_median > 0 else 0.0
+            p_value: float = permutation_test(baseline=baseline[label], candidate=candidate[label], seed=seed)
+            variants[label] = {
+                "baseline_median": baseline_median,
+                "candidate_median": candidate_median,
+                "change": change,
+                "p_value": p_value,
+                "regressed": change > threshold and p_value <= alpha
+            }
+        return {
+            "baseline_run": baseline_run,
+            "candidate_run": candidate_run,
+            "metric": metric,
+            "threshold": threshold,
+            "alpha": alpha,
+            "missing_variants": sorted(set(baseline) ^ set(candidate)),
+            "variants": variants,
+            "regressed": any(variant["regressed"] for variant in variants.values())
+        }
+
+
+def print_comparison(comparison: dict) -> None:
+    """
+    Prints the comparison of two stored runs.
+
+    :param comparison: (dict) the comparison built by BenchmarkHistory.compare
+    :return: None
+    """
+    print(f"{comparison['metric']} of run {comparison['candidate_run']} against run {comparison['baseline_run']} "
+          f"(threshold {comparison['threshold']:.1%}, alpha {comparison['alpha']}):")
+    for label, variant in comparison["variants"].items():
+        verdict: str = "REGRESSED" if variant["regressed"] else "ok"
+        print(f"    {label}: {variant['baseline_median']:.4g} -> {variant['candidate_median']:.4g} "
+              f"({variant['change']:+.1%}, p={variant['p_value']:.3f}) {verdict}")
+    for label in comparison["missing_variants"]:
+        print(f"    {label}: only in one of the runs")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stores benchmark reports and checks new runs for regressions")
+    parser.add_argument("--history", default=DEFAULT_HISTORY_PATH, help="the path to the SQLite history")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    record_parser = commands.add_parser("record", help="stores a benchmark report")
+    record_parser.add_argument("report", help="the JSON report written by a benchmark scenario")
+
+    list_parser = commands.add_parser("list", help="lists the stored runs of a scenario")
+    list_parser.add_argument("scenario", help="the name of the scenario")
+
+    compare_parser = commands.add_parser("compare", help="compares a run of a scenario with a baseline run")
+    compare_parser.add_argument("scenario", help="the name of the scenario")
+    compare_parser.add_argument("--baseline", type=int, default=None,
+                                help="the baseline run, the one before the candidate if not given")
+    compare_parser.add_argument("--candidate", type=int, default=None, help="the candidate run, the last if not given")
+    compare_parser.add_argument("--metric", choices=HISTORY_METRICS, default="wall_seconds",
+                                help="the metric compared")
+    compare_parser.add_argument("--threshold", type=float, default=0.05,
+                                help="the relative increase of the median that counts as a regression")
+    compare_parser.add_argument("--alpha", type=float, default=0.05, help="the significance level")
+    compare_parser.add_argument("--seed", type=int, default=None, help="the seed of the permutation test")
+    args = parser.parse_args()
+
+    with BenchmarkHistory(path=args.history) as history:
+        if args.command == "record":
+            with open(args.report) as report_file:
+                print(f"recorded run {history.record(report=json.load(report_file))}")
+        elif args.command == "list":
+            for stored_run in history.runs(scenario=args.scenario):
+                recorded_at: str = time.strftime("%Y-%m-%d %H:%M", time.localtime(stored_run["recorded_at"]))
+                print(f"{stored_run['id']:>5} {recorded_at} {stored_run['git_revision']} "
+                      f"oasislmf {stored_run['package_versions'].get('oasislmf')} {stored_run['host']['hostname']}")
+        else:
+            stored_ids: List[int] = [stored_run["id"] for stored_run in history.runs(scenario=args.scenario)]
+            candidate_id: Optional[int] = args.candidate if args.candidate is not None else \
+                (stored_ids[-1] if len(stored_ids) > 0 else None)
+            earlier_ids: List[int] = [run_id for run_id in stored_ids if candidate_id is None or run_id < candidate_id]
+            baseline_id: Optional[int] = args.baseline if args.baseline is not None else \
+                (earlier_ids[-1] if len(earlier_ids) > 0 else None)
+            if candidate_id is None or baseline_id is None:
+                raise SystemExit(f"scenario {args.scenario} needs two stored runs to compare")
+            try:
+                result: dict = history.compare(baseline_run=baseline_id, candidate_run=candidate_id,
+                                               metric=args.metric, threshold=args.threshold, alpha=args.alpha,
+                                               seed=args.seed)
+            except ValueError as error:
+                raise SystemExit(f"runs {baseline_id} and {candidate_id} cannot be compared: {error}")
+            print_comparison(result)
+            raise SystemExit(1 if result["regressed"] is True else 0)
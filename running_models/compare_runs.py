@@ -0,0 +1,174 @@
+"""
+This file compares all of the output files of two model run directories. The files are diffed across a pool of
+processes and every csv output is parsed once into a parquet cache keyed on its path, size and modification time, so
+comparing against a fixed baseline run again does not parse its csv files again. It is run as a module from the root
+of the repo:
+
+    python -m running_models.compare_runs ./runs/baseline/ ./runs/candidate/ --workers 8
+"""
+import argparse
+import hashlib
+import json
+import os
+from multiprocessing import Pool
+from typing import Dict, List, Optional, Tuple
+
+from running_models.output_diff import OutputDiff, diff_outputs
+
+DEFAULT_CACHE_PATH: str = os.path.expanduser("~/.cache/oasis_output_cache")
+OUTPUT_EXTENSIONS: Tuple[str, ...] = (".csv", ".parquet")
+
+
+def list_output_files(run_directory: str) -> Dict[str, str]:
+    """
+    Finds the output files of a model run.
+
+    :param run_directory: (str) the path to the model run directory
+    :return: (Dict[str, str]) the paths to the output files keyed by file name
+    """
+    output_path: str = os.path.join(run_directory, "output")
+    return {
+        entry.name: entry.path for entry in sorted(os.scandir(output_path), key=lambda entry: entry.name)
+        if entry.is_file() and entry.name.endswith(OUTPUT_EXTENSIONS)
+    }
+
+
+def cache_key(path: str) -> str:
+    """
+    Builds the key of a parsed output in the cache. The key changes if the file is rewritten.
+
+    :param path: (str) the path to the output file
+    :return: (str) the cache key
+    """
+    stat: os.stat_result = os.stat(path)
+    identity: str = f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+    return hashlib.blake2b(identity.encode(), digest_size=16).hexdigest()
+
+
+def cached_output(path: str, cache_path: str) -> str:
+    """
+    Gets the parquet copy of a csv output from the cache, parsing the csv into the cache if it is not there. Parquet
+    outputs are returned as they are.
+
+    :param path: (str) the path to the output file
+    :param cache_path: (str) the path to the cache directory
+    :return: (str) the path to a parquet copy of the output
+    """
+    if not path.endswith(".csv"):
+        return path
+    import pyarrow.csv as pv
+    import pyarrow.parquet as pq
+
+    os.makedirs(cache_path, exist_ok=True)
+    parquet_path: str = os.path.join(cache_path, f"{os.path.basename(path)[:-4]}-{cache_key(path)}.parquet")
+    if os.path.isfile(parquet_path):
+        return parquet_path
+
+    # written under a temporary name and renamed so a killed comparison never leaves half a file in the cache
+    temporary_path: str = f"{parquet_path}.{os.getpid()}.tmp"
+    reader = pv.open_csv(path)
+    with pq.ParquetWriter(temporary_path, reader.schema) as writer:
+        for batch in reader:
+            writer.write_batch(batch)
+    os.replace(temporary_path, parquet_path)
+    return parquet_path
+
+
+def _compare_file(task: Tuple[str, str, str, str, float, float]) -> Tuple[str, dict]:
+    """
+    Diffs one output file of the two runs in a worker process.
+
+    :param task: (Tuple[str, str, str, str, float, float]) the file name, the left and right paths, the cache path and
+                 the absolute and relative tolerances
+    :return: (Tuple[str, dict]) the file name and the diff of the file
+    """
+    name, left_path, right_path, cache_path, atol, rtol = task
+    diff: OutputDiff = diff_outputs(left_path=cached_output(path=left_path, cache_path=cache_path),
+                                    right_path=cached_output(path=right_path, cache_path=cache_path),
+                                    atol=atol, rtol=rtol)
+    result: dict = diff.to_dict()
+    result["samples"] = {kind: sample.to_dict(orient="records") for kind, sample in diff.samples.items()}
+    return name, result
+
+
+def compare_runs(left_run: str, right_run: str, file_names: Optional[List[str]] = None, workers: int = 4,
+                 cache_path: str = DEFAULT_CACHE_PATH, atol: float = 1e-6, rtol: float = 1e-6) -> dict:
+    """
+    Diffs the output files of two runs across a pool of processes.
+
+    :param left_run: (str) the path to the left model run directory
+    :param right_run: (str) the path to the right model run directory
+    :param file_names: (Optional[List[str]]) the output files to compare, every output file of either run if None
+    :param workers: (int) the number of processes the files are diffed across
+    :param cache_path: (str) the path to the cache of parsed csv outputs
+    :param atol: (float) the absolute tolerance numeric values are compared with
+    :param rtol: (float) the relative tolerance numeric values are compared with
+    :return: (dict) the report of the comparison with a diff per file
+    """
+    left_files: Dict[str, str] = list_output_files(run_directory=left_run)
+    right_files: Dict[str, str] = list_output_files(run_directory=right_run)
+    if file_names is None:
+        file_names = sorted(set(left_files) | set(right_files))
+
+    shared: List[str] = [name for name in file_names if name in left_files and name in right_files]
+    tasks: List[Tuple[str, str, str, str, float, float]] = [
+        (name, left_files[name], right_files[name], cache_path, atol, rtol) for name in shared
+    ]
+    files: Dict[str, dict] = {}
+    if len(tasks) > 0:
+        with Pool(processes=max(1, min(workers, len(tasks)))) as pool:
+            for name, result in pool.imap_unordered(_compare_file, tasks):
+                files[name] = result
+
+    report: dict = {
+        "left_run": left_run,
+        "right_run": right_run,
+        "left_only_files": [name for name in file_names if name in left_files and name not in right_files],
+        "right_only_files": [name for name in file_names if name in right_files and name not in left_files],
+        "missing_files": [name for name in file_names if name not in left_files and name not in right_files],
+        "files": {name: files[name] for name in shared}
+    }
+    report["identical"] = len(report["left_only_files"]) == 0 and len(report["right_only_files"]) == 0 \
+        and len(report["missing_files"]) == 0 and all(result["identical"] for result in files.values())
+    return report
+
+
+def print_report(report: dict) -> None:
+    """
+    Prints one line per output file of a comparison report.
+
+    :param report: (dict) the report returned by compare_runs
+    :return: None
+    """
+    print(f"comparing {report['left_run']} with {report['right_run']}")
+    for name, result in report["files"].items():
+        if result["identical"] is True:
+            print(f"{name}: no difference ({result['left_rows']} rows)")
+        else:
+            print(f"{name}: {result['left_only']} left only, {result['right_only']} right only, "
+                  f"{result['changed']} changed ({result['left_rows']} left rows, {result['right_rows']} right rows)")
+    for kind in ("left_only_files", "right_only_files", "missing_files"):
+        for name in report[kind]:
+            print(f"{name}: {kind.replace('_', ' ')[:-1]}")
+    print("the runs are identical" if report["identical"] is True else "the runs are different")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the output files of two model runs")
+    parser.add_argument("left_run", help="the left model run directory")
+    parser.add_argument("right_run", help="the right model run directory")
+    parser.add_argument("--files", nargs="+", default=None, help="the output files to compare, all if not given")
+    parser.add_argument("--workers", type=int, default=4, help="the number of processes files are diffed across")
+    parser.add_argument("--cache-path", default=DEFAULT_CACHE_PATH, help="where parsed csv outputs are cached")
+    parser.add_argument("--atol", type=float, default=1e-6, help="the absolute tolerance")
+    parser.add_argument("--rtol", type=float, default=1e-6, help="the relative tolerance")
+    parser.add_argument("--report", default=None, help="where the JSON report is written")
+    args = parser.parse_args()
+
+    comparison: dict = compare_runs(left_run=args.left_run, right_run=args.right_run, file_names=args.files,
+                                    workers=args.workers, cache_path=args.cache_path, atol=args.atol, rtol=args.rtol)
+    print_report(comparison)
+    if args.report is not None:
+        with open(args.report, "w") as report_file:
+            json.dump(comparison, report_file, indent=2, default=str)
+    raise SystemExit(0 if comparison["identical"] is True else 1)
@@ -0,0 +1,161 @@
+"""
+This script is for profiling where the modelpy processes of a model run spend their time. Every modelpy is run under
+cProfile, which ships with Python so nothing needs installing, and the stats of every process and run of a variant are
+merged into one profile. The hot functions of two variants can then be diffed side by side:
+
+    python cpu_profile.py bin.prof parquet.prof --sort tottime --limit 25
+
+cProfile traces every call so profiled runs are slower than normal runs and their timings should only be compared
+with other profiled runs.
+"""
+import argparse
+import os
+import pstats
+import shlex
+import shutil
+from typing import Dict, List, Optional
+
+PROFILE_SORTS: tuple = ("tottime", "cumtime", "calls")
+# runs a script under cProfile keeping its exit code, which python -m cProfile does not
+PROFILE_RUNNER: str = os.path.join(os.path.dirname(os.path.abspath(__file__)), "profile_runner.py")
+
+
+def python_interpreter(script_path: str) -> str:
+    """
+    Gets the Python interpreter a console script such as modelpy runs under from its shebang, so it is profiled in
+    the environment it is installed in.
+
+    :param script_path: (str) the path to the console script
+    :return: (str) the path to the interpreter
+    """
+    with open(script_path, "rb") as file:
+        first_line: str = file.readline().decode(errors="replace").strip()
+    if not first_line.startswith("#!") or "python" not in first_line:
+        raise ValueError(f"{script_path} is not a Python script so it cannot be run under cProfile")
+    arguments: List[str] = shlex.split(first_line[2:])
+    # a shebang of /usr/bin/env python3 names the interpreter as its argument
+    if os.path.basename(arguments[0]) == "env":
+        return shutil.which(arguments[-1]) or arguments[-1]
+    return arguments[0]
+
+
+def profiled_command(program: str, output_path: str) -> str:
+    """
+    Wraps the command of a Python console script so it runs under cProfile and dumps its stats when it exits. The
+    wrapped command exits with the exit code of the script.
+
+    :param program: (str) the command, such as modelpy --ignore-file-type z csv
+    :param output_path: (str) the path the stats are dumped to
+    :return: (str) the wrapped command
+    """
+    arguments: List[str] = shlex.split(program)
+    script_path: Optional[str] = shutil.which(arguments[0])
+    if script_path is None:
+        raise FileNotFoundError(f"{arguments[0]} is not on the PATH")
+    return " ".join(shlex.quote(argument) for argument in
+                    [python_interpreter(script_path), PROFILE_RUNNER, "--output", output_path, script_path]
+                    + arguments[1:])
+
+
+def merge_profiles(paths: List[str], output_path: Optional[str] = None) -> Optional[pstats.Stats]:
+    """
+    Merges the stats of several processes into one set of stats.
+
+    :param paths: (List[str]) the stats dumped by every process, missing files are skipped
+    :param output_path: (Optional[str]) the path the merged stats are dumped to so they can be opened by other tools
+    :return: (Optional[pstats.Stats]) the merged stats, None if none of the files exist
+    """
+    existing: List[str] = [path for path in paths if os.path.isfile(path)]
+    if len(existing) == 0:
+        return None
+    stats = pstats.Stats(*existing)
+    if output_path is not None:
+        stats.dump_stats(output_path)
+    return stats
+
+
+def function_name(key: tuple) -> str:
+    file_name, line, name = key
+    if file_name == "~":
+        # builtins have no file
+        return name
+    return f"{os.path.basename(file_name)}:{line}({name})"
+
+
+def hot_functions(stats: pstats.Stats, runs: int = 1, sort: str = "tottime",
+                  limit: Optional[int] = 20) -> List[Dict[str, float]]:
+    """
+    Lists the functions a profile spent the most time in, averaged over the runs merged into it.
+
+    :param stats: (pstats.Stats) the merged stats
+    :param runs: (int) the number of runs merged into the stats, the times and calls are divided by it
+    :param sort: (str) one of tottime, cumtime or calls
+    :param limit: (Optional[int]) the number of functions listed, all of them if None
+    :return: (List[Dict[str, float]]) the function, calls, time in itself and time including its callees
+    """
+    if sort not in PROFILE_SORTS:
+        raise ValueError(f"{sort} is not one of {PROFILE_SORTS}")
+    rows: List[Dict[str, float]] = [
+        {"function": function_name(key), "calls": calls / runs, "tottime": total_time / runs,
+         "cumtime": cumulative_time / runs}
+        for key, (_, calls, total_time, cumulative_time, _) in stats.stats.items()
+    ]
+    rows.sort(key=lambda row: row[sort], reverse=True)
+    return rows if limit is None else rows[:limit]
+
+
+def diff_hot_functions(left: List[Dict[str, float]], right: List[Dict[str, float]], sort: str = "tottime",
+                       limit: Optional[int] = 20) -> List[Dict[str, float]]:
+    """
+    Lines up the functions of two profiles and orders them by how much the metric changed.
+
+    :param left: (List[Dict[str, float]]) every function of the first profile from hot_functions
+    :param right: (List[Dict[str, float]]) every function of the second profile from hot_functions
+    :param sort: (str) one of tottime, cumtime or calls
+    :param limit: (Optional[int]) the number of functions listed, all of them if None
+    :return: (List[Dict[str, float]]) the function, its metric in both profiles and the change, biggest change first
+    """
+    left_values: Dict[str, float] = {row["function"]: row[sort] for row in left}
+    right_values: Dict[str, float] = {row["function"]: row[sort] for row in right}
+    rows: List[Dict[str, float]] = [
+        {"function": name, "left": left_values.get(name, 0.0), "right": right_values.get(name, 0.0),
+         "change": right_values.get(name, 0.0) - left_values.get(name, 0.0)}
+        for name in set(left_values) | set(right_values)
+    ]
+    rows.sort(key=lambda row: abs(row["change"]), reverse=True)
+    return rows if limit is None else rows[:limit]
+
+
+def print_profile_diff(rows: List[Dict[str, float]], left_name: str, right_name: str, sort: str = "tottime") -> None:
+    """
+    Prints the functions of two profiles side by side.
+
+    :param rows: (List[Dict[str, float]]) the diff built by diff_hot_functions
+    :param left_name: (str) the name of the first profile
+    :param right_name: (str) the name of the second profile
+    :param sort: (str) the metric the diff was built on
+    :return: None
+    """
+    print(f"{sort} of {right_name} against {left_name}:")
+    print(f"{left_name[:12]:>12} {right_name[:12]:>12} {'change':>10}  function")
+    for row in rows:
+        digits: int = 0 if sort == "calls" else 4
+        print(f"{row['left']:>12.{digits}f} {row['right']:>12.{digits}f} {row['change']:>+10.{digits}f}  "
+              f"{row['function']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Diffs the hot functions of two cProfile profiles")
+    parser.add_argument("left", help="the stats of the first profile")
+    parser.add_argument("right", help="the stats of the second profile")
+    parser.add_argument("--sort", choices=PROFILE_SORTS, default="tottime",
+                        help="the metric the functions are diffed on")
+    parser.add_argument("--limit", type=int, default=25, help="the number of functions printed")
+    args = parser.parse_args()
+
+    print_profile_diff(
+        rows=diff_hot_functions(left=hot_functions(pstats.Stats(args.left), sort=args.sort, limit=None),
+                                right=hot_functions(pstats.Stats(args.right), sort=args.sort, limit=None),
+                                sort=args.sort, limit=args.limit),
+        left_name=os.path.basename(args.left), right_name=os.path.basename(args.right), sort=args.sort
+    )
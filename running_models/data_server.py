@@ -0,0 +1,177 @@
+"""
+This file manages the servedata data server that modelpy --data-server clients read the model data from. The server is
+started in its own session so the whole process group can be stopped, and it is only reported ready once it is
+listening on its socket, so clients never race a server that is still loading the data and the start up time of the
+server is timed apart from the work of the clients.
+
+Readiness is probed with psutil by looking for a listening socket of the server rather than by connecting to it, as
+the server counts its connections to know when every client is done.
+"""
+import os
+import signal
+import time
+from subprocess import Popen, TimeoutExpired
+from typing import List, Optional
+
+import psutil
+
+DEFAULT_PORT: int = 8080
+
+
+def listening_ports(pid: int) -> List[int]:
+    """
+    Lists the TCP ports a process or any of its children is listening on.
+
+    :param pid: (int) the process ID of the root of the processes
+    :return: (List[int]) the ports being listened on
+    """
+    try:
+        root = psutil.Process(pid)
+        processes: List[psutil.Process] = [root] + root.children(recursive=True)
+    except psutil.NoSuchProcess:
+        return []
+    ports: List[int] = []
+    for process in processes:
+        try:
+            # psutil 6 renamed connections to net_connections
+            connections = getattr(process, "net_connections", process.connections)(kind="tcp")
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            continue
+        ports.extend(connection.laddr.port for connection in connections if connection.status == psutil.CONN_LISTEN)
+    return ports
+
+
+class DataServer:
+    """
+    This class is responsible for the lifecycle of a servedata process, starting it, waiting until it is ready and
+    stopping its whole process group.
+
+    Attributes:
+        static_path (str): the path to the static folder the server serves
+        total_processes (int): the number of modelpy clients the server serves
+        cwd (Optional[str]): the directory the server is run in, None for the current directory
+        port (Optional[int]): the port the server listens on once it is ready, None accepts any port
+        startup_timeout (float): the seconds the server is given to become ready
+        poll_interval (float): the seconds between readiness probes
+        process (Optional[Popen]): the server process once started
+        start_time (Optional[float]): when the server was started
+        ready_time (Optional[float]): when the server was found listening
+        stop_time (Optional[float]): when the server was stopped
+        return_code (Optional[int]): the return code of the server once stopped
+    """
+    def __init__(self, static_path: str, total_processes: int, cwd: Optional[str] = None,
+                 port: Optional[int] = DEFAULT_PORT, startup_timeout: float = 60.0,
+                 poll_interval: float = 0.01) -> None:
+        """
+        The constructor of the DataServer.
+
+        :param static_path: (str) the path to the static folder the server serves
+        :param total_processes: (int) the number of modelpy clients the server serves
+        :param cwd: (Optional[str]) the directory the server is run in, None for the current directory
+        :param port: (Optional[int]) the port the server listens on once it is ready, None accepts any port
+        :param startup_timeout: (float) the seconds the server is given to become ready
+        :param poll_interval: (float) the seconds between readiness probes
+        """
+        self.static_path: str = static_path
+        self.total_processes: int = total_processes
+        self.cwd: Optional[str] = cwd
+        self.port: Optional[int] = port
+        self.startup_timeout: float = startup_timeout
+        self.poll_interval: float = poll_interval
+        self.process: Optional[Popen] = None
+        self.start_time: Optional[float] = None
+        self.ready_time: Optional[float] = None
+        self.stop_time: Optional[float] = None
+        self.return_code: Optional[int] = None
+
+    def __enter__(self) -> "DataServer":
+        self.start()
+        try:
+            self.wait_until_ready()
+        except BaseException:
+            self.stop()
+            raise
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.stop()
+
+    @property
+    def pid(self) -> Optional[int]:
+        return None if self.process is None else self.process.pid
+
+    @property
+    def startup_seconds(self) -> Optional[float]:
+        if self.start_time is None or self.ready_time is None:
+            return None
+        return self.ready_time - self.start_time
+
+    @property
+    def ready(self) -> bool:
+        ports: List[int] = listening_ports(pid=self.process.pid)
+        return len(ports) > 0 if self.port is None else self.port in ports
+
+    def start(self) -> None:
+        """
+        Starts the server in a session of its own so it and any process it starts can be stopped together.
+
+        :return: None
+        """
+        if self.process is not None:
+            raise RuntimeError("the data server has already been started")
+        self.start_time = time.time()
+        self.process = Popen(["servedata", self.static_path, str(self.total_processes)], cwd=self.cwd,
+                             start_new_session=True)
+
+    def wait_until_ready(self) -> float:
+        """
+        Probes the server until it is listening.
+
+        :return: (float) the seconds the server took to start up
+        """
+        deadline: float = self.start_time + self.startup_timeout
+        while self.ready is False:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"the data server exited with {self.process.returncode} before it was ready")
+            if time.time() > deadline:
+                raise TimeoutError(f"the data server was not listening on port {self.port} after "
+                                   f"{self.startup_timeout}s")
+            time.sleep(self.poll_interval)
+        self.ready_time = time.time()
+        return self.startup_seconds
+
+    def stop(self, timeout: float = 10.0) -> Optional[int]:
+        """
+        Stops the process group of the server, asking it to terminate first and killing it if it is still running
+        after the timeout. A server that already exited has any processes left in its group killed.
+
+        :param timeout: (float) the seconds the server is given to exit after being asked to terminate
+        :return: (Optional[int]) the return code of the server
+        """
+        if self.process is None or self.stop_time is not None:
+            return self.return_code
+        # the server leads its session so its process group ID is its process ID
+        try:
+            os.killpg(self.process.pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+        try:
+            self.process.wait(timeout=timeout)
+        except TimeoutExpired:
+            pass
+        try:
+            # anything left in the group, the server too if it ignored the terminate, is killed
+            os.killpg(self.process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        self.return_code = self.process.wait()
+        self.stop_time = time.time()
+        return self.return_code
+
+    def to_dict(self) -> dict:
+        return {
+            "pid": self.pid,
+            "startup_seconds": self.startup_seconds,
+            "seconds": None if self.start_time is None or self.stop_time is None else self.stop_time - self.start_time,
+            "return_code": self.return_code
+        }
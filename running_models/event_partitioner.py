@@ -0,0 +1,154 @@
+"""
+This file splits the events of a model run across modelpy processes by how much footprint each event has rather than
+by how many events each process gets. The size of every event is read from the footprint index and the events are
+dealt out with the longest processing time first algorithm, so no process is left with most of the big events.
+"""
+import heapq
+import os
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from data.footprint_converter import PARQUET_DIRECTORY
+from data.footprint_format import UNCOMPRESSED_SIZE_MASK, FootprintIndex, load_footprint_index, read_footprint_header
+
+
+def events_path(static_path: str) -> str:
+    """
+    Gets the path to the events.bin of a model run, in the input directory next to the static directory.
+
+    :param static_path: (str) the path to the static folder where the data files are housed
+    :return: (str) the path to events.bin
+    """
+    return os.path.join(os.path.dirname(os.path.normpath(os.path.abspath(static_path))), "input", "events.bin")
+
+
+def read_events(path: str) -> np.ndarray:
+    """
+    Reads an events.bin, which is a plain array of int32 event IDs.
+
+    :param path: (str) the path to events.bin
+    :return: (np.ndarray) the event IDs in the order they are in the file
+    """
+    return np.fromfile(path, dtype="<i4")
+
+
+def footprint_event_sizes(static_path: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Reads the uncompressed size of every event in a footprint. The uncompressed footprint index is used if there is
+    one, then the compressed index, then the size of each event's partition of a parquet footprint.
+
+    :param static_path: (str) the path to the static folder where the footprint is housed
+    :return: (Tuple[np.ndarray, np.ndarray]) the event IDs and the size of each event in bytes
+    """
+    idx_path: str = os.path.join(static_path, "footprint.idx")
+    if os.path.isfile(idx_path):
+        index: np.ndarray = load_footprint_index(idx_path, compressed=False)
+        return index["event_id"], index["size"]
+
+    z_idx_path: str = os.path.join(static_path, "footprint.idx.z")
+    if os.path.isfile(z_idx_path):
+        _, options = read_footprint_header(os.path.join(static_path, "footprint.bin.z"))
+        if options & UNCOMPRESSED_SIZE_MASK:
+            index = load_footprint_index(z_idx_path, compressed=True)
+            return index["event_id"], index["d_size"]
+        # without the uncompressed sizes the compressed sizes are the next best measure of an event's work
+        index = np.fromfile(z_idx_path, dtype=FootprintIndex)
+        return index["event_id"], index["size"]
+
+    parquet_path: str = os.path.join(static_path, PARQUET_DIRECTORY)
+    if os.path.isdir(parquet_path):
+        event_ids: List[int] = []
+        sizes: List[int] = []
+        for entry in os.scandir(parquet_path):
+            if entry.is_dir() and entry.name.startswith("event_id="):
+                event_ids.append(int(entry.name.split("=", 1)[1]))
+                sizes.append(sum(file.stat().st_size for file in os.scandir(entry.path) if file.is_file()))
+        return np.asarray(event_ids, dtype=np.int32), np.asarray(sizes, dtype=np.int64)
+    raise FileNotFoundError(f"no footprint index or partitioned parquet footprint in {static_path}")
+
+
+def event_costs(event_ids: np.ndarray, static_path: str) -> np.ndarray:
+    """
+    Looks up the footprint size of each event of a run. Events missing from the footprint still cost a process a
+    little, so they are given the size of the smallest event in the footprint.
+
+    :param event_ids: (np.ndarray) the events of the run
+    :param static_path: (str) the path to the static folder where the footprint is housed
+    :return: (np.ndarray) the cost of each event in the order of event_ids
+    """
+    footprint_ids, sizes = footprint_event_sizes(static_path=static_path)
+    if len(footprint_ids) == 0:
+        return np.ones(len(event_ids), dtype=np.int64)
+    order: np.ndarray = np.argsort(footprint_ids, kind="stable")
+    footprint_ids, sizes = footprint_ids[order], sizes[order]
+    positions: np.ndarray = np.minimum(np.searchsorted(footprint_ids, event_ids), len(footprint_ids) - 1)
+    found: np.ndarray = footprint_ids[positions] == event_ids
+    return np.where(found, sizes[positions], sizes.min()).astype(np.int64)
+
+
+def partition_events(event_ids: np.ndarray, costs: np.ndarray, total_processes: int) -> Tuple[List[np.ndarray],
+                                                                                              np.ndarray]:
+    """
+    Deals events out to processes with the longest processing time first algorithm. The most costly event goes to
+    the process with the least work so far until every event is dealt. The events of each process keep the order they
+    had in the run.
+
+    :param event_ids: (np.ndarray) the events of the run
+    :param costs: (np.ndarray) the cost of each event
+    :param total_processes: (int) the number of processes the events are split across
+    :return: (Tuple[List[np.ndarray], np.ndarray]) the events of every process and the total cost of every process
+    """
+    assignment: np.ndarray = np.empty(len(event_ids), dtype=np.int64)
+    loads: List[Tuple[int, int]] = [(0, process) for process in range(total_processes)]
+    for position in np.argsort(-costs, kind="stable"):
+        load, process = heapq.heappop(loads)
+        assignment[position] = process
+        heapq.heappush(loads, (load + int(costs[position]), process))
+
+    totals: np.ndarray = np.bincount(assignment, weights=costs, minlength=total_processes).astype(np.int64)
+    return [event_ids[assignment == process] for process in range(total_processes)], totals
+
+
+def write_partitions(partitions: List[np.ndarray], output_path: str) -> List[str]:
+    """
+    Writes the events of every process to its own events file in the format eve writes to modelpy.
+
+    :param partitions: (List[np.ndarray]) the events of every process
+    :param output_path: (str) the directory the events files are written to
+    :return: (List[str]) the paths of the events files in process order
+    """
+    paths: List[str] = []
+    for process, events in enumerate(partitions, start=1):
+        path: str = os.path.join(output_path, f"events_{process}.bin")
+        events.astype("<i4").tofile(path)
+        paths.append(path)
+    return paths
+
+
+def predicted_shares(totals: np.ndarray) -> List[float]:
+    """
+    Works out the share of the run's work each process is predicted to do.
+
+    :param totals: (np.ndarray) the total cost of every process
+    :return: (List[float]) the predicted share of every process
+    """
+    total: float = float(totals.sum())
+    return [float(value) / total if total > 0 else 1 / len(totals) for value in totals]
+
+
+def partition_run(static_path: str, total_processes: int, output_path: str,
+                  events_file: Optional[str] = None) -> Tuple[List[str], List[float]]:
+    """
+    Balances the events of a model run across processes by footprint size and writes an events file per process.
+
+    :param static_path: (str) the path to the static folder where the footprint is housed
+    :param total_processes: (int) the number of processes the events are split across
+    :param output_path: (str) the directory the events files are written to
+    :param events_file: (Optional[str]) the events.bin of the run, the one in the input directory if None
+    :return: (Tuple[List[str], List[float]]) the events file and the predicted share of the work of every process
+    """
+    event_ids: np.ndarray = read_events(events_path(static_path) if events_file is None else events_file)
+    partitions, totals = partition_events(event_ids=event_ids, costs=event_costs(event_ids, static_path),
+                                          total_processes=total_processes)
+    return write_partitions(partitions=partitions, output_path=output_path), predicted_shares(totals)
@@ -1,14 +1,115 @@
 """
 This script is for managing files around models to ensure that the right files are present for a model run.
 """
+import errno
+import json
 import os
-from subprocess import Popen
+import shutil
+import signal
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, Tuple
+
+import psutil
+
+OVERLAY_DIRECTORY: str = ".overlays"
+STASH_JOURNAL: str = "stash_journal.json"
+STAGING_PREFIX: str = "model_run_"
+# files bigger than this are copied into a staging area as ranges by several threads at once
+STAGING_RANGE_SIZE: int = 256 * 1024 ** 2
+
+
+def move_path(source_path: str, target_path: str) -> None:
+    """
+    Moves a file or directory. Moves on the same filesystem are a single atomic rename however large the file or
+    directory is, moves across filesystems fall back to copying.
+
+    :param source_path: (str) the path of the file or directory being moved
+    :param target_path: (str) the path it is moved to
+    :return: None
+    """
+    try:
+        os.rename(source_path, target_path)
+    except OSError as error:
+        if error.errno != errno.EXDEV:
+            raise
+        shutil.move(source_path, target_path)
+
+
+def copy_range(source_path: str, target_path: str, offset: int, length: int) -> None:
+    """
+    Copies a range of one file into the same range of another with sendfile, so the data never passes through
+    Python. The target file must already exist. Raises EOFError if the source ends before the range does.
+
+    :param source_path: (str) the path to the file being copied
+    :param target_path: (str) the path to the copy
+    :param offset: (int) the first byte of the range
+    :param length: (int) the number of bytes in the range
+    :return: None
+    """
+    source: int = os.open(source_path, os.O_RDONLY)
+    target: int = os.open(target_path, os.O_WRONLY)
+    try:
+        os.lseek(target, offset, os.SEEK_SET)
+        copied: int = 0
+        while copied < length:
+            sent: int = os.sendfile(target, source, offset + copied, length - copied)
+            if sent == 0:
+                # the target was truncated to its full size up front so a short source would leave zeros behind
+                raise EOFError(f"{source_path} ended after {offset + copied} bytes, {length - copied} bytes short of "
+                               f"the range copied to {target_path}")
+            copied += sent
+    finally:
+        os.close(source)
+        os.close(target)
+
+
+def _process_create_time(pid: int) -> Optional[float]:
+    try:
+        return psutil.Process(pid).create_time()
+    except psutil.NoSuchProcess:
+        return None
+
+
+def _process_running(pid: int, create_time: Optional[float]) -> bool:
+    """
+    Checks if a process is still running. The process ID can have been reused by another process since the process
+    died, so a process with the ID only counts if it was also created at the same time.
+
+    :param pid: (int) the process ID
+    :param create_time: (Optional[float]) when the process was created, None only checks the process ID
+    :return: (bool) True if the process is running
+    """
+    try:
+        process_create_time: float = psutil.Process(pid).create_time()
+    except psutil.NoSuchProcess:
+        return False
+    except psutil.AccessDenied:
+        return True
+    return create_time is None or process_create_time == create_time
+
+
+def _raise_system_exit(signal_number: int, frame) -> None:
+    raise SystemExit(128 + signal_number)
 
 
 class ModelRunFileManager:
     """
     This class is responsible for managing files in the static directory when running a model.
 
+    Files can either be stashed, which moves them out of the shared static directory, or left out of an overlay, which
+    is a throwaway run directory whose static directory only links to the files a run should see. Overlays leave the
+    shared static directory untouched so several runs with different files can happen side by side.
+
+    Files can also be staged, which copies the files a run should see into a RAM backed filesystem such as /dev/shm
+    so the run reads nothing from disk.
+
+    Stashes made with the stashed context manager are journaled. If the process dies before restoring them, the
+    journal is found by the next ModelRunFileManager for the static directory and the files are put back.
+
     Attributes:
         static_path (str): the path to the static folder where the data files are housed
     """
@@ -20,6 +121,11 @@ class ModelRunFileManager:
         """
         self.static_path: str = static_path
         self._establish_file_stash()
+        try:
+            self.recover()
+        except FileExistsError as error:
+            # the journal is kept for someone to resolve, only stashing is blocked until then
+            print(f"the stash of {self.static_path} could not be recovered: {error}")
 
     def _establish_file_stash(self) -> None:
         """
@@ -42,13 +148,9 @@ class ModelRunFileManager:
         stash_file_path: str = str(os.path.join(self.stash_path, file_name))
 
         if os.path.isfile(static_file_path) and file is True:
-            move_process = Popen(f"mv {static_file_path} {stash_file_path}", shell=True)
-            move_process.wait()
+            move_path(static_file_path, stash_file_path)
         elif os.path.isdir(static_file_path) and file is False:
-            copy_process = Popen(f"cp -r {static_file_path} {stash_file_path}", shell=True)
-            copy_process.wait()
-            delete_process = Popen(f"rm -r {static_file_path}", shell=True)
-            delete_process.wait()
+            move_path(static_file_path, stash_file_path)
 
     def get_from_stash(self, file_name: str, file: bool = True) -> None:
         """
@@ -62,13 +164,293 @@ class ModelRunFileManager:
         stash_file_path: str = str(os.path.join(self.stash_path, file_name))
 
         if os.path.isfile(stash_file_path) and file is True:
-            move_process = Popen(f"mv {stash_file_path} {static_file_path}", shell=True)
-            move_process.wait()
+            move_path(stash_file_path, static_file_path)
         elif os.path.isdir(stash_file_path) and file is False:
-            copy_process = Popen(f"cp -r {stash_file_path} {static_file_path}", shell=True)
-            copy_process.wait()
-            delete_process = Popen(f"rm -r {stash_file_path}", shell=True)
-            delete_process.wait()
+            move_path(stash_file_path, static_file_path)
+
+    @property
+    def journal_path(self) -> str:
+        return str(os.path.join(self.stash_path, STASH_JOURNAL))
+
+    def _read_journal(self) -> Optional[dict]:
+        try:
+            with open(self.journal_path, "r") as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return None
+
+    def _write_journal(self, file_names: List[str]) -> None:
+        """
+        Writes the journal of a stash before any file is moved. The journal is written to a temporary file and renamed
+        into place so a crash can never leave a half written journal.
+
+        :param file_names: (List[str]) the files and directories being stashed
+        :return: None
+        """
+        temporary_path: str = self.journal_path + ".tmp"
+        with open(temporary_path, "w") as file:
+            json.dump({"pid": os.getpid(), "create_time": _process_create_time(os.getpid()), "created": time.time(),
+                       "files": file_names}, file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary_path, self.journal_path)
+
+    def _move_all(self, file_names: List[str], to_stash: bool, workers: int) -> List[str]:
+        """
+        Moves files and directories between the static and stash directories concurrently. Files already where they
+        are being moved to are left alone so the move can be repeated after a partial failure.
+
+        :param file_names: (List[str]) the files and directories being moved
+        :param to_stash: (bool) moves into the stash if True and back to the static directory if False
+        :param workers: (int) the number of moves made at the same time
+        :return: (List[str]) the files and directories that were not moved as the place they are moved to was taken
+        """
+        def move(file_name: str) -> bool:
+            static_file_path: str = str(os.path.join(self.static_path, file_name))
+            stash_file_path: str = str(os.path.join(self.stash_path, file_name))
+            source_path, target_path = (static_file_path, stash_file_path) if to_stash is True \
+                else (stash_file_path, static_file_path)
+            if not os.path.lexists(source_path):
+                return True
+            if os.path.lexists(target_path):
+                return False
+            move_path(source_path, target_path)
+            return True
+
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(file_names)))) as executor:
+            # list() so the first failed move is raised once every move has finished
+            moved: List[bool] = list(executor.map(move, file_names))
+        return [file_name for file_name, was_moved in zip(file_names, moved) if was_moved is False]
+
+    def _restore(self, file_names: List[str], workers: int) -> None:
+        """
+        Moves stashed files and directories back to the static directory and removes the journal. If any of them
+        cannot be put back the journal is kept, so the stash is not forgotten while it still holds files.
+
+        :param file_names: (List[str]) the files and directories in the stash
+        :param workers: (int) the number of moves made at the same time
+        :return: None
+        """
+        skipped: List[str] = self._move_all(file_names=file_names, to_stash=False, workers=workers)
+        if len(skipped) > 0:
+            raise FileExistsError(f"{skipped} could not be restored from {self.stash_path} as they are already in "
+                                  f"{self.static_path}, the stash journal is kept until they are resolved")
+        os.remove(self.journal_path)
+
+    def recover(self) -> List[str]:
+        """
+        Rolls back a stash that was left half finished by a process that died before restoring it. Stashes held by a
+        process that is still running are left alone, the process is matched on its ID and when it was created so a
+        reused process ID does not hide a dead stash.
+
+        :return: (List[str]) the files and directories that were put back in the static directory
+        """
+        journal: Optional[dict] = self._read_journal()
+        if journal is None or _process_running(pid=journal["pid"], create_time=journal.get("create_time")):
+            return []
+        self._restore(file_names=journal["files"], workers=len(journal["files"]))
+        return journal["files"]
+
+    @contextmanager
+    def stashed(self, file_names: List[str], workers: int = 8) -> Iterator[List[str]]:
+        """
+        Stashes a set of files and directories as one transaction for the duration of a with block. The stash is
+        journaled before anything is moved, the moves are made concurrently and the files are always put back, even
+        when the block raises or the process is sent SIGTERM.
+
+        :param file_names: (List[str]) the files and directories in the static directory to stash
+        :param workers: (int) the number of moves made at the same time
+        :return: (Iterator[List[str]]) the files and directories that were in the static directory and got stashed
+        """
+        self.recover()
+        journal: Optional[dict] = self._read_journal()
+        if journal is not None:
+            raise RuntimeError(f"{self.static_path} has files stashed by process {journal['pid']}")
+
+        present: List[str] = [file_name for file_name in file_names
+                              if os.path.lexists(os.path.join(self.static_path, file_name))]
+        previous_handler = None
+        if threading.current_thread() is threading.main_thread():
+            previous_handler = signal.signal(signal.SIGTERM, _raise_system_exit)
+
+        self._write_journal(file_names=present)
+        try:
+            try:
+                skipped: List[str] = self._move_all(file_names=present, to_stash=True, workers=workers)
+            except BaseException:
+                self._restore(file_names=present, workers=workers)
+                raise
+            stashed: List[str] = [file_name for file_name in present if file_name not in skipped]
+            if len(skipped) > 0:
+                # files the stash already holds stayed in the static directory, so the run would still see them
+                self._restore(file_names=stashed, workers=workers)
+                raise FileExistsError(f"{skipped} could not be stashed as {self.stash_path} already has them")
+            try:
+                yield stashed
+            finally:
+                self._restore(file_names=stashed, workers=workers)
+        finally:
+            if previous_handler is not None:
+                signal.signal(signal.SIGTERM, previous_handler)
+
+    def create_overlay(self, exclude: Optional[List[str]] = None, link: str = "symlink") -> str:
+        """
+        Builds a throwaway run directory next to the model's run directory. Its static directory links to every file
+        in the static directory apart from the excluded ones, and everything else in the model's run directory, such
+        as the input directory, is symlinked in. Running the model from the overlay means it only sees the chosen
+        files while the shared static directory is left untouched.
+
+        :param exclude: (Optional[List[str]]) the files and directories in the static directory left out of the overlay
+        :param link: (str) either symlink or hardlink, directories are always symlinked
+        :return: (str) the path to the overlay run directory
+        """
+        if link not in ("symlink", "hardlink"):
+            raise ValueError(f"{link} is not symlink or hardlink")
+        exclude = [] if exclude is None else exclude
+        static_path: str = os.path.abspath(self.static_path)
+        run_path: str = os.path.dirname(static_path)
+        overlays_path: str = os.path.join(run_path, OVERLAY_DIRECTORY)
+        os.makedirs(overlays_path, exist_ok=True)
+
+        overlay_path: str = tempfile.mkdtemp(prefix="run_", dir=overlays_path)
+        overlay_static_path: str = os.path.join(overlay_path, os.path.basename(static_path))
+        os.mkdir(overlay_static_path)
+
+        self._link_run_entries(run_path=overlay_path)
+        for entry in self._static_entries(exclude=exclude):
+            target_path: str = os.path.join(overlay_static_path, entry.name)
+            if link == "hardlink" and entry.is_file():
+                os.link(entry.path, target_path)
+            else:
+                os.symlink(entry.path, target_path)
+        return overlay_path
+
+    def _static_entries(self, exclude: List[str]) -> List[os.DirEntry]:
+        stash_name: str = os.path.basename(os.path.normpath(self.stash_path))
+        return [entry for entry in os.scandir(os.path.abspath(self.static_path))
+                if entry.name not in exclude and entry.name != stash_name]
+
+    def _link_run_entries(self, run_path: str) -> None:
+        """
+        Symlinks everything in the model's run directory apart from the static directory, such as the input
+        directory, into another run directory.
+
+        :param run_path: (str) the run directory the entries are linked into
+        :return: None
+        """
+        static_path: str = os.path.abspath(self.static_path)
+        for entry in os.scandir(os.path.dirname(static_path)):
+            if entry.path != static_path and entry.name != OVERLAY_DIRECTORY:
+                os.symlink(entry.path, os.path.join(run_path, entry.name))
+
+    @staticmethod
+    def remove_overlay(overlay_path: str) -> None:
+        """
+        Removes an overlay run directory. Only the links are removed, the files they point to are left alone.
+
+        :param overlay_path: (str) the path returned by create_overlay
+        :return: None
+        """
+        shutil.rmtree(overlay_path)
+
+    @contextmanager
+    def overlay(self, exclude: Optional[List[str]] = None, link: str = "symlink") -> Iterator[str]:
+        """
+        Builds an overlay run directory for the duration of a with block.
+
+        :param exclude: (Optional[List[str]]) the files and directories in the static directory left out of the overlay
+        :param link: (str) either symlink or hardlink, directories are always symlinked
+        :return: (Iterator[str]) the path to the overlay run directory
+        """
+        overlay_path: str = self.create_overlay(exclude=exclude, link=link)
+        try:
+            yield overlay_path
+        finally:
+            self.remove_overlay(overlay_path=overlay_path)
+
+    def create_staging(self, exclude: Optional[List[str]] = None, staging_path: str = "/dev/shm", workers: int = 8,
+                       headroom: float = 0.1) -> str:
+        """
+        Builds a throwaway run directory in a RAM backed filesystem. The files in the static directory apart from the
+        excluded ones are copied into its static directory in parallel and everything else in the model's run
+        directory, such as the input directory, is symlinked in.
+
+        :param exclude: (Optional[List[str]]) the files and directories in the static directory left out of the staging
+        :param staging_path: (str) the RAM backed filesystem the run directory is made in
+        :param workers: (int) the number of files or ranges of files copied at the same time
+        :param headroom: (float) the fraction of the copied size that has to be free on top of the copied size
+        :return: (str) the path to the staged run directory
+        """
+        exclude = [] if exclude is None else exclude
+        copies: List[Tuple[str, str]] = []
+        directories: List[str] = []
+        for entry in self._static_entries(exclude=exclude):
+            if entry.is_dir():
+                for root, _, files in os.walk(entry.path, followlinks=True):
+                    relative_root: str = os.path.relpath(root, self.static_path)
+                    directories.append(relative_root)
+                    copies.extend((os.path.join(root, file), os.path.join(relative_root, file)) for file in files)
+            else:
+                copies.append((entry.path, entry.name))
+
+        required: int = sum(os.path.getsize(source_path) for source_path, _ in copies)
+        available: int = min(psutil.virtual_memory().available, shutil.disk_usage(staging_path).free)
+        if required * (1 + headroom) > available:
+            raise MemoryError(f"staging needs {required} bytes plus {headroom:.0%} headroom but only {available} "
+                              f"bytes are free in {staging_path}")
+
+        run_path: str = tempfile.mkdtemp(prefix=STAGING_PREFIX, dir=staging_path)
+        try:
+            static_path: str = os.path.join(run_path, os.path.basename(os.path.normpath(self.static_path)))
+            os.mkdir(static_path)
+            for directory in directories:
+                os.makedirs(os.path.join(static_path, directory), exist_ok=True)
+            ranges: List[Tuple[str, str, int, int]] = []
+            for source_path, relative_path in copies:
+                target_path: str = os.path.join(static_path, relative_path)
+                size: int = os.path.getsize(source_path)
+                # the copy is sized up front so ranges can be written into it in any order
+                with open(target_path, "wb") as file:
+                    file.truncate(size)
+                ranges.extend((source_path, target_path, offset, min(STAGING_RANGE_SIZE, size - offset))
+                              for offset in range(0, size, STAGING_RANGE_SIZE))
+            with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+                futures = [executor.submit(copy_range, *copy) for copy in ranges]
+                # result() so a failed copy is raised here
+                for future in futures:
+                    future.result()
+            self._link_run_entries(run_path=run_path)
+        except BaseException:
+            shutil.rmtree(run_path, ignore_errors=True)
+            raise
+        return run_path
+
+    @staticmethod
+    def remove_staging(staging_path: str) -> None:
+        """
+        Removes a staged run directory, freeing the memory its copies were using.
+
+        :param staging_path: (str) the path returned by create_staging
+        :return: None
+        """
+        shutil.rmtree(staging_path)
+
+    @contextmanager
+    def staged(self, exclude: Optional[List[str]] = None, staging_path: str = "/dev/shm",
+               workers: int = 8) -> Iterator[str]:
+        """
+        Builds a staged run directory in a RAM backed filesystem for the duration of a with block.
+
+        :param exclude: (Optional[List[str]]) the files and directories in the static directory left out of the staging
+        :param staging_path: (str) the RAM backed filesystem the run directory is made in
+        :param workers: (int) the number of files or ranges of files copied at the same time
+        :return: (Iterator[str]) the path to the staged run directory
+        """
+        run_path: str = self.create_staging(exclude=exclude, staging_path=staging_path, workers=workers)
+        try:
+            yield run_path
+        finally:
+            self.remove_staging(staging_path=run_path)
 
     @property
     def stash_path(self) -> str:
@@ -0,0 +1,503 @@
+"""
+This script is for profiling the memory, CPU, I/O, page faults and context switches of running model processes
+without skewing the timings of the model processes it sits beside.
+"""
+import os
+import time
+from multiprocessing import Event, Process
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import psutil
+
+SampleRecord = np.dtype([
+    ("timestamp", "<f8"), ("pid", "<i4"), ("root_pid", "<i4"), ("rss", "<i8"), ("pss", "<i8"), ("uss", "<i8"),
+    ("cpu_user", "<f8"), ("cpu_system", "<f8"), ("read_bytes", "<i8"), ("write_bytes", "<i8"),
+    ("minor_faults", "<i8"), ("major_faults", "<i8"), ("voluntary_switches", "<i8"), ("involuntary_switches", "<i8")
+])
+MEMORY_METRICS: Tuple[str, ...] = ("rss", "pss", "uss")
+# cumulative counters, their rates are worked out from the difference between samples of the same process
+COUNTER_METRICS: Tuple[str, ...] = (
+    "cpu_user", "cpu_system", "read_bytes", "write_bytes", "minor_faults", "major_faults", "voluntary_switches",
+    "involuntary_switches"
+)
+UNREAD_COUNTERS: Tuple[int, ...] = (-1,) * len(COUNTER_METRICS)
+CLOCK_TICKS: int = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+
+def read_memory(process: psutil.Process, detailed: bool = True) -> Tuple[int, int, int]:
+    """
+    Gets the resident, proportional and unique set sizes of a process. PSS shares each page between the processes
+    mapping it and USS only counts the pages private to the process, so unlike RSS they can be summed across processes
+    that share memory through the data server.
+
+    Args:
+        process: (psutil.Process) the process being checked on
+        detailed: (bool) if set to False only the RSS is read and PSS and USS are returned as -1
+    Returns: (Tuple[int, int, int]) the RSS, PSS and USS of the process in bytes
+    """
+    if detailed is False:
+        return process.memory_info().rss, -1, -1
+    try:
+        with open(f"/proc/{process.pid}/smaps_rollup", "rb") as file:
+            rollup: bytes = file.read()
+    except FileNotFoundError:
+        if not psutil.pid_exists(process.pid):
+            raise psutil.NoSuchProcess(process.pid)
+        # kernels older than 4.14 have no smaps_rollup so fall back to psutil walking smaps
+        memory = process.memory_full_info()
+        return memory.rss, getattr(memory, "pss", -1), getattr(memory, "uss", -1)
+
+    fields: Dict[bytes, int] = dict()
+    for line in rollup.splitlines()[1:]:
+        name, _, value = line.partition(b":")
+        fields[name] = int(value.split()[0]) * 1024
+    uss: int = fields.get(b"Private_Clean", 0) + fields.get(b"Private_Dirty", 0)
+    return fields.get(b"Rss", 0), fields.get(b"Pss", 0), uss
+
+
+def read_counters(process: psutil.Process) -> Tuple[float, float, int, int, int, int, int, int]:
+    """
+    Gets the cumulative CPU time, I/O bytes, page faults and context switches of a process. On Linux these are read
+    straight from /proc/<pid>/stat, status and io, elsewhere psutil is used and the page faults are returned as -1.
+    Counters the profiler is not allowed to read are returned as -1.
+
+    Args:
+        process: (psutil.Process) the process being checked on
+    Returns: (Tuple[float, float, int, int, int, int, int, int]) the user and system CPU seconds, the bytes read and
+             written, the minor and major page faults and the voluntary and involuntary context switches
+    """
+    if not os.path.isdir("/proc"):
+        with process.oneshot():
+            cpu = process.cpu_times()
+            switches = process.num_ctx_switches()
+            try:
+                io = process.io_counters()
+                read_bytes, write_bytes = io.read_bytes, io.write_bytes
+            except (psutil.AccessDenied, AttributeError):
+                read_bytes, write_bytes = -1, -1
+        return cpu.user, cpu.system, read_bytes, write_bytes, -1, -1, switches.voluntary, switches.involuntary
+
+    with open(f"/proc/{process.pid}/stat", "rb") as file:
+        stat: bytes = file.read()
+    # the command name can hold spaces so the fields are counted from after its closing bracket
+    fields: List[bytes] = stat[stat.rfind(b")") + 2:].split()
+    minor_faults, major_faults = int(fields[7]), int(fields[9])
+    cpu_user, cpu_system = int(fields[11]) / CLOCK_TICKS, int(fields[12]) / CLOCK_TICKS
+
+    voluntary, involuntary = -1, -1
+    with open(f"/proc/{process.pid}/status", "rb") as file:
+        for line in file:
+            if line.startswith(b"voluntary_ctxt_switches"):
+                voluntary = int(line.split()[1])
+            elif line.startswith(b"nonvoluntary_ctxt_switches"):
+                involuntary = int(line.split()[1])
+
+    read_bytes, write_bytes = -1, -1
+    try:
+        with open(f"/proc/{process.pid}/io", "rb") as file:
+            for line in file:
+                if line.startswith(b"read_bytes"):
+                    read_bytes = int(line.split()[1])
+                elif line.startswith(b"write_bytes"):
+                    write_bytes = int(line.split()[1])
+    except PermissionError:
+        pass
+
+    return cpu_user, cpu_system, read_bytes, write_bytes, minor_faults, major_faults, voluntary, involuntary
+
+
+class MemoryProfiler(Process):
+    """
+    This class is responsible for sampling and storing the memory and resource usage of the processes of interest.
+
+    Samples are taken at a fixed interval and written into a preallocated NumPy buffer which is spilled to disk when it
+    fills up, so the memory of the profiler stays fixed however long the run is. The profiler stops when stop() is
+    called and writes the samples as columns to an npz file, or a parquet file if the output path ends with .parquet,
+    that can be read with MemoryProfile.load.
+
+    The pids passed in are treated as the roots of process trees. The pids of shell=True pipelines belong to the
+    /bin/sh wrapper, so the descendants of every root are looked up as they appear and sampled under their root.
+
+    Attributes:
+        pids (List[int]): a list of the process IDs that are to be monitored
+        interval (float): the number of seconds between samples
+        output_path (str): the path to the npz file the samples are written to
+        buffer_size (int): the number of samples held in memory before they are spilled to disk
+        follow_children (bool): if the descendants of the pids are sampled as well
+        tree_refresh_interval (float): the number of seconds between looking for new descendants
+        detailed_memory (bool): if PSS and USS are read from smaps_rollup as well as the RSS
+        collect_counters (bool): if CPU time, I/O bytes, page faults and context switches are sampled
+    """
+    def __init__(self, pids: List[int], interval: float = 0.1, output_path: str = "./memory_profile.npz",
+                 buffer_size: int = 65536, follow_children: bool = True, tree_refresh_interval: float = 0.5,
+                 detailed_memory: bool = True, collect_counters: bool = True) -> None:
+        """
+        The constructor for the MemoryProfiler class.
+
+        Args:
+            pids: (List[int]) a list of the process IDs that are to be monitored
+            interval: (float) the number of seconds between samples
+            output_path: (str) the path to the npz file the samples are written to
+            buffer_size: (int) the number of samples held in memory before they are spilled to disk
+            follow_children: (bool) if the descendants of the pids are sampled as well
+            tree_refresh_interval: (float) the number of seconds between looking for new descendants
+            detailed_memory: (bool) if PSS and USS are read from smaps_rollup as well as the RSS
+            collect_counters: (bool) if CPU time, I/O bytes, page faults and context switches are sampled
+        """
+        super().__init__()
+        self.pids: List[int] = pids
+        self.interval: float = interval
+        self.output_path: str = output_path
+        self.buffer_size: int = buffer_size
+        self.follow_children: bool = follow_children
+        self.tree_refresh_interval: float = tree_refresh_interval
+        self.detailed_memory: bool = detailed_memory
+        self.collect_counters: bool = collect_counters
+        self._stop_event = Event()
+        self._roots: Dict[int, psutil.Process] = dict()
+        self._processes: Dict[int, Tuple[psutil.Process, int]] = dict()
+        self._buffer: Optional[np.ndarray] = None
+        self._buffered: int = 0
+        self._spill_file = None
+
+    @property
+    def spill_path(self) -> str:
+        return self.output_path + ".samples"
+
+    def stop(self) -> None:
+        """
+        Tells the profiler to stop sampling and write its data, call join() afterwards to wait for the data.
+
+        Returns: None
+        """
+        self._stop_event.set()
+
+    def _get_processes(self) -> None:
+        """
+        Creates the process handles once so they are not rebuilt on every sample.
+
+        Returns: None
+        """
+        for pid in self.pids:
+            try:
+                self._roots[pid] = psutil.Process(pid)
+                self._processes[pid] = (self._roots[pid], pid)
+            except psutil.NoSuchProcess:
+                pass
+        self._refresh_processes()
+
+    def _refresh_processes(self) -> None:
+        """
+        Adds handles for the descendants of the root processes that have started since the last refresh. Descendants
+        already seen keep their handle, and their root, even if the root exits first.
+
+        Returns: None
+        """
+        if self.follow_children is False:
+            return
+        for root_pid, root in list(self._roots.items()):
+            try:
+                children: List[psutil.Process] = root.children(recursive=True)
+            except psutil.NoSuchProcess:
+                del self._roots[root_pid]
+                continue
+            for child in children:
+                if child.pid not in self._processes:
+                    self._processes[child.pid] = (child, root_pid)
+
+    def _sample(self, timestamp: float) -> None:
+        """
+        Records the memory and resource usage at the current time for every process that is still running.
+
+        Args:
+            timestamp: (float) the number of seconds since the profiler started
+        Returns: None
+        """
+        for pid, (process, root_pid) in list(self._processes.items()):
+            try:
+                memory: Tuple[int, int, int] = read_memory(process=process, detailed=self.detailed_memory)
+                counters: tuple = read_counters(process=process) if self.collect_counters is True else UNREAD_COUNTERS
+            except (psutil.NoSuchProcess, psutil.AccessDenied, FileNotFoundError, ProcessLookupError, PermissionError):
+                del self._processes[pid]
+                continue
+            self._buffer[self._buffered] = (timestamp, pid, root_pid) + memory + counters
+            self._buffered += 1
+            if self._buffered == self.buffer_size:
+                self._spill()
+
+    def _spill(self) -> None:
+        """
+        Appends the buffered samples to the spill file and empties the buffer.
+
+        Returns: None
+        """
+        self._spill_file.write(self._buffer[:self._buffered].tobytes())
+        self._buffered = 0
+
+    def _write_report(self, samples_taken: int, wall_seconds: float, cpu_seconds: float) -> None:
+        """
+        Writes the spilled samples as columns to the npz or parquet file and removes the spill file.
+
+        Args:
+            samples_taken: (int) the number of times the processes were sampled
+            wall_seconds: (float) how long the profiler was sampling for
+            cpu_seconds: (float) the CPU time the profiler used while sampling
+        Returns: None
+        """
+        if os.path.getsize(self.spill_path) > 0:
+            samples: np.ndarray = np.memmap(self.spill_path, dtype=SampleRecord, mode="r")
+        else:
+            samples = np.empty(0, dtype=SampleRecord)
+        meta_data: Dict[str, float] = dict(interval=self.interval, samples_taken=samples_taken,
+                                           wall_seconds=wall_seconds, cpu_seconds=cpu_seconds)
+
+        if self.output_path.endswith(".parquet"):
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            schema = pa.schema([(name, pa.from_numpy_dtype(SampleRecord[name])) for name in SampleRecord.names],
+                               metadata={key: str(value) for key, value in meta_data.items()})
+            with pq.ParquetWriter(self.output_path, schema) as writer:
+                for start in range(0, max(len(samples), 1), self.buffer_size):
+                    chunk: np.ndarray = samples[start: start + self.buffer_size]
+                    writer.write_table(pa.table({name: np.ascontiguousarray(chunk[name])
+                                                 for name in SampleRecord.names}, schema=schema))
+        else:
+            np.savez(self.output_path, **meta_data, **{name: samples[name] for name in SampleRecord.names})
+        del samples
+        os.remove(self.spill_path)
+
+    def run(self) -> None:
+        """
+        Runs when the MemoryProfiler process starts (overwritten from the super().Process class).
+
+        Returns: None
+        """
+        self._get_processes()
+        self._buffer = np.empty(self.buffer_size, dtype=SampleRecord)
+        profiler_process = psutil.Process()
+        start_cpu = profiler_process.cpu_times()
+        start: float = time.monotonic()
+        next_sample: float = start
+        next_refresh: float = start + self.tree_refresh_interval
+        samples_taken: int = 0
+
+        with open(self.spill_path, "wb") as self._spill_file:
+            while not self._stop_event.is_set():
+                if time.monotonic() >= next_refresh:
+                    self._refresh_processes()
+                    next_refresh = time.monotonic() + self.tree_refresh_interval
+                self._sample(timestamp=time.monotonic() - start)
+                samples_taken += 1
+                next_sample += self.interval
+                delay: float = next_sample - time.monotonic()
+                # skip the samples that were missed rather than sampling back to back to catch up
+                if delay < 0:
+                    next_sample = time.monotonic()
+                    delay = 0
+                self._stop_event.wait(delay)
+            self._spill()
+
+        end_cpu = profiler_process.cpu_times()
+        cpu_seconds: float = (end_cpu.user - start_cpu.user) + (end_cpu.system - start_cpu.system)
+        self._write_report(samples_taken=samples_taken, wall_seconds=time.monotonic() - start, cpu_seconds=cpu_seconds)
+
+
+class MemoryProfile:
+    """
+    This class is responsible for loading and summarising the timeline written by the MemoryProfiler.
+
+    Attributes:
+        samples (np.ndarray): the SampleRecord array of every sample taken
+        interval (float): the number of seconds between samples
+        samples_taken (int): the number of times the processes were sampled
+        wall_seconds (float): how long the profiler was sampling for
+        cpu_seconds (float): the CPU time the profiler used while sampling
+    """
+    def __init__(self, samples: np.ndarray, interval: float, samples_taken: int, wall_seconds: float,
+                 cpu_seconds: float) -> None:
+        """
+        The constructor for the MemoryProfile class.
+
+        Args:
+            samples: (np.ndarray) the SampleRecord array of every sample taken
+            interval: (float) the number of seconds between samples
+            samples_taken: (int) the number of times the processes were sampled
+            wall_seconds: (float) how long the profiler was sampling for
+            cpu_seconds: (float) the CPU time the profiler used while sampling
+        """
+        self.samples: np.ndarray = samples
+        self.interval: float = interval
+        self.samples_taken: int = samples_taken
+        self.wall_seconds: float = wall_seconds
+        self.cpu_seconds: float = cpu_seconds
+
+    @classmethod
+    def load(cls, path: str) -> "MemoryProfile":
+        """
+        Loads the data written by the MemoryProfiler.
+
+        Args:
+            path: (str) the path to the npz or parquet file written by the MemoryProfiler
+        Returns: (MemoryProfile) the loaded profile
+        """
+        if path.endswith(".parquet"):
+            import pyarrow.parquet as pq
+            table = pq.read_table(path)
+            samples = np.empty(table.num_rows, dtype=SampleRecord)
+            for name in SampleRecord.names:
+                samples[name] = table.column(name).to_numpy()
+            meta_data: Dict[bytes, bytes] = table.schema.metadata
+            return cls(samples=samples, interval=float(meta_data[b"interval"]),
+                       samples_taken=int(meta_data[b"samples_taken"]), wall_seconds=float(meta_data[b"wall_seconds"]),
+                       cpu_seconds=float(meta_data[b"cpu_seconds"]))
+
+        with np.load(path) as data:
+            samples: np.ndarray = np.empty(len(data["pid"]), dtype=SampleRecord)
+            for name in SampleRecord.names:
+                samples[name] = data[name]
+            return cls(samples=samples, interval=float(data["interval"]), samples_taken=int(data["samples_taken"]),
+                       wall_seconds=float(data["wall_seconds"]), cpu_seconds=float(data["cpu_seconds"]))
+
+    @property
+    def cpu_overhead(self) -> float:
+        """
+        The fraction of a CPU core the profiler used while sampling.
+        """
+        return self.cpu_seconds / self.wall_seconds if self.wall_seconds > 0 else 0.0
+
+    @property
+    def root_pids(self) -> List[int]:
+        return np.unique(self.samples["root_pid"]).tolist()
+
+    def memory(self, pid: int, metric: str = "rss") -> np.ndarray:
+        """
+        Gets the memory used over time by a process.
+
+        Args:
+            pid: (int) the ID of the process
+            metric: (str) one of rss, pss or uss
+        Returns: (np.ndarray) the memory usage of the process at each sample
+        """
+        return self.samples[metric][self.samples["pid"] == pid]
+
+    def peak(self, pid: int, metric: str = "rss") -> int:
+        """
+        Gets the peak memory used by a process.
+
+        Args:
+            pid: (int) the ID of the process
+            metric: (str) one of rss, pss or uss
+        Returns: (int) the peak memory usage of the process, 0 if the process was never sampled
+        """
+        memory: np.ndarray = self.memory(pid=pid, metric=metric)
+        return int(memory.max()) if len(memory) > 0 else 0
+
+    def total_memory(self, metric: str = "rss", root_pid: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Sums the memory of every sampled process at each sample time, either for one pipeline or the whole job.
+
+        Args:
+            metric: (str) one of rss, pss or uss
+            root_pid: (Optional[int]) the root pid of the pipeline to total, the whole job is totalled if None
+        Returns: (Tuple[np.ndarray, np.ndarray]) the sample times and the total memory at each of them
+        """
+        samples: np.ndarray = self.samples
+        if root_pid is not None:
+            samples = samples[samples["root_pid"] == root_pid]
+        timestamps, positions = np.unique(samples["timestamp"], return_inverse=True)
+        return timestamps, np.bincount(positions, weights=samples[metric], minlength=len(timestamps)).astype(np.int64)
+
+    def peak_total(self, metric: str = "rss", root_pid: Optional[int] = None) -> int:
+        """
+        Gets the peak of the summed memory of a pipeline or the whole job.
+
+        Args:
+            metric: (str) one of rss, pss or uss
+            root_pid: (Optional[int]) the root pid of the pipeline, the whole job is used if None
+        Returns: (int) the peak total memory, 0 if nothing was sampled and -1 if the metric was not recorded
+        """
+        if len(self.samples) > 0 and self.samples[metric].min() < 0:
+            return -1
+        _, totals = self.total_memory(metric=metric, root_pid=root_pid)
+        return int(totals.max()) if len(totals) > 0 else 0
+
+    def counter_rates(self, metric: str, root_pid: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Works out the rate of a cumulative counter summed over the processes of a pipeline or the whole job. The
+        activity of a process before its first sample is not counted.
+
+        Args:
+            metric: (str) one of the COUNTER_METRICS
+            root_pid: (Optional[int]) the root pid of the pipeline, the whole job is used if None
+        Returns: (Tuple[np.ndarray, np.ndarray]) the sample times and the rate per second up to each of them
+        """
+        samples: np.ndarray = self.samples
+        if root_pid is not None:
+            samples = samples[samples["root_pid"] == root_pid]
+        timestamps, positions = np.unique(samples["timestamp"], return_inverse=True)
+        if len(timestamps) < 2:
+            return timestamps[1:], np.zeros(0)
+
+        # difference consecutive samples of the same process, the first sample of every process has nothing before it
+        order: np.ndarray = np.lexsort((samples["timestamp"], samples["pid"]))
+        values: np.ndarray = samples[metric][order].astype(np.float64)
+        deltas: np.ndarray = np.diff(values, prepend=values[:1])
+        deltas[np.concatenate(([True], samples["pid"][order][1:] != samples["pid"][order][:-1]))] = 0
+        totals: np.ndarray = np.bincount(positions[order], weights=deltas, minlength=len(timestamps))
+        return timestamps[1:], totals[1:] / np.diff(timestamps)
+
+    def _has_metric(self, metric: str) -> bool:
+        return len(self.samples) > 0 and self.samples[metric].min() >= 0
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """
+        Gets the peak total memory and the totals, mean rates and peak rates of the counters of every pipeline and of
+        the whole job. Metrics that were not recorded are left out.
+
+        Returns: (Dict[str, Dict[str, float]]) key => the root pid or "job", value => the summary of that group
+        """
+        report: Dict[str, Dict[str, float]] = dict()
+        for name, root_pid in [(str(root_pid), root_pid) for root_pid in self.root_pids] + [("job", None)]:
+            samples: np.ndarray = self.samples if root_pid is None else \
+                self.samples[self.samples["root_pid"] == root_pid]
+            duration: float = float(samples["timestamp"].max() - samples["timestamp"].min()) if len(samples) else 0.0
+            group: Dict[str, float] = {"duration": duration}
+            for metric in MEMORY_METRICS:
+                if self._has_metric(metric):
+                    group[f"peak_{metric}"] = self.peak_total(metric=metric, root_pid=root_pid)
+            for metric in COUNTER_METRICS:
+                if not self._has_metric(metric):
+                    continue
+                _, rates = self.counter_rates(metric=metric, root_pid=root_pid)
+                intervals: np.ndarray = np.diff(np.unique(samples["timestamp"]))
+                total: float = float(np.sum(rates * intervals))
+                group[metric] = total
+                group[f"{metric}_rate"] = total / duration if duration > 0 else 0.0
+                group[f"{metric}_peak_rate"] = float(rates.max()) if len(rates) > 0 else 0.0
+            report[name] = group
+        return report
+
+    def print_summary(self) -> None:
+        """
+        Prints the peak memory and the resource usage of every pipeline and of the whole job, and the overhead of the
+        profiler.
+
+        Returns: None
+        """
+        for name, group in self.summary().items():
+            label: str = "whole job" if name == "job" else f"pipeline {name}"
+            print(f"{label} over {group['duration']:.2f}s:")
+            memory: str = " ".join(f"{metric} {group[f'peak_{metric}']}" for metric in MEMORY_METRICS
+                                   if f"peak_{metric}" in group)
+            print(f"    peak memory: {memory}")
+            if "cpu_user" in group:
+                cpu: float = group["cpu_user"] + group["cpu_system"]
+                print(f"    cpu: {cpu:.2f}s (user {group['cpu_user']:.2f}s system {group['cpu_system']:.2f}s), "
+                      f"{group['cpu_user_rate'] + group['cpu_system_rate']:.2f} cores on average")
+            for metric, unit in (("read_bytes", "B"), ("write_bytes", "B"), ("minor_faults", ""),
+                                 ("major_faults", ""), ("voluntary_switches", ""), ("involuntary_switches", "")):
+                if metric in group:
+                    print(f"    {metric}: {group[metric]:.0f}{unit}, {group[f'{metric}_rate']:.1f}{unit}/s on average, "
+                          f"{group[f'{metric}_peak_rate']:.1f}{unit}/s at peak")
+        print(f"the memory profiler used {self.cpu_overhead:.2%} of a core")
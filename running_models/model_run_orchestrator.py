@@ -0,0 +1,132 @@
+"""
+This file runs several oasislmf model runs side by side. Each MDK config gets its own run directory so the outputs of
+concurrent runs never mix, and a manifest records which run directory belongs to which config.
+"""
+import json
+import os
+import shlex
+import shutil
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+# MDK config keys ending in one of these hold paths that are relative to the directory the config was written for
+PATH_KEY_SUFFIXES: tuple = ("_csv", "_json", "_dir", "_path", "_file")
+MANIFEST_FILE: str = "manifest.json"
+
+
+def absolutise_config(config: dict, base_path: str) -> dict:
+    """
+    Makes the relative paths of an MDK config absolute so the config still works from any run directory.
+
+    :param config: (dict) the MDK config
+    :param base_path: (str) the directory the relative paths of the config are relative to
+    :return: (dict) a copy of the config with absolute paths
+    """
+    absolute: dict = dict(config)
+    for key, value in config.items():
+        if isinstance(value, str) and key.endswith(PATH_KEY_SUFFIXES) and not os.path.isabs(value):
+            absolute[key] = os.path.abspath(os.path.join(base_path, value))
+    return absolute
+
+
+class ModelRunOrchestrator:
+    """
+    This class is responsible for running oasislmf model runs concurrently, each in its own run directory.
+
+    Attributes:
+        configs (Dict[str, dict]): the MDK configs keyed by the name of the run
+        runs_path (str): the directory the run directories are made in
+        max_concurrent (int): the largest number of model runs at the same time
+        base_path (str): the directory the relative paths of the configs are relative to
+        extra_args (str): extra arguments passed to oasislmf model run, split as a shell would split them
+        results (Dict[str, dict]): what happened to each run once they have been run
+    """
+    def __init__(self, configs: Dict[str, dict], runs_path: str = "./runs/", max_concurrent: int = 2,
+                 base_path: Optional[str] = None, extra_args: str = "") -> None:
+        """
+        The constructor of the ModelRunOrchestrator.
+
+        :param configs: (Dict[str, dict]) the MDK configs keyed by the name of the run
+        :param runs_path: (str) the directory the run directories are made in
+        :param max_concurrent: (int) the largest number of model runs at the same time
+        :param base_path: (Optional[str]) the directory relative config paths are relative to, the current one if None
+        :param extra_args: (str) extra arguments passed to oasislmf model run
+        """
+        self.configs: Dict[str, dict] = configs
+        self.runs_path: str = os.path.abspath(runs_path)
+        self.max_concurrent: int = max_concurrent
+        self.base_path: str = os.path.abspath(base_path if base_path is not None else os.getcwd())
+        self.extra_args: str = extra_args
+        self.results: Dict[str, dict] = {}
+
+    def run_directory(self, name: str) -> str:
+        return os.path.join(self.runs_path, name)
+
+    def _prepare(self, name: str) -> str:
+        """
+        Makes a clean run directory for a run and writes its config into it.
+
+        :param name: (str) the name of the run
+        :return: (str) the path to the config written for the run
+        """
+        run_directory: str = self.run_directory(name)
+        if os.path.isdir(run_directory):
+            shutil.rmtree(run_directory)
+        os.makedirs(run_directory)
+        config_path: str = os.path.join(run_directory, "mdk_config.json")
+        with open(config_path, "w") as file:
+            json.dump(absolutise_config(config=self.configs[name], base_path=self.base_path), file, indent=2)
+        return config_path
+
+    def _run(self, name: str) -> dict:
+        """
+        Runs one model run, logging its output to the run directory.
+
+        :param name: (str) the name of the run
+        :return: (dict) the run directory, return code and duration of the run
+        """
+        run_directory: str = self.run_directory(name)
+        config_path: str = self._prepare(name)
+        # the arguments are passed without a shell so paths with spaces or shell characters reach oasislmf unchanged
+        command: List[str] = ["oasislmf", "model", "run", "--config", config_path, "--model-run-dir", run_directory,
+                              *shlex.split(self.extra_args)]
+        start: float = time.time()
+        with open(os.path.join(run_directory, "oasislmf.log"), "w") as log:
+            process = subprocess.run(command, cwd=self.base_path, stdout=log, stderr=subprocess.STDOUT)
+        return {
+            "config_path": config_path,
+            "run_directory": run_directory,
+            "output_directory": os.path.join(run_directory, "output"),
+            "return_code": process.returncode,
+            "seconds": time.time() - start
+        }
+
+    def run(self, names: Optional[List[str]] = None) -> Dict[str, dict]:
+        """
+        Runs the model runs with at most max_concurrent at the same time and writes the manifest.
+
+        :param names: (Optional[List[str]]) the runs to run, all of them if None
+        :return: (Dict[str, dict]) what happened to each run keyed by the name of the run
+        """
+        names = list(self.configs.keys()) if names is None else names
+        os.makedirs(self.runs_path, exist_ok=True)
+        with ThreadPoolExecutor(max_workers=max(1, self.max_concurrent)) as executor:
+            for name, result in zip(names, executor.map(self._run, names)):
+                self.results[name] = result
+                print(f"{name} finished with return code {result['return_code']} in {result['seconds']:.1f}s")
+        self.write_manifest()
+        return self.results
+
+    @property
+    def succeeded(self) -> bool:
+        return all(result["return_code"] == 0 for result in self.results.values())
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.runs_path, MANIFEST_FILE)
+
+    def write_manifest(self) -> None:
+        with open(self.manifest_path, "w") as file:
+            json.dump(self.results, file, indent=2)
@@ -0,0 +1,365 @@
+"""
+This file diffs two model output files. Both files are streamed in chunks and hash partitioned on the natural key of
+the output type into temporary files, so only one partition of each file is held in memory when the rows are joined.
+Numeric columns are compared with an absolute and relative tolerance so rounding noise is not reported as a change.
+"""
+import argparse
+import math
+import os
+import pickle
+import tempfile
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# the columns that identify a row in the ktools and ORD outputs, a file's key is the ones it has in this order
+KEY_COLUMNS: List[str] = [
+    "summary_id", "SummaryId", "type", "SampleType", "sidx", "SampleId", "event_id", "EventId", "period_no", "Period",
+    "return_period", "ReturnPeriod", "EPType", "EPCalc"
+]
+OCCURRENCE_COLUMN: str = "_occurrence"
+
+
+def _is_parquet(path: str) -> bool:
+    return path.endswith(".parquet") or os.path.isdir(path)
+
+
+def read_columns(path: str) -> List[str]:
+    """
+    Reads the column names of an output file without reading its rows.
+
+    :param path: (str) the path to the csv or parquet file
+    :return: (List[str]) the column names
+    """
+    if _is_parquet(path):
+        import pyarrow.dataset as ds
+        return ds.dataset(path).schema.names
+    return list(pd.read_csv(path, nrows=0).columns)
+
+
+def read_schema(path: str):
+    """
+    Reads the schema of an output file. The types of a csv file are inferred from its first block by pyarrow.
+
+    :param path: (str) the path to the csv or parquet file
+    :return: (pyarrow.Schema) the names and types of the columns
+    """
+    if _is_parquet(path):
+        import pyarrow.dataset as ds
+        return ds.dataset(path).schema
+    import pyarrow.csv as pv
+    return pv.open_csv(path).schema
+
+
+def iter_output_chunks(path: str, chunk_size: int = 1_000_000) -> Iterator[pd.DataFrame]:
+    """
+    Reads an output file a chunk of rows at a time.
+
+    :param path: (str) the path to the csv or parquet file
+    :param chunk_size: (int) the number of rows in a chunk
+    :return: (Iterator[pd.DataFrame]) the chunks of the file
+    """
+    if _is_parquet(path):
+        import pyarrow.dataset as ds
+        for batch in ds.dataset(path).to_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, index_col=False, chunksize=chunk_size)
+
+
+def natural_key(columns: List[str]) -> List[str]:
+    """
+    Works out the columns that identify a row of an output file from the known key columns it has.
+
+    :param columns: (List[str]) the column names of the file
+    :return: (List[str]) the key columns, empty if the file has none of the known key columns
+    """
+    return [column for column in KEY_COLUMNS if column in columns]
+
+
+def _fallback_key(left_path: str, right_path: str, columns: List[str]) -> List[str]:
+    """
+    Works out the key of files without any of the known key columns, which are keyed on the columns that are integers
+    or strings in the schemas of both files.
+
+    :param left_path: (str) the path to the left csv or parquet file
+    :param right_path: (str) the path to the right csv or parquet file
+    :param columns: (List[str]) the columns in both files
+    :return: (List[str]) the key columns
+    """
+    import pyarrow.types as pa_types
+
+    def is_key_type(data_type) -> bool:
+        return pa_types.is_integer(data_type) or pa_types.is_string(data_type) or pa_types.is_large_string(data_type)
+
+    left_schema = read_schema(left_path)
+    right_schema = read_schema(right_path)
+    return [column for column in columns
+            if is_key_type(left_schema.field(column).type) and is_key_type(right_schema.field(column).type)]
+
+
+def _partition_numbers(chunk: pd.DataFrame, key: List[str], partitions: int) -> np.ndarray:
+    # numeric keys are hashed as float64 so an integer column on one side matches a float column on the other
+    hashable: pd.DataFrame = chunk[key].apply(
+        lambda column: column.astype("float64") if pd.api.types.is_numeric_dtype(column) else column
+    )
+    return (pd.util.hash_pandas_object(hashable, index=False).to_numpy() % partitions).astype(np.int64)
+
+
+def _partition_path(directory: str, side: str, partition: int) -> str:
+    return os.path.join(directory, f"{side}_{partition}.pkl")
+
+
+def _spill(path: str, key: List[str], partitions: int, directory: str, side: str, chunk_size: int) -> int:
+    """
+    Streams an output file into its hash partitions, appending a pickled frame per chunk to each partition file. A
+    partition file is only open while a frame is appended to it.
+
+    :param path: (str) the path to the output file
+    :param key: (List[str]) the key columns the file is partitioned on
+    :param partitions: (int) the number of partitions
+    :param directory: (str) the directory the partition files are written to
+    :param side: (str) left or right, the prefix of the partition files
+    :param chunk_size: (int) the number of rows read at a time
+    :return: (int) the number of rows in the file
+    """
+    rows: int = 0
+    for chunk in iter_output_chunks(path=path, chunk_size=chunk_size):
+        rows += len(chunk)
+        numbers: np.ndarray = _partition_numbers(chunk=chunk, key=key, partitions=partitions)
+        for partition, frame in chunk.groupby(numbers, sort=False):
+            with open(_partition_path(directory=directory, side=side, partition=partition), "ab") as file:
+                pickle.dump(frame, file, protocol=pickle.HIGHEST_PROTOCOL)
+    return rows
+
+
+def _load_partition(path: str, columns: List[str]) -> pd.DataFrame:
+    frames: List[pd.DataFrame] = []
+    # a partition no row was hashed to has no file
+    if os.path.isfile(path):
+        with open(path, "rb") as file:
+            while True:
+                try:
+                    frames.append(pickle.load(file))
+                except EOFError:
+                    break
+    if len(frames) == 0:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(frames, ignore_index=True)
+
+
+def _values_differ(left: pd.Series, right: pd.Series, atol: float, rtol: float) -> np.ndarray:
+    if pd.api.types.is_numeric_dtype(left) and pd.api.types.is_numeric_dtype(right):
+        return ~np.isclose(left.to_numpy(dtype="float64"), right.to_numpy(dtype="float64"),
+                           rtol=rtol, atol=atol, equal_nan=True)
+    both_missing: np.ndarray = (left.isna() & right.isna()).to_numpy()
+    return ~((left.to_numpy() == right.to_numpy()) | both_missing)
+
+
+class OutputDiff:
+    """
+    This class is responsible for holding the result of diffing two output files.
+
+    Attributes:
+        key (List[str]): the columns the rows were joined on
+        left_rows (int): the number of rows in the left file
+        right_rows (int): the number of rows in the right file
+        left_only (int): the number of rows only in the left file
+        right_only (int): the number of rows only in the right file
+        changed (int): the number of rows in both files with at least one value outside the tolerances
+        column_changes (Dict[str, int]): the number of changed values per column
+        max_abs_differences (Dict[str, float]): the largest absolute difference per numeric column
+        left_only_columns (List[str]): the columns only in the left file
+        right_only_columns (List[str]): the columns only in the right file
+        samples (Dict[str, pd.DataFrame]): up to sample_size example rows for left_only, right_only and changed
+    """
+    def __init__(self, key: List[str], sample_size: int) -> None:
+        """
+        The constructor of the OutputDiff.
+
+        :param key: (List[str]) the columns the rows were joined on
+        :param sample_size: (int) the maximum number of example rows kept for each kind of difference
+        """
+        self.key: List[str] = key
+        self.sample_size: int = sample_size
+        self.left_rows: int = 0
+        self.right_rows: int = 0
+        self.left_only: int = 0
+        self.right_only: int = 0
+        self.changed: int = 0
+        self.column_changes: Dict[str, int] = {}
+        self.max_abs_differences: Dict[str, float] = {}
+        self.left_only_columns: List[str] = []
+        self.right_only_columns: List[str] = []
+        self.samples: Dict[str, pd.DataFrame] = {}
+
+    @property
+    def identical(self) -> bool:
+        return self.left_only == 0 and self.right_only == 0 and self.changed == 0 \
+            and len(self.left_only_columns) == 0 and len(self.right_only_columns) == 0
+
+    def _add_sample(self, name: str, rows: pd.DataFrame) -> None:
+        existing: Optional[pd.DataFrame] = self.samples.get(name)
+        if existing is not None and len(existing) >= self.sample_size:
+            return
+        rows = rows.drop(columns=[OCCURRENCE_COLUMN], errors="ignore")
+        combined: pd.DataFrame = rows if existing is None else pd.concat([existing, rows], ignore_index=True)
+        self.samples[name] = combined.head(self.sample_size)
+
+    def add_partition(self, left: pd.DataFrame, right: pd.DataFrame, value_columns: List[str],
+                      atol: float, rtol: float) -> None:
+        """
+        Joins the rows of one partition of each file on the key and adds their differences.
+
+        :param left: (pd.DataFrame) the rows of the partition from the left file
+        :param right: (pd.DataFrame) the rows of the partition from the right file
+        :param value_columns: (List[str]) the columns in both files that are not part of the key
+        :param atol: (float) the absolute tolerance numeric values are compared with
+        :param rtol: (float) the relative tolerance numeric values are compared with
+        :return: None
+        """
+        # rows with the same key are paired up in the order they appear in each file
+        join_key: List[str] = self.key + [OCCURRENCE_COLUMN]
+        left = left.assign(**{OCCURRENCE_COLUMN: left.groupby(self.key, sort=False, dropna=False).cumcount()})
+        right = right.assign(**{OCCURRENCE_COLUMN: right.groupby(self.key, sort=False, dropna=False).cumcount()})
+        joined: pd.DataFrame = left.merge(right, on=join_key, how="outer", suffixes=("_left", "_right"),
+                                          indicator=True)
+
+        left_only: pd.DataFrame = joined[joined["_merge"] == "left_only"]
+        right_only: pd.DataFrame = joined[joined["_merge"] == "right_only"]
+        both: pd.DataFrame = joined[joined["_merge"] == "both"]
+        self.left_only += len(left_only)
+        self.right_only += len(right_only)
+        if len(left_only) > 0:
+            self._add_sample("left_only", left_only[join_key + [f"{c}_left" for c in value_columns]])
+        if len(right_only) > 0:
+            self._add_sample("right_only", right_only[join_key + [f"{c}_right" for c in value_columns]])
+
+        changed: np.ndarray = np.zeros(len(both), dtype=bool)
+        for column in value_columns:
+            left_values: pd.Series = both[f"{column}_left"]
+            right_values: pd.Series = both[f"{column}_right"]
+            differs: np.ndarray = _values_differ(left_values, right_values, atol=atol, rtol=rtol)
+            self.column_changes[column] = self.column_changes.get(column, 0) + int(differs.sum())
+            if pd.api.types.is_numeric_dtype(left_values) and pd.api.types.is_numeric_dtype(right_values) \
+                    and len(both) > 0:
+                difference: float = float(np.nanmax(np.abs(left_values.to_numpy(dtype="float64")
+                                                           - right_values.to_numpy(dtype="float64")), initial=0.0))
+                self.max_abs_differences[column] = max(self.max_abs_differences.get(column, 0.0), difference)
+            changed |= differs
+        self.changed += int(changed.sum())
+        if changed.any():
+            self._add_sample("changed", both.loc[changed].drop(columns=["_merge"]))
+
+    def to_dict(self) -> dict:
+        return {
+            "key": self.key,
+            "identical": self.identical,
+            "left_rows": self.left_rows,
+            "right_rows": self.right_rows,
+            "left_only": self.left_only,
+            "right_only": self.right_only,
+            "changed": self.changed,
+            "column_changes": self.column_changes,
+            "max_abs_differences": self.max_abs_differences,
+            "left_only_columns": self.left_only_columns,
+            "right_only_columns": self.right_only_columns
+        }
+
+    def print_summary(self, name: str = "") -> None:
+        """
+        Prints the counts of the differences and a few example rows of each kind.
+
+        :param name: (str) the name of the output the diff is for
+        :return: None
+        """
+        print(f"left number is {self.left_rows} right number is {self.right_rows}")
+        if self.identical is True:
+            print(f"there is no difference for {name}")
+            return
+        print(f"the difference for {name} joined on {self.key}: {self.left_only} left only, "
+              f"{self.right_only} right only, {self.changed} changed")
+        for side, columns in (("left", self.left_only_columns), ("right", self.right_only_columns)):
+            if len(columns) > 0:
+                print(f"columns only in the {side} file: {columns}")
+        for column, count in self.column_changes.items():
+            if count > 0:
+                print(f"{column}: {count} changed, max absolute difference "
+                      f"{self.max_abs_differences.get(column, math.nan)}")
+        for kind, sample in self.samples.items():
+            print(f"{kind}:")
+            print(sample)
+
+
+def diff_outputs(left_path: str, right_path: str, key: Optional[List[str]] = None, atol: float = 1e-6,
+                 rtol: float = 1e-6, chunk_size: int = 1_000_000, partition_bytes: int = 64 * 1024 ** 2,
+                 sample_size: int = 5, temp_dir: Optional[str] = None) -> OutputDiff:
+    """
+    Diffs two output files with bounded memory. Both files are hash partitioned on the key into temporary files and
+    each pair of partitions is joined on the key, so memory use is set by partition_bytes rather than the file sizes.
+
+    :param left_path: (str) the path to the left csv or parquet file
+    :param right_path: (str) the path to the right csv or parquet file
+    :param key: (Optional[List[str]]) the columns rows are joined on, worked out from the column names if None
+    :param atol: (float) the absolute tolerance numeric values are compared with
+    :param rtol: (float) the relative tolerance numeric values are compared with
+    :param chunk_size: (int) the number of rows read at a time
+    :param partition_bytes: (int) the rough size on disk of the files that goes into a single partition
+    :param sample_size: (int) the maximum number of example rows kept for each kind of difference
+    :param temp_dir: (Optional[str]) where the partitions are written, the system temporary directory if None
+    :return: (OutputDiff) the differences between the files
+    """
+    left_columns: List[str] = read_columns(left_path)
+    right_columns: List[str] = read_columns(right_path)
+    shared_columns: List[str] = [column for column in left_columns if column in right_columns]
+    if key is None:
+        key = natural_key(shared_columns)
+        if len(key) == 0:
+            key = _fallback_key(left_path=left_path, right_path=right_path, columns=shared_columns)
+    if len(key) == 0:
+        raise ValueError(f"no key columns could be found to join {left_path} and {right_path} on")
+
+    result: OutputDiff = OutputDiff(key=key, sample_size=sample_size)
+    result.left_only_columns = [column for column in left_columns if column not in right_columns]
+    result.right_only_columns = [column for column in right_columns if column not in left_columns]
+    value_columns: List[str] = [column for column in shared_columns if column not in key]
+
+    total_bytes: int = sum(_path_size(path) for path in (left_path, right_path))
+    # the partitions are written by path so no files are held open however many partitions there are
+    partitions: int = max(1, math.ceil(total_bytes / partition_bytes))
+
+    with tempfile.TemporaryDirectory(prefix="output_diff_", dir=temp_dir) as directory:
+        result.left_rows = _spill(path=left_path, key=key, partitions=partitions, directory=directory, side="left",
+                                  chunk_size=chunk_size)
+        result.right_rows = _spill(path=right_path, key=key, partitions=partitions, directory=directory,
+                                   side="right", chunk_size=chunk_size)
+        for partition in range(partitions):
+            left: pd.DataFrame = _load_partition(path=_partition_path(directory, "left", partition),
+                                                 columns=left_columns)[shared_columns]
+            right: pd.DataFrame = _load_partition(path=_partition_path(directory, "right", partition),
+                                                  columns=right_columns)[shared_columns]
+            result.add_partition(left=left, right=right, value_columns=value_columns, atol=atol, rtol=rtol)
+    return result
+
+
+def _path_size(path: str) -> int:
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+    return os.path.getsize(path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Diff two model output files")
+    parser.add_argument("left", help="the left csv or parquet file")
+    parser.add_argument("right", help="the right csv or parquet file")
+    parser.add_argument("--key", nargs="+", default=None, help="the columns rows are joined on")
+    parser.add_argument("--atol", type=float, default=1e-6, help="the absolute tolerance")
+    parser.add_argument("--rtol", type=float, default=1e-6, help="the relative tolerance")
+    parser.add_argument("--partition-mb", type=int, default=64, help="the rough size of a partition in megabytes")
+    args = parser.parse_args()
+
+    diff: OutputDiff = diff_outputs(left_path=args.left, right_path=args.right, key=args.key, atol=args.atol,
+                                    rtol=args.rtol, partition_bytes=args.partition_mb * 1024 ** 2)
+    diff.print_summary(name=os.path.basename(args.left))
+    raise SystemExit(0 if diff.identical is True else 1)
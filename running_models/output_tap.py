@@ -0,0 +1,295 @@
+"""
+This script is for tapping the output of modelpy in place of sending it to /dev/null. It reads the stream from stdin in
+large buffers and records a hash of the stream, its bytes, its records and its throughput over time, writing them to a
+JSON report when the stream ends, so a benchmark can check every variant produced the same output.
+
+The output of modelpy is a cdf stream, a 4 byte stream type followed by records of an event ID, areaperil ID,
+vulnerability ID and bin count with a probability and mean per bin. Along with the hash of the whole stream every
+event is hashed on its own and the event hashes are added up, which gives a digest of the output that does not depend
+on how the events were split across pipelines or the order the pipelines were run in. So that the bytes are only
+hashed once, the stream digest of a cdf stream is a hash of its header, its event digests in order and any trailing
+bytes rather than of the bytes themselves, which identifies the stream just as well.
+
+Walking the records is several times slower than only hashing the bytes, so the raw format that only hashes and counts
+the bytes is the default and cdf has to be asked for when the outputs of runs split in different ways are compared. The
+records are found by a tight loop that only steps from one record header to the next, and the event of every record
+and where each event starts are then worked out with numpy over the whole buffer. The script is run by its path, so it
+starts in any run directory:
+
+    modelpy | python output_tap.py --report tap.json --format cdf
+"""
+import argparse
+import hashlib
+import json
+import os
+import shlex
+import struct
+import sys
+import time
+from typing import List, Optional
+
+import numpy as np
+
+BUFFER_SIZE: int = 4 * 1024 ** 2
+STREAM_HEADER_SIZE: int = 4
+# event_id, areaperil_id, vulnerability_id and the number of bins of a cdf record
+CDF_RECORD_HEADER: struct.Struct = struct.Struct("<iIii")
+# the probability and mean of a bin
+CDF_BIN_SIZE: int = 8
+# the records are walked as 4 byte words, every field of a record is 4 bytes
+WORD_SIZE: int = 4
+HEADER_WORDS: int = CDF_RECORD_HEADER.size // WORD_SIZE
+BIN_WORDS: int = CDF_BIN_SIZE // WORD_SIZE
+BIN_COUNT_WORD: int = 3
+DIGEST_SIZE: int = 16
+DIGEST_MODULUS: int = 2 ** (DIGEST_SIZE * 8)
+TAP_SCRIPT: str = os.path.abspath(__file__)
+
+
+def tap_command(report_path: str, stream_format: str = "raw", interval: float = 0.5) -> str:
+    """
+    Builds the command of a tap stage of a pipeline.
+
+    :param report_path: (str) the path the tap writes its report to
+    :param stream_format: (str) either raw or cdf, raw only hashes and counts the bytes
+    :param interval: (float) the seconds between throughput samples
+    :return: (str) the command
+    """
+    return f"{shlex.quote(sys.executable)} {shlex.quote(TAP_SCRIPT)} --report {shlex.quote(report_path)} " \
+           f"--format {stream_format} --interval {interval}"
+
+
+def combine_digests(digests: List[str]) -> str:
+    """
+    Adds up event digests so the result is the same whatever order the events were seen in.
+
+    :param digests: (List[str]) the hex digests
+    :return: (str) the hex digest of all of them
+    """
+    total: int = sum(int(digest, 16) for digest in digests) % DIGEST_MODULUS
+    return f"{total:0{DIGEST_SIZE * 2}x}"
+
+
+class CdfRecordCounter:
+    """
+    This class is responsible for walking the records of a cdf stream as it arrives in buffers, counting them and
+    hashing the bytes of every event.
+
+    Attributes:
+        stream_type (Optional[int]): the type in the header of the stream, None until the header has arrived
+        records (int): the number of complete records seen
+        events (int): the number of events seen, an event split across two pipelines counts twice
+        trailing_bytes (int): the bytes of an incomplete record at the end of the stream, above 0 means truncation
+        stream_digest (Optional[str]): the hex digest of the whole stream in order, None until the stream is finished
+    """
+    def __init__(self) -> None:
+        """
+        The constructor of the CdfRecordCounter.
+        """
+        self.stream_type: Optional[int] = None
+        self.records: int = 0
+        self.events: int = 0
+        self.trailing_bytes: int = 0
+        self.stream_digest: Optional[str] = None
+        self._stream_hash = hashlib.blake2b(digest_size=DIGEST_SIZE)
+        self._pending: bytes = b""
+        self._event_id: Optional[int] = None
+        self._event_hash = None
+        self._digest_total: int = 0
+
+    def _finish_event(self) -> None:
+        if self._event_hash is not None:
+            digest: bytes = self._event_hash.digest()
+            self._stream_hash.update(digest)
+            self._digest_total += int.from_bytes(digest, "big")
+            self._event_hash = None
+
+    @staticmethod
+    def _record_starts(words: memoryview) -> List[int]:
+        """
+        Steps from record to record through the words of a buffer. This is the only part of walking a buffer that is
+        done record by record, as where a record starts depends on the bin count of the record before it.
+
+        :param words: (memoryview) the buffer as 4 byte words starting at the start of a record
+        :return: (List[int]) the word the header of every complete record starts at
+        """
+        starts: List[int] = []
+        append = starts.append
+        # the constants are bound to locals as this loop runs once per record
+        header_words: int = HEADER_WORDS
+        bin_count_word: int = BIN_COUNT_WORD
+        bin_words: int = BIN_WORDS
+        last_header: int = len(words) - header_words
+        position: int = 0
+        while position <= last_header:
+            bin_count: int = words[position + bin_count_word]
+            if bin_count < 0:
+                raise ValueError(f"a cdf record has a bin count of {bin_count} so the stream is not a cdf stream")
+            record_end: int = position + header_words + bin_count * bin_words
+            if record_end > last_header + header_words:
+                break
+            append(position)
+            position = record_end
+        return starts
+
+    def update(self, chunk: memoryview) -> None:
+        """
+        Walks the complete records in a buffer, keeping any incomplete record for the next buffer.
+
+        :param chunk: (memoryview) the next bytes of the stream
+        :return: None
+        """
+        # a buffer is only copied if an incomplete record was left over from the last one
+        data = memoryview(chunk if len(self._pending) == 0 else b"".join((self._pending, chunk))).cast("B")
+        position: int = 0
+        if self.stream_type is None:
+            if len(data) < STREAM_HEADER_SIZE:
+                self._pending = bytes(data)
+                return
+            self.stream_type = struct.unpack_from("<i", data, 0)[0]
+            self._stream_hash.update(data[:STREAM_HEADER_SIZE])
+            position = STREAM_HEADER_SIZE
+
+        word_count: int = (len(data) - position) // WORD_SIZE
+        # the records are walked in native byte order, which is the order modelpy writes them in
+        words: memoryview = data[position:position + word_count * WORD_SIZE].cast("i")
+        starts: np.ndarray = np.array(self._record_starts(words), dtype=np.int64)
+        if len(starts) == 0:
+            self._pending = bytes(data[position:])
+            return
+        last_start: int = int(starts[-1])
+        end: int = position + (last_start + HEADER_WORDS + BIN_WORDS * words[last_start + BIN_COUNT_WORD]) * WORD_SIZE
+        event_ids: np.ndarray = np.frombuffer(words, dtype=np.int32)[starts]
+        self.records += len(starts)
+
+        # the records where the event changes split the buffer into spans of one event each
+        new_events: np.ndarray = np.flatnonzero(event_ids[1:] != event_ids[:-1]) + 1
+        span_starts: List[int] = (position + starts[new_events] * WORD_SIZE).tolist()
+        if self._event_hash is None or int(event_ids[0]) != self._event_id:
+            span_starts.insert(0, position + int(starts[0]) * WORD_SIZE)
+        else:
+            # the first span carries on the event the last buffer ended with
+            self._event_hash.update(data[position:span_starts[0] if len(span_starts) > 0 else end])
+        for span_start, span_end in zip(span_starts, span_starts[1:] + [end]):
+            self._finish_event()
+            self._event_hash = hashlib.blake2b(data[span_start:span_end], digest_size=DIGEST_SIZE)
+            self.events += 1
+        self._event_id = int(event_ids[-1])
+        self._pending = bytes(data[end:])
+
+    def finish(self) -> str:
+        """
+        Finishes the stream, counting whatever is left over as trailing bytes.
+
+        :return: (str) the hex digest of the events of the stream
+        """
+        self._finish_event()
+        self.trailing_bytes = len(self._pending)
+        self._stream_hash.update(self._pending)
+        self.stream_digest = self._stream_hash.hexdigest()
+        return f"{self._digest_total % DIGEST_MODULUS:0{DIGEST_SIZE * 2}x}"
+
+
+def tap_stream(stream, stream_format: str = "raw", interval: float = 0.5) -> dict:
+    """
+    Reads a stream to its end, hashing and counting it.
+
+    :param stream: the binary stream being tapped, such as sys.stdin.buffer
+    :param stream_format: (str) either raw or cdf, raw only hashes and counts the bytes
+    :param interval: (float) the seconds between throughput samples
+    :return: (dict) the hashes, counts and throughput of the stream
+    """
+    if stream_format not in ("cdf", "raw"):
+        raise ValueError(f"{stream_format} is not cdf or raw")
+    counter: Optional[CdfRecordCounter] = CdfRecordCounter() if stream_format == "cdf" else None
+    # a cdf stream is hashed by its counter
+    stream_hash = hashlib.blake2b(digest_size=DIGEST_SIZE) if counter is None else None
+    buffer: bytearray = bytearray(BUFFER_SIZE)
+    view: memoryview = memoryview(buffer)
+    total_bytes: int = 0
+    start_time: float = time.time()
+    first_byte_time: Optional[float] = None
+    # every sample is the seconds since the tap started and the bytes read by then
+    samples: List[List[float]] = []
+    next_sample: float = start_time + interval
+
+    while True:
+        read: int = stream.readinto(buffer)
+        if not read:
+            break
+        now: float = time.time()
+        if first_byte_time is None:
+            first_byte_time = now
+        if counter is None:
+            stream_hash.update(view[:read])
+        else:
+            counter.update(view[:read])
+        total_bytes += read
+        if now >= next_sample:
+            samples.append([now - start_time, total_bytes])
+            next_sample = now + interval
+    event_digest: Optional[str] = None if counter is None else counter.finish()
+    end_time: float = time.time()
+    samples.append([end_time - start_time, total_bytes])
+
+    rates: List[float] = [
+        (later[1] - earlier[1]) / (later[0] - earlier[0])
+        for earlier, later in zip([[0.0, 0]] + samples[:-1], samples) if later[0] > earlier[0]
+    ]
+    streaming_seconds: float = end_time - first_byte_time if first_byte_time is not None else 0.0
+    report: dict = {
+        "format": stream_format,
+        "bytes": total_bytes,
+        "stream_digest": stream_hash.hexdigest() if counter is None else counter.stream_digest,
+        "seconds": end_time - start_time,
+        "first_byte_seconds": None if first_byte_time is None else first_byte_time - start_time,
+        "bytes_per_second": total_bytes / streaming_seconds if streaming_seconds > 0 else None,
+        "peak_bytes_per_second": max(rates) if len(rates) > 0 else None,
+        "samples": samples
+    }
+    if counter is not None:
+        report["event_digest"] = event_digest
+        report["stream_type"] = counter.stream_type
+        report["records"] = counter.records
+        report["events"] = counter.events
+        report["trailing_bytes"] = counter.trailing_bytes
+    return report
+
+
+def summarise_taps(reports: List[dict]) -> dict:
+    """
+    Adds up the tap reports of the pipelines of one run.
+
+    :param reports: (List[dict]) the report of the tap of every pipeline
+    :return: (dict) the bytes, records and digest of the output of the whole run
+    """
+    cdf: bool = all(report["format"] == "cdf" for report in reports)
+    summary: dict = {
+        "bytes": sum(report["bytes"] for report in reports),
+        "pipeline_bytes_per_second": [report["bytes_per_second"] for report in reports],
+        # the stream digests depend on how the events were split so they are only comparable pipeline by pipeline
+        "stream_digests": [report["stream_digest"] for report in reports]
+    }
+    if cdf is True:
+        summary["records"] = sum(report["records"] for report in reports)
+        summary["events"] = sum(report["events"] for report in reports)
+        summary["trailing_bytes"] = sum(report["trailing_bytes"] for report in reports)
+        summary["digest"] = combine_digests([report["event_digest"] for report in reports])
+    else:
+        summary["digest"] = hashlib.blake2b("".join(summary["stream_digests"]).encode(),
+                                            digest_size=DIGEST_SIZE).hexdigest()
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Hashes and counts the output of modelpy read from stdin")
+    parser.add_argument("--report", required=True, help="the path the JSON report is written to")
+    parser.add_argument("--format", choices=("cdf", "raw"), default="raw",
+                        help="raw only hashes and counts the bytes, cdf also walks the records of the stream so its "
+                             "digest does not depend on how the events were split but it is several times slower")
+    parser.add_argument("--interval", type=float, default=0.5, help="the seconds between throughput samples")
+    args = parser.parse_args()
+
+    tap_report: dict = tap_stream(stream=sys.stdin.buffer, stream_format=args.format, interval=args.interval)
+    with open(args.report, "w") as file:
+        json.dump(tap_report, file)
@@ -0,0 +1,97 @@
+"""
+This file puts data files into a known page cache state before a timed run. Cold evicts the files from the page cache
+with posix_fadvise DONTNEED, which needs no root, so the run pays for reading them from disk. Warm reads the files in
+parallel so the run only pays for decoding them.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+CACHE_STATES: tuple = ("none", "cold", "warm")
+READ_CHUNK_SIZE: int = 8 * 1024 ** 2
+# large files are warmed as ranges of this size so one big footprint.bin is read by several threads at once
+WARM_RANGE_SIZE: int = 256 * 1024 ** 2
+
+
+def list_files(static_path: str, file_names: Optional[List[str]] = None) -> List[str]:
+    """
+    Lists the files under the static directory, walking into directories such as footprint.parquet. Symlinks are
+    resolved so the files they point to are the ones whose cache state is set.
+
+    :param static_path: (str) the path to the static folder where the data files are housed
+    :param file_names: (Optional[List[str]]) the files and directories in the static directory, all of them if None
+    :return: (List[str]) the real paths of the files
+    """
+    names: List[str] = os.listdir(static_path) if file_names is None else file_names
+    paths: List[str] = []
+    for name in names:
+        path: str = os.path.realpath(os.path.join(static_path, name))
+        if os.path.isfile(path):
+            paths.append(path)
+        elif os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                paths.extend(os.path.realpath(os.path.join(root, file)) for file in files)
+    return sorted(set(paths))
+
+
+def evict_file(path: str) -> None:
+    """
+    Drops a file's pages from the page cache. Dirty pages cannot be dropped so the file is synced first.
+
+    :param path: (str) the path to the file
+    :return: None
+    """
+    descriptor: int = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(descriptor)
+        os.posix_fadvise(descriptor, 0, 0, os.POSIX_FADV_DONTNEED)
+    finally:
+        os.close(descriptor)
+
+
+def warm_range(path: str, offset: int, length: int) -> int:
+    """
+    Pulls a range of a file into the page cache. The kernel is asked to read ahead the range and the range is then
+    read through so it is resident by the time this returns.
+
+    :param path: (str) the path to the file
+    :param offset: (int) the first byte of the range
+    :param length: (int) the number of bytes in the range
+    :return: (int) the number of bytes read
+    """
+    descriptor: int = os.open(path, os.O_RDONLY)
+    total: int = 0
+    try:
+        os.posix_fadvise(descriptor, offset, length, os.POSIX_FADV_WILLNEED)
+        while total < length:
+            data: bytes = os.pread(descriptor, min(READ_CHUNK_SIZE, length - total), offset + total)
+            if not data:
+                break
+            total += len(data)
+    finally:
+        os.close(descriptor)
+    return total
+
+
+def set_cache_state(paths: List[str], state: str, workers: int = 8) -> None:
+    """
+    Puts files into a page cache state.
+
+    :param paths: (List[str]) the paths to the files
+    :param state: (str) cold evicts the files, warm reads them into the cache and none leaves them alone
+    :param workers: (int) the number of files or ranges of files worked on at the same time
+    :return: None
+    """
+    if state not in CACHE_STATES:
+        raise ValueError(f"{state} is not one of the cache states {CACHE_STATES}")
+    if state == "none" or len(paths) == 0:
+        return
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        if state == "cold":
+            futures = [executor.submit(evict_file, path) for path in paths]
+        else:
+            futures = [executor.submit(warm_range, path, offset, WARM_RANGE_SIZE) for path in paths
+                       for offset in range(0, max(os.path.getsize(path), 1), WARM_RANGE_SIZE)]
+        # result() so an error with any file is raised here
+        for future in futures:
+            future.result()
@@ -0,0 +1,396 @@
+"""
+This script is for launching the eve | modelpy pipelines of a model run and timing them. Every stage of a pipeline is
+its own process connected to the next by a pipe, so the start, end and return code of every stage is known, and the
+pipelines are watched with asyncio so a run can be timed out and a failed pipeline can stop the others.
+"""
+import asyncio
+import os
+import shlex
+import signal
+import time
+from typing import List, Optional, Tuple
+
+from running_models.cpu_profile import profiled_command
+from running_models.output_tap import tap_command
+
+# the characters shlex splits out as operators, any operator other than a pipe or a redirect needs a shell
+SHELL_OPERATOR_CHARACTERS: str = "();<>|&"
+# arguments with any of these characters are expanded by a shell
+SHELL_EXPANSION_CHARACTERS: str = "$*?~`"
+
+
+def build_modelpy_commands(total_processes: int, modelpy_args: str = "", sink: str = "/dev/null",
+                           events_files: Optional[List[str]] = None, tap_reports: Optional[List[str]] = None,
+                           tap_format: str = "raw", profile_outputs: Optional[List[str]] = None) -> List[str]:
+    """
+    Builds one eve | modelpy pipeline command per process. If events files are given each modelpy reads its events
+    from its own file instead of the split eve makes. If tap reports are given the output of each modelpy is piped
+    into an output tap instead of the sink. If profile outputs are given each modelpy is run under cProfile.
+
+    :param total_processes: (int) the number of processes the events are split across
+    :param modelpy_args: (str) the arguments passed to modelpy
+    :param sink: (str) where the output of modelpy is written to
+    :param events_files: (Optional[List[str]]) an events file per process in the format eve writes
+    :param tap_reports: (Optional[List[str]]) the path the tap of each process writes its report to
+    :param tap_format: (str) either raw or cdf, how the taps read the output
+    :param profile_outputs: (Optional[List[str]]) the path each modelpy dumps its cProfile stats to
+    :return: (List[str]) the pipeline commands
+    """
+    for files, kind in ((events_files, "events files"), (tap_reports, "tap reports"),
+                        (profile_outputs, "profile outputs")):
+        if files is not None and len(files) != total_processes:
+            raise ValueError(f"{len(files)} {kind} were given for {total_processes} processes")
+    modelpy: str = f"modelpy {modelpy_args}".strip()
+    programs: List[str] = [modelpy] * total_processes if profile_outputs is None else \
+        [profiled_command(program=modelpy, output_path=output_path) for output_path in profile_outputs]
+    sinks: List[str] = [f"> {sink}"] * total_processes if tap_reports is None else \
+        [f"| {tap_command(report_path=report_path, stream_format=tap_format)}" for report_path in tap_reports]
+    if events_files is not None:
+        return [f"{program} < {events_file} {process_sink}"
+                for program, events_file, process_sink in zip(programs, events_files, sinks)]
+    return [f"eve {process} {total_processes} | {program} {process_sink}"
+            for process, (program, process_sink) in enumerate(zip(programs, sinks), start=1)]
+
+
+def parse_pipeline(command: str) -> Optional[Tuple[List[List[str]], Optional[str], Optional[str]]]:
+    """
+    Splits a shell pipeline into the arguments of its stages and the files its input and output are redirected to.
+
+    :param command: (str) the shell pipeline such as eve 1 4 | modelpy > /dev/null
+    :return: (Optional[Tuple[List[List[str]], Optional[str], Optional[str]]]) the arguments of every stage, the input
+             file and the output file, None if the command uses shell features other than pipes and redirects
+    """
+    lexer = shlex.shlex(command, posix=True, punctuation_chars=True)
+    lexer.whitespace_split = True
+    tokens: List[str] = list(lexer)
+    stages: List[List[str]] = [[]]
+    stdin_path: Optional[str] = None
+    stdout_path: Optional[str] = None
+    position: int = 0
+    while position < len(tokens):
+        token: str = tokens[position]
+        if token == "|":
+            stages.append([])
+        elif token in ("<", ">"):
+            if position + 1 >= len(tokens):
+                return None
+            position += 1
+            if token == "<":
+                stdin_path = tokens[position]
+            else:
+                stdout_path = tokens[position]
+        elif all(character in SHELL_OPERATOR_CHARACTERS for character in token) \
+                or any(character in token for character in SHELL_EXPANSION_CHARACTERS):
+            return None
+        else:
+            stages[-1].append(token)
+        position += 1
+    if any(len(stage) == 0 for stage in stages):
+        return None
+    return stages, stdin_path, stdout_path
+
+
+class StageRecord:
+    """
+    This class is responsible for recording what happened to one stage of a pipeline.
+
+    Attributes:
+        command (str): the command of the stage
+        pid (int): the process ID of the stage
+        start_time (float): when the stage was launched
+        end_time (Optional[float]): when the stage finished
+        return_code (Optional[int]): the return code of the stage, negative if it was killed by a signal
+        shell (bool): if the stage is a shell running the whole command in its own process group
+    """
+    def __init__(self, command: str, process: asyncio.subprocess.Process, start_time: float,
+                 shell: bool = False) -> None:
+        """
+        The constructor of the StageRecord.
+
+        :param command: (str) the command of the stage
+        :param process: (asyncio.subprocess.Process) the process running the stage
+        :param start_time: (float) when the stage was launched
+        :param shell: (bool) if the stage is a shell running the whole command in its own process group
+        """
+        self.command: str = command
+        self.process: asyncio.subprocess.Process = process
+        self.pid: int = process.pid
+        self.start_time: float = start_time
+        self.end_time: Optional[float] = None
+        self.return_code: Optional[int] = None
+        self.shell: bool = shell
+
+    def to_dict(self) -> dict:
+        return {
+            "command": self.command,
+            "pid": self.pid,
+            "seconds": None if self.end_time is None else self.end_time - self.start_time,
+            "return_code": self.return_code
+        }
+
+
+class PipelineLauncher:
+    """
+    This class is responsible for running shell pipelines side by side and recording when every stage of them
+    finishes.
+
+    Pipelines made of plain commands joined by pipes with optional input and output redirects have each stage run as
+    its own process. Anything else is run as a single shell stage.
+
+    Attributes:
+        commands (List[str]): the shell commands of the pipelines
+        cwd (Optional[str]): the directory the pipelines are run in
+        timeout (Optional[float]): the number of seconds the pipelines are given before they are all killed
+        cancel_on_failure (bool): if a failed stage kills every other pipeline
+        start_time (Optional[float]): when the pipelines were launched
+        stages (List[List[StageRecord]]): what happened to every stage of every pipeline
+        timed_out (bool): if the pipelines were killed for running past the timeout
+        cancelled (bool): if the pipelines were killed because one of them failed
+    """
+    def __init__(self, commands: List[str], cwd: Optional[str] = None, timeout: Optional[float] = None,
+                 cancel_on_failure: bool = False) -> None:
+        """
+        The constructor of the PipelineLauncher.
+
+        :param commands: (List[str]) the shell commands of the pipelines
+        :param cwd: (Optional[str]) the directory the pipelines are run in, the current directory if None
+        :param timeout: (Optional[float]) the number of seconds the pipelines are given, None waits forever
+        :param cancel_on_failure: (bool) if set to True a stage failing kills every other pipeline
+        """
+        self.commands: List[str] = commands
+        self.cwd: Optional[str] = cwd
+        self.timeout: Optional[float] = timeout
+        self.cancel_on_failure: bool = cancel_on_failure
+        self.start_time: Optional[float] = None
+        self.stages: List[List[StageRecord]] = []
+        self.timed_out: bool = False
+        self.cancelled: bool = False
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _path(self, path: str) -> str:
+        return path if os.path.isabs(path) or self.cwd is None else os.path.join(self.cwd, path)
+
+    async def _spawn_pipeline(self, command: str) -> List[StageRecord]:
+        """
+        Launches the stages of a pipeline, connecting each stage to the next with a pipe.
+
+        :param command: (str) the shell command of the pipeline
+        :return: (List[StageRecord]) the records of the launched stages
+        """
+        parsed = parse_pipeline(command)
+        if parsed is None:
+            # the shell gets its own process group so killing it also kills the commands it started
+            start_time: float = time.time()
+            process = await asyncio.create_subprocess_shell(command, cwd=self.cwd, start_new_session=True)
+            return [StageRecord(command=command, process=process, start_time=start_time, shell=True)]
+
+        stages, stdin_path, stdout_path = parsed
+        stdin_file = open(self._path(stdin_path), "rb") if stdin_path is not None else None
+        stdout_file = open(self._path(stdout_path), "wb") if stdout_path is not None else None
+        records: List[StageRecord] = []
+        # the pipe ends the parent still has open
+        pipe_ends: List[int] = []
+        read_end = stdin_file
+        try:
+            for position, arguments in enumerate(stages):
+                last: bool = position == len(stages) - 1
+                next_read_end, write_end = (None, stdout_file) if last else os.pipe()
+                if not last:
+                    pipe_ends.extend((next_read_end, write_end))
+                start_time = time.time()
+                process = await asyncio.create_subprocess_exec(*arguments, stdin=read_end, stdout=write_end,
+                                                               cwd=self.cwd)
+                records.append(StageRecord(command=shlex.join(arguments), process=process, start_time=start_time))
+                # the parent's copies of the pipe ends are closed so a stage sees end of file when the one before exits
+                if isinstance(read_end, int):
+                    pipe_ends.remove(read_end)
+                    os.close(read_end)
+                if not last:
+                    pipe_ends.remove(write_end)
+                    os.close(write_end)
+                read_end = next_read_end
+        except BaseException:
+            # a stage that failed to start leaves the stages before it waiting on a pipe nothing will write to or read
+            for pipe_end in pipe_ends:
+                os.close(pipe_end)
+            await self._kill_stages(records)
+            raise
+        finally:
+            for file in (stdin_file, stdout_file):
+                if file is not None:
+                    file.close()
+        return records
+
+    async def _spawn(self) -> None:
+        self.start_time = time.time()
+        self.stages = []
+        try:
+            for command in self.commands:
+                self.stages.append(await self._spawn_pipeline(command))
+        except BaseException:
+            # the pipelines already launched are killed so none are left running when a later one fails to launch
+            await self._kill_stages(self.all_stages)
+            raise
+
+    @staticmethod
+    def _send_kill(records: List[StageRecord]) -> None:
+        for record in records:
+            if record.return_code is None:
+                # os.kill rather than Process.send_signal which polls, and so reaps, the child behind asyncio's back
+                try:
+                    if record.shell is True:
+                        os.killpg(record.pid, signal.SIGKILL)
+                    else:
+                        os.kill(record.pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+
+    def _kill_all(self) -> None:
+        self._send_kill(self.all_stages)
+
+    async def _kill_stages(self, records: List[StageRecord]) -> None:
+        """
+        Kills stages and waits for them to exit so none are left behind as zombies.
+
+        :param records: (List[StageRecord]) the stages being killed
+        :return: None
+        """
+        self._send_kill(records)
+        for record in records:
+            if record.return_code is None:
+                record.return_code = await record.process.wait()
+                record.end_time = time.time()
+
+    async def _watch(self, record: StageRecord) -> None:
+        """
+        Waits for a stage to finish, killing every other stage if it failed and the launcher cancels on failure.
+
+        :param record: (StageRecord) the stage being watched
+        :return: None
+        """
+        record.return_code = await record.process.wait()
+        record.end_time = time.time()
+        if record.return_code != 0 and self.cancel_on_failure is True and self.timed_out is False:
+            self.cancelled = True
+            self._kill_all()
+
+    async def _wait(self) -> None:
+        if len(self.all_stages) == 0:
+            return
+        watchers: List[asyncio.Task] = [asyncio.ensure_future(self._watch(record)) for record in self.all_stages]
+        _, pending = await asyncio.wait(watchers, timeout=self.timeout)
+        if len(pending) > 0:
+            self.timed_out = True
+            self._kill_all()
+            await asyncio.wait(pending)
+
+    def fire(self) -> None:
+        """
+        Launches all of the pipelines.
+
+        :return: None
+        """
+        self._loop = asyncio.new_event_loop()
+        try:
+            self._loop.run_until_complete(self._spawn())
+        except BaseException:
+            self._loop.close()
+            raise
+
+    def wait(self) -> float:
+        """
+        Blocks until every pipeline has finished or been killed, recording the time every stage finished at.
+
+        :return: (float) the number of seconds from launching the pipelines to the last one finishing
+        """
+        try:
+            self._loop.run_until_complete(self._wait())
+        finally:
+            self._loop.close()
+        # no commands means nothing ran, so nothing took any time
+        return max(self.end_times, default=self.start_time) - self.start_time
+
+    def run(self) -> float:
+        """
+        Launches the pipelines and waits for them to finish.
+
+        :return: (float) the number of seconds from launching the pipelines to the last one finishing
+        """
+        self.fire()
+        return self.wait()
+
+    @property
+    def all_stages(self) -> List[StageRecord]:
+        return [record for pipeline in self.stages for record in pipeline]
+
+    @property
+    def pids(self) -> List[int]:
+        return [record.pid for record in self.all_stages]
+
+    @property
+    def pipeline_pids(self) -> List[List[int]]:
+        return [[record.pid for record in pipeline] for pipeline in self.stages]
+
+    @property
+    def end_times(self) -> List[Optional[float]]:
+        return [max(record.end_time for record in pipeline) if all(record.end_time is not None for record in pipeline)
+                else None for pipeline in self.stages]
+
+    @property
+    def return_codes(self) -> List[Optional[int]]:
+        # like pipefail, a pipeline fails with the return code of its first failed stage
+        codes: List[Optional[int]] = []
+        for pipeline in self.stages:
+            stage_codes: List[Optional[int]] = [record.return_code for record in pipeline]
+            codes.append(None if None in stage_codes else next((code for code in stage_codes if code != 0), 0))
+        return codes
+
+    @property
+    def wall_times(self) -> List[float]:
+        return [end_time - self.start_time for end_time in self.end_times]
+
+    @property
+    def succeeded(self) -> bool:
+        return all(return_code == 0 for return_code in self.return_codes)
+
+    def stage_report(self) -> List[List[dict]]:
+        return [[record.to_dict() for record in pipeline] for pipeline in self.stages]
+
+    def spread(self) -> dict:
+        """
+        Works out how far apart the fastest and slowest pipelines finished, which shows how evenly the work was split.
+
+        :return: (dict) the fastest, slowest and mean pipeline seconds, the spread between the slowest and fastest
+                 and the slowest over the mean, zeros and no slowest pipeline if there were no pipelines
+        """
+        wall_times: List[float] = self.wall_times
+        if len(wall_times) == 0:
+            return {"fastest_seconds": 0.0, "slowest_seconds": 0.0, "mean_seconds": 0.0, "spread_seconds": 0.0,
+                    "imbalance": 1.0, "slowest_pipeline": None}
+        mean: float = sum(wall_times) / len(wall_times)
+        return {
+            "fastest_seconds": min(wall_times),
+            "slowest_seconds": max(wall_times),
+            "mean_seconds": mean,
+            "spread_seconds": max(wall_times) - min(wall_times),
+            "imbalance": max(wall_times) / mean if mean > 0 else 1.0,
+            "slowest_pipeline": wall_times.index(max(wall_times))
+        }
+
+    def print_report(self) -> None:
+        """
+        Prints the seconds and return code of every stage of every pipeline and the spread of the pipelines.
+
+        :return: None
+        """
+        for number, pipeline in enumerate(self.stages, start=1):
+            stages: str = " | ".join(f"{record.command} ({record.end_time - record.start_time:.3f}s, "
+                                     f"rc {record.return_code})" for record in pipeline)
+            print(f"pipeline {number}: {stages}")
+        if len(self.stages) == 0:
+            print("there were no pipelines")
+            return
+        spread: dict = self.spread()
+        print(f"fastest {spread['fastest_seconds']:.3f}s slowest {spread['slowest_seconds']:.3f}s "
+              f"spread {spread['spread_seconds']:.3f}s, the slowest pipeline is {spread['imbalance']:.2f}x the mean"
+              + (", timed out" if self.timed_out else "") + (", cancelled after a failure" if self.cancelled else ""))
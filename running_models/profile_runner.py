@@ -0,0 +1,45 @@
+"""
+This script runs a Python console script such as modelpy under cProfile in place of python -m cProfile, which swallows
+the SystemExit of the script so a failing script exits with 0. The stats are dumped however the script ends and the
+script's exit code, or its exception, is passed on so a failed profiled run still fails:
+
+    python profile_runner.py --output modelpy.prof /path/to/modelpy --ignore-file-type z csv
+
+The script only uses the standard library and is run by its path so it works in any environment modelpy is installed in.
+"""
+import argparse
+import cProfile
+import os
+import runpy
+import sys
+from typing import List
+
+
+def run_profiled(script_path: str, arguments: List[str], output_path: str) -> None:
+    """
+    Runs a script as __main__ under cProfile, dumping the stats when it ends. Whatever the script raises, SystemExit
+    included, is raised again once the stats are dumped.
+
+    :param script_path: (str) the path to the script
+    :param arguments: (List[str]) the arguments passed to the script
+    :param output_path: (str) the path the stats are dumped to
+    :return: None
+    """
+    sys.argv = [script_path] + arguments
+    # the script sees its own directory first on the path, as it would if it was run directly
+    sys.path[0] = os.path.dirname(os.path.abspath(script_path))
+    profile = cProfile.Profile()
+    try:
+        profile.runcall(runpy.run_path, script_path, run_name="__main__")
+    finally:
+        profile.dump_stats(output_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Runs a Python script under cProfile keeping its exit code")
+    parser.add_argument("--output", required=True, help="the path the stats are dumped to")
+    parser.add_argument("script", help="the path to the Python script")
+    parser.add_argument("arguments", nargs=argparse.REMAINDER, help="the arguments passed to the script")
+    args = parser.parse_args()
+
+    run_profiled(script_path=args.script, arguments=args.arguments, output_path=args.output)
@@ -1,3 +1,10 @@
+"""
+This script is for comparing the outputs of model runs with hashed group IDs of a portfolio and of the same portfolio
+with locations removed. This script should be run in the root of the model repo:
+
+    PYTHONPATH=/path/to/utils python -m running_models.run_models_with_hashed_group_ids --num-locations 1000
+"""
+import argparse
 import json
 import os
 from pathlib import Path
@@ -6,6 +13,10 @@ from typing import Dict
 
 import pandas as pd
 
+from data.generate_portfolio import PortfolioGenerator
+from running_models.compare_runs import compare_runs, print_report
+from running_models.model_run_orchestrator import ModelRunOrchestrator
+
 mdk_config = {
     "analysis_settings_json": "analysis_settings.json",
     "lookup_data_dir": "keys_data",
@@ -18,23 +29,6 @@ mdk_config = {
 }
 
 
-def get_recent_run_path() -> str:
-    path_string: str = str(Path.cwd()) + "/runs/"
-    path = Path(path_string)
-
-    for directory in [str(f) for f in path.iterdir() if f.is_dir()]:
-        if "losses" in directory:
-            return directory
-
-
-def rename_directory(directory_path: str, new_file_name: str) -> str:
-    buffer = directory_path.split("/")
-    buffer[-1] = new_file_name
-    new_path: str = "/".join(buffer)
-    os.rename(directory_path, new_path)
-    return new_path
-
-
 def get_output_files(run_directory: str) -> Dict[str, str]:
     output_path: str = run_directory + "/output/"
     output = dict()
@@ -51,24 +45,6 @@ def get_output_files(run_directory: str) -> Dict[str, str]:
     return output
 
 
-def compare_data(hash_output_dict: Dict[str, str], none_hash_output_dict: Dict[str, str], key: str) -> None:
-
-    hash_data_path: str = hash_output_dict[key]
-    none_hash_data_path: str = none_hash_output_dict[key]
-
-    hash_df = pd.read_csv(hash_data_path, index_col=False)
-    non_hash_df = pd.read_csv(none_hash_data_path, index_col=False)
-
-    difference = pd.concat([hash_df, non_hash_df]).drop_duplicates(keep=False)
-
-    print(f"left number is {len(hash_df)} right number is {len(non_hash_df)}")
-    if len(difference) > 0:
-        print(f"the difference between hash and none hash for {key} is {len(difference)}")
-        print(difference.head())
-    else:
-        print(f"there is no difference between hash and none hash for {key}")
-
-
 def generate_location_data(remove_location: bool = False) -> pd.DataFrame:
     data = [
         [1,1,1,"Hotel Ronceray Opera",48.874979,2.30887,5150,1000000,0,0,0,"WTC","EUR","FR",10000,500000],
@@ -86,6 +62,14 @@ def generate_location_data(remove_location: bool = False) -> pd.DataFrame:
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare model runs with and without hashed group IDs")
+    parser.add_argument("--num-locations", type=int, default=None,
+                        help="generate a synthetic portfolio of this many locations instead of the three Paris rows")
+    parser.add_argument("--remove-locations", type=int, default=1,
+                        help="the number of locations dropped from the synthetic portfolio for the reduced run")
+    parser.add_argument("--seed", type=int, default=0, help="the seed of the synthetic portfolio")
+    args = parser.parse_args()
+
     # cleanup the previous runs
     main_path: str = str(Path.cwd())
     remove_runs = Popen(f"rm -r ./runs/", shell=True)
@@ -93,42 +77,42 @@ if __name__ == "__main__":
 
     # setup the datasets for locations
     # "oed_location_csv": "tests/location.csv"
-    locations = generate_location_data()
-    reduced_locations = generate_location_data(remove_location=True)
+    if args.num_locations is None:
+        locations = generate_location_data()
+        reduced_locations = generate_location_data(remove_location=True)
 
-    # write the location data
-    locations.to_csv("./tests/full_locations.csv", index=False)
-    reduced_locations.to_csv("./tests/reduced_locations.csv", index=False)
-    mdk_config["oed_location_csv"] = "tests/full_locations.csv"
+        # write the location data
+        locations.to_csv("./tests/full_locations.csv", index=False)
+        reduced_locations.to_csv("./tests/reduced_locations.csv", index=False)
+    else:
+        portfolio = PortfolioGenerator(num_locations=args.num_locations, seed=args.seed)
+        portfolio.write_locations(path="./tests/full_locations.csv")
+        portfolio.write_locations(path="./tests/reduced_locations.csv", remove=args.remove_locations)
+        portfolio.write_accounts(path="./tests/synthetic_accounts.csv")
+        mdk_config["oed_accounts_csv"] = "tests/synthetic_accounts.csv"
 
     # update the local oasislmf pip module
     update_oasislmf = Popen("screw-update-local-oasislmf")
     update_oasislmf.wait()
 
-    # write the new MDK config
-    with open(f"./hash_test_mdk.json", "w") as file:
-        file.write(json.dumps(mdk_config))
-
-    run_model = Popen(f"oasislmf model run --config ./hash_test_mdk.json", shell=True)
-    run_model.wait()
-
-    hash_run_path: str = rename_directory(directory_path=get_recent_run_path(), new_file_name="full_location_run")
-
-    mdk_config["oed_location_csv"] = "tests/reduced_locations.csv"
-
-    with open(f"./none_hash_test_mdk.json", "w") as file:
-        file.write(json.dumps(mdk_config))
-
-    run_model = Popen(f"oasislmf model run --config ./none_hash_test_mdk.json", shell=True)
-    run_model.wait()
-
-    none_hash_run_path: str = rename_directory(directory_path=get_recent_run_path(), new_file_name="reduced_locations_run")
-
-    hashed_outputs = get_output_files(run_directory=hash_run_path)
-    none_hashed_outputs = get_output_files(run_directory=none_hash_run_path)
-
-    for key in hashed_outputs.keys():
-        compare_data(hash_output_dict=hashed_outputs, none_hash_output_dict=none_hashed_outputs, key=key)
-
-    os.remove(f"./hash_test_mdk.json")
-    os.remove(f"./none_hash_test_mdk.json")
+    # each config gets its own run directory so both runs can happen at the same time
+    orchestrator = ModelRunOrchestrator(configs={
+        "full_location_run": {**mdk_config, "oed_location_csv": "tests/full_locations.csv"},
+        "reduced_locations_run": {**mdk_config, "oed_location_csv": "tests/reduced_locations.csv"}
+    }, runs_path="./runs/", max_concurrent=2)
+    runs: Dict[str, dict] = orchestrator.run()
+    if orchestrator.succeeded is False:
+        # a failed run may not have written its output so there is nothing to compare
+        for name, run in runs.items():
+            if run["return_code"] != 0:
+                print(f"{name} failed with return code {run['return_code']}, see "
+                      f"{os.path.join(run['run_directory'], 'oasislmf.log')}")
+        raise SystemExit(1)
+
+    hash_run_path: str = runs["full_location_run"]["run_directory"]
+    none_hash_run_path: str = runs["reduced_locations_run"]["run_directory"]
+
+    comparison: dict = compare_runs(left_run=hash_run_path, right_run=none_hash_run_path,
+                                    file_names=list(get_output_files(run_directory=hash_run_path).keys()))
+    print_report(comparison)
+    raise SystemExit(0 if comparison["identical"] is True else 1)
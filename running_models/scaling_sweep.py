@@ -0,0 +1,202 @@
+"""
+This script is for measuring how a model run scales with the number of eve | modelpy pipelines. The same variant is
+run with 1, 2, 4 ... N pipelines and the speedup, parallel efficiency and throughput of each process count are
+reported with the serial fraction of Amdahl's law fitted to the speedups. This script should be run in the same
+directory as the model data, with the root of this repo on the python path:
+
+    PYTHONPATH=/path/to/utils python -m running_models.scaling_sweep --max-processes 16
+"""
+import argparse
+import json
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from running_models.benchmark import BenchmarkRunner, Scenario, Variant
+from running_models.event_partitioner import events_path
+
+
+def process_counts(max_processes: int) -> List[int]:
+    """
+    Builds the process counts of a sweep, the powers of two up to the maximum and the maximum itself.
+
+    :param max_processes: (int) the largest number of pipelines
+    :return: (List[int]) the process counts in ascending order
+    """
+    counts: List[int] = [2 ** power for power in range(max_processes.bit_length()) if 2 ** power <= max_processes]
+    if counts[-1] != max_processes:
+        counts.append(max_processes)
+    return counts
+
+
+def count_events(static_path: str) -> Optional[int]:
+    """
+    Counts the events of a model run from the events.bin in the input directory next to the static directory.
+
+    :param static_path: (str) the path to the static folder where the data files are housed
+    :return: (Optional[int]) the number of events, None if there is no events.bin
+    """
+    path: str = events_path(static_path=static_path)
+    if not os.path.isfile(path):
+        return None
+    # events.bin is a plain array of int32 event IDs
+    return os.path.getsize(path) // 4
+
+
+def fit_serial_fraction(counts: List[int], speedups: List[float]) -> Optional[float]:
+    """
+    Fits the serial fraction s of Amdahl's law, 1 / speedup = s + (1 - s) / n, to the measured speedups by least
+    squares.
+
+    :param counts: (List[int]) the process counts
+    :param speedups: (List[float]) the speedup over a single pipeline of each process count
+    :return: (Optional[float]) the serial fraction between 0 and 1, None if there are no counts above one
+    """
+    n: np.ndarray = np.asarray(counts, dtype=np.float64)
+    s: np.ndarray = np.asarray(speedups, dtype=np.float64)
+    keep: np.ndarray = n > 1
+    if not keep.any():
+        return None
+    # rearranged to 1 / speedup - 1 / n = s * (1 - 1 / n) which is a line through the origin
+    x: np.ndarray = 1 - 1 / n[keep]
+    y: np.ndarray = 1 / s[keep] - 1 / n[keep]
+    return float(np.clip(np.sum(x * y) / np.sum(x * x), 0.0, 1.0))
+
+
+def scaling_scenario(variant: Variant, counts: List[int], name: Optional[str] = None, **scenario_options) -> Scenario:
+    """
+    Builds a scenario with one copy of a variant per process count, the single pipeline copy being the baseline.
+
+    :param variant: (Variant) the variant being swept, its total_processes is ignored
+    :param counts: (List[int]) the process counts swept
+    :param name: (Optional[str]) the name of the scenario, defaults to <variant name>_scaling
+    :param scenario_options: the other arguments of the Scenario
+    :return: (Scenario) the scenario of the sweep
+    """
+    variants: List[Variant] = [
+        Variant(name=f"{variant.name}_x{count}", footprint_files=variant.footprint_files,
+                modelpy_args=variant.modelpy_args, data_server=variant.data_server, total_processes=count,
+                partitioning=variant.partitioning, storage=variant.storage)
+        for count in sorted(counts)
+    ]
+    return Scenario(name=f"{variant.name}_scaling" if name is None else name, variants=variants, **scenario_options)
+
+
+def build_scaling_report(report: dict, static_path: str) -> dict:
+    """
+    Works out the speedup, efficiency and throughput of every process count from the report of a sweep.
+
+    :param report: (dict) the report of the scaling scenario built by the BenchmarkRunner
+    :param static_path: (str) the path to the static folder where the data files are housed
+    :return: (dict) the scaling of every process count and the fitted serial fraction
+    """
+    events: Optional[int] = count_events(static_path=static_path)
+    baseline_seconds: Optional[float] = report["variants"][report["baseline"]]["wall_seconds"].get("median")
+    baseline_count: int = report["variants"][report["baseline"]]["variant"]["total_processes"]
+
+    rows: List[Dict[str, Optional[float]]] = []
+    for name, variant in report["variants"].items():
+        count: int = variant["variant"]["total_processes"]
+        median: Optional[float] = variant["wall_seconds"].get("median")
+        pipeline_peaks: List[float] = [peak for run in report["runs"] if run["label"] == name and not run["warmup"]
+                                       for peak in run.get("pipeline_peak_pss", []) if peak is not None]
+        row: Dict[str, Optional[float]] = {
+            "variant": name,
+            "processes": count,
+            "median_seconds": median,
+            "speedup": None,
+            "efficiency": None,
+            "karp_flatt": None,
+            "events_per_second": events / median if events is not None and median else None,
+            "mean_pipeline_peak_pss": float(np.mean(pipeline_peaks)) if len(pipeline_peaks) > 0 else None,
+            "max_pipeline_peak_pss": float(np.max(pipeline_peaks)) if len(pipeline_peaks) > 0 else None,
+            "median_peak_pss": variant["median_peak_pss"]
+        }
+        if median and baseline_seconds:
+            # speedups are relative to the smallest count so a sweep that does not start at one still works
+            speedup: float = baseline_seconds / median * baseline_count
+            row["speedup"] = speedup
+            row["efficiency"] = speedup / count
+            if count > 1:
+                # the Karp-Flatt metric is the serial fraction implied by a single count, rising means saturation
+                row["karp_flatt"] = (1 / speedup - 1 / count) / (1 - 1 / count)
+        rows.append(row)
+
+    measured: List[dict] = [row for row in rows if row["speedup"] is not None]
+    return {
+        "events": events,
+        "serial_fraction": fit_serial_fraction(counts=[row["processes"] for row in measured],
+                                               speedups=[row["speedup"] for row in measured]),
+        "process_counts": rows
+    }
+
+
+def print_scaling_report(scaling: dict) -> None:
+    """
+    Prints the scaling of every process count.
+
+    :param scaling: (dict) the report built by build_scaling_report
+    :return: None
+    """
+    print(f"{'processes':>9} {'median s':>10} {'speedup':>8} {'efficiency':>10} {'karp-flatt':>10} "
+          f"{'events/s':>10} {'peak pss/pipeline':>18}")
+    for row in scaling["process_counts"]:
+        def show(value: Optional[float], width: int, digits: int = 3) -> str:
+            return f"{value:>{width}.{digits}f}" if value is not None else f"{'-':>{width}}"
+        print(f"{row['processes']:>9} {show(row['median_seconds'], 10)} {show(row['speedup'], 8, 2)} "
+              f"{show(row['efficiency'], 10, 2)} {show(row['karp_flatt'], 10)} "
+              f"{show(row['events_per_second'], 10, 1)} {show(row['mean_pipeline_peak_pss'], 18, 0)}")
+    if scaling["serial_fraction"] is not None:
+        serial: float = scaling["serial_fraction"]
+        limit: str = f", so the speedup is capped at {1 / serial:.1f}x" if serial > 0 else ""
+        print(f"fitted serial fraction {serial:.4f}{limit}")
+
+
+def run_sweep(variant: Variant, max_processes: int, counts: Optional[List[int]] = None, **scenario_options) -> dict:
+    """
+    Runs a scaling sweep of a variant and adds the scaling to its report.
+
+    :param variant: (Variant) the variant being swept
+    :param max_processes: (int) the largest number of pipelines, ignored if counts is given
+    :param counts: (Optional[List[int]]) the process counts swept, powers of two up to max_processes if None
+    :param scenario_options: the other arguments of the Scenario
+    :return: (dict) the report of the sweep with its scaling under the scaling key
+    """
+    scenario: Scenario = scaling_scenario(variant=variant,
+                                          counts=process_counts(max_processes) if counts is None else counts,
+                                          **scenario_options)
+    report: dict = BenchmarkRunner(scenario=scenario).run()
+    report["scaling"] = build_scaling_report(report=report, static_path=scenario.static_path)
+    with open(scenario.report_path, "w") as file:
+        json.dump(report, file, indent=4)
+    print_scaling_report(scaling=report["scaling"])
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sweeps the number of eve | modelpy pipelines of a model run")
+    parser.add_argument("--max-processes", type=int, default=os.cpu_count(), help="the largest number of pipelines")
+    parser.add_argument("--counts", type=int, nargs="+", default=None, help="the process counts, overrides the max")
+    parser.add_argument("--name", default="modelpy", help="the name of the variant being swept")
+    parser.add_argument("--footprint-files", nargs="+", default=None, help="the footprint files left in static")
+    parser.add_argument("--modelpy-args", default="", help="the arguments passed to modelpy")
+    parser.add_argument("--data-server", action="store_true", help="serves the data to modelpy with servedata")
+    parser.add_argument("--partitioning", choices=("eve", "footprint"), default="eve",
+                        help="splits the events with eve or balances them by footprint size")
+    parser.add_argument("--storage", choices=("disk", "ram"), default="disk",
+                        help="runs on the static directory or on a copy of it staged in memory")
+    parser.add_argument("--static-path", default="./static/", help="the directory housing the model data")
+    parser.add_argument("--repetitions", type=int, default=3, help="the measured runs per process count")
+    parser.add_argument("--warmup", type=int, default=1, help="the warm up runs per process count")
+    parser.add_argument("--seed", type=int, default=None, help="the seed of the run order")
+    parser.add_argument("--report", default=None, help="the path the JSON report is written to")
+    args = parser.parse_args()
+
+    run_sweep(
+        variant=Variant(name=args.name, footprint_files=args.footprint_files, modelpy_args=args.modelpy_args,
+                        data_server=args.data_server, partitioning=args.partitioning,
+                        storage=args.storage),
+        max_processes=args.max_processes, counts=args.counts, static_path=args.static_path,
+        repetitions=args.repetitions, warmup=args.warmup, seed=args.seed, report_path=args.report
+    )
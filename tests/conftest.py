@@ -0,0 +1,7 @@
+"""
+Shared set up of the tests. The repo is not installed so its root is put on the path, as running python -m from it does.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,147 @@
+"""
+Tests the report of the benchmark runner, on its own and from end to end with a fake eve and modelpy on the path.
+"""
+import json
+import os
+import sys
+from typing import List, Optional
+
+import pytest
+
+from running_models.benchmark import BenchmarkRunner, Scenario, Variant
+
+
+def build_runner(tmp_path, output_tap: Optional[str], variants: List[Variant]) -> BenchmarkRunner:
+    static_path = tmp_path / "static"
+    static_path.mkdir(exist_ok=True)
+    scenario = Scenario(name="outputs", variants=variants, static_path=str(static_path), repetitions=1, warmup=0,
+                        profile_memory=False, output_tap=output_tap, report_path=str(tmp_path / "report.json"))
+    return BenchmarkRunner(scenario=scenario)
+
+
+def tapped_run(variant: str, digest: Optional[str], warmup: bool = False) -> dict:
+    return {
+        "variant": variant, "label": variant, "warmup": warmup, "succeeded": True, "wall_seconds": 1.0,
+        "peak_pss": None, "pipeline_imbalance": 1.0, "server": None,
+        "output": None if digest is None else {"digest": digest}
+    }
+
+
+@pytest.mark.parametrize("output_tap, digests, expected", [
+    # raw digests of runs split differently are not compared
+    ("raw", ("a", "a", "b"), True),
+    ("raw", ("a", "c", "b"), False),
+    # cdf digests do not depend on the split so every run has to agree
+    ("cdf", ("a", "a", "b"), False),
+    ("cdf", ("a", "a", "a"), True),
+])
+def test_outputs_are_compared_within_comparable_splits(tmp_path, output_tap, digests, expected):
+    variants: List[Variant] = [Variant(name="base", total_processes=4), Variant(name="same", total_processes=4),
+                               Variant(name="wide", total_processes=8)]
+    runner: BenchmarkRunner = build_runner(tmp_path, output_tap=output_tap, variants=variants)
+    runner.runs = [tapped_run(variant=variant.name, digest=digest) for variant, digest in zip(variants, digests)]
+    assert runner.build_report()["outputs_identical"] is expected
+
+
+def test_partitioning_changes_the_raw_split(tmp_path):
+    variants: List[Variant] = [Variant(name="eve"), Variant(name="footprint", partitioning="footprint")]
+    runner: BenchmarkRunner = build_runner(tmp_path, output_tap="raw", variants=variants)
+    runner.runs = [tapped_run(variant="eve", digest="a"), tapped_run(variant="footprint", digest="b")]
+    assert runner.build_report()["outputs_identical"] is True
+    runner.runs.append(tapped_run(variant="footprint", digest="c"))
+    assert runner.build_report()["outputs_identical"] is False
+
+
+def test_untapped_runs_are_not_identical(tmp_path):
+    runner: BenchmarkRunner = build_runner(tmp_path, output_tap="raw", variants=[Variant(name="base")])
+    runner.runs = [tapped_run(variant="base", digest="a"), tapped_run(variant="base", digest=None)]
+    assert runner.build_report()["outputs_identical"] is False
+    # warm up runs are left out
+    runner.runs = [tapped_run(variant="base", digest="a"), tapped_run(variant="base", digest="b", warmup=True)]
+    assert runner.build_report()["outputs_identical"] is True
+
+
+# eve deals the events 1 to 12 out to the processes in turn, as the real eve splits the events of a run
+FAKE_EVE: str = """#!{interpreter}
+import struct
+import sys
+
+process, total_processes = int(sys.argv[1]), int(sys.argv[2])
+events = range(process, 13, total_processes)
+sys.stdout.buffer.write(struct.pack(f"<{{len(events)}}i", *events))
+"""
+
+# modelpy writes a cdf stream with a record per event, --shift changes the output and --fail fails after it
+FAKE_MODELPY: str = """#!{interpreter}
+import struct
+import sys
+
+data = sys.stdin.buffer.read()
+shift = 1 if "--shift" in sys.argv else 0
+sys.stdout.buffer.write(struct.pack("<i", 1))
+for (event_id,) in struct.iter_unpack("<i", data):
+    sys.stdout.buffer.write(struct.pack("<iIiiff", event_id, 1, 1, 1, 1.0, event_id + shift))
+sys.exit(1 if "--fail" in sys.argv else 0)
+"""
+
+
+@pytest.fixture
+def fake_model(tmp_path, monkeypatch) -> str:
+    bin_path = tmp_path / "bin"
+    bin_path.mkdir()
+    for name, script in (("eve", FAKE_EVE), ("modelpy", FAKE_MODELPY)):
+        path = bin_path / name
+        path.write_text(script.format(interpreter=sys.executable))
+        path.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{bin_path}{os.pathsep}{os.environ['PATH']}")
+    static_path = tmp_path / "static"
+    static_path.mkdir()
+    (static_path / "footprint.bin").write_bytes(b"footprint")
+    return str(static_path)
+
+
+def run_scenario(tmp_path, static_path: str, variants: List[Variant], output_tap: Optional[str]) -> dict:
+    scenario = Scenario(name="fake", variants=variants, static_path=static_path, repetitions=2, warmup=1, seed=1,
+                        output_tap=output_tap, report_path=str(tmp_path / "report.json"))
+    report: dict = BenchmarkRunner(scenario=scenario).run()
+    with open(scenario.report_path) as file:
+        assert json.load(file) == json.loads(json.dumps(report))
+    return report
+
+
+@pytest.mark.parametrize("output_tap", ["raw", "cdf"])
+def test_scenario_is_run_and_reported(fake_model, tmp_path, output_tap):
+    variants: List[Variant] = [Variant(name="four", total_processes=4), Variant(name="two", total_processes=2)]
+    report: dict = run_scenario(tmp_path, static_path=fake_model, variants=variants, output_tap=output_tap)
+
+    assert {"scenario", "repetitions", "warmup", "shuffle", "seed", "cache_states", "baseline", "output_tap",
+            "outputs_identical", "variants", "profiles", "runs"} <= set(report.keys())
+    assert report["baseline"] == "four"
+    assert len(report["runs"]) == 2 * (1 + 2)
+    assert all(run["succeeded"] is True for run in report["runs"])
+    for name, processes in (("four", 4), ("two", 2)):
+        variant: dict = report["variants"][name]
+        assert variant["variant"]["total_processes"] == processes
+        assert variant["wall_seconds"]["runs"] == 2
+        assert variant["failed_runs"] == 0
+        assert variant["median_peak_pss"] > 0
+        assert len(variant["output_digests"]) == 1
+    assert report["variants"]["four"]["against_baseline"] == {}
+    assert report["variants"]["two"]["against_baseline"]["median_ratio"] > 0
+    # both splits produce the same events, which the cdf digest sees but the raw digest does not
+    assert report["outputs_identical"] is True
+    digests: set = {report["variants"][name]["output_digests"][0] for name in ("four", "two")}
+    assert len(digests) == (1 if output_tap == "cdf" else 2)
+
+
+def test_a_changed_output_or_a_failure_is_reported(fake_model, tmp_path):
+    variants: List[Variant] = [Variant(name="base", total_processes=2),
+                               Variant(name="shifted", total_processes=2, modelpy_args="--shift"),
+                               Variant(name="failing", total_processes=2, modelpy_args="--fail")]
+    report: dict = run_scenario(tmp_path, static_path=fake_model, variants=variants, output_tap="cdf")
+    assert report["outputs_identical"] is False
+    assert report["variants"]["base"]["output_digests"] != report["variants"]["shifted"]["output_digests"]
+    failing: dict = report["variants"]["failing"]
+    assert failing["failed_runs"] == 2
+    assert failing["wall_seconds"] == {"runs": 0}
+    assert failing["against_baseline"] == {}
@@ -0,0 +1,64 @@
+"""
+Tests the permutation test and the regression checks of the benchmark history.
+"""
+from typing import List
+
+import pytest
+
+from running_models.benchmark_history import BenchmarkHistory, minimum_p_value, permutation_test
+
+
+def report(wall_seconds: dict) -> dict:
+    return {
+        "scenario": "bin_vs_parquet",
+        "variants": {label: {"variant": {"name": label}} for label in wall_seconds},
+        "runs": [
+            {"label": label, "cache_state": "warm", "round": position, "warmup": False, "succeeded": True,
+             "wall_seconds": seconds, "peak_rss": 1, "peak_pss": 1}
+            for label, values in wall_seconds.items() for position, seconds in enumerate(values)
+        ]
+    }
+
+
+# the medians of other splits can differ as much as the observed split so the p values are above 1 / comb(n, k)
+@pytest.mark.parametrize("sizes, expected", [((3, 3), 2 / 20), ((5, 5), 6 / 252), ((2, 2), 1 / 6), ((1, 1), 1 / 2)])
+def test_exact_p_value_of_a_clear_shift_is_the_smallest_possible(sizes, expected):
+    baseline: List[float] = [10.0 + index for index in range(sizes[0])]
+    candidate: List[float] = [20.0 + index for index in range(sizes[1])]
+    assert permutation_test(baseline, candidate) == pytest.approx(expected)
+    assert minimum_p_value(*sizes) == pytest.approx(expected)
+
+
+def test_no_shift_is_not_significant():
+    assert permutation_test([1.0, 2.0, 3.0, 4.0], [1.0, 2.0, 3.0, 4.0]) > 0.4
+    # a faster candidate is not a regression
+    assert permutation_test([20.0, 21.0, 22.0], [10.0, 11.0, 12.0]) == 1.0
+
+
+def test_random_splits_never_give_zero():
+    baseline: List[float] = [10.0 + index for index in range(12)]
+    candidate: List[float] = [30.0 + index for index in range(12)]
+    p_value: float = permutation_test(baseline, candidate, resamples=1000, seed=3)
+    assert p_value == pytest.approx(1 / 1001)
+    assert minimum_p_value(12, 12, resamples=1000) == pytest.approx(1 / 1001)
+
+
+def test_five_against_five_can_regress_at_five_percent(tmp_path):
+    with BenchmarkHistory(path=str(tmp_path / "history.sqlite")) as history:
+        baseline: int = history.record(report({"bin": [10.0, 10.1, 10.2, 10.3, 10.4],
+                                                "parquet": [5.0, 5.1, 5.2, 5.3, 5.4]}))
+        candidate: int = history.record(report({"bin": [12.0, 12.1, 12.2, 12.3, 12.4],
+                                                 "parquet": [5.0, 5.2, 5.1, 5.4, 5.3]}))
+        comparison: dict = history.compare(baseline_run=baseline, candidate_run=candidate, threshold=0.05, alpha=0.05)
+    assert comparison["variants"]["bin"]["regressed"] is True
+    assert comparison["variants"]["parquet"]["regressed"] is False
+    assert comparison["regressed"] is True
+
+
+def test_too_few_runs_to_ever_be_significant_raises(tmp_path):
+    with BenchmarkHistory(path=str(tmp_path / "history.sqlite")) as history:
+        baseline: int = history.record(report({"bin": [10.0, 10.1, 10.2]}))
+        candidate: int = history.record(report({"bin": [20.0, 20.1, 20.2]}))
+        with pytest.raises(ValueError):
+            history.compare(baseline_run=baseline, candidate_run=candidate, alpha=0.05)
+        assert history.compare(baseline_run=baseline, candidate_run=candidate, alpha=0.1)["regressed"] is True
@@ -0,0 +1,123 @@
+"""
+Tests the native footprint compressor, which has to give the same output however many workers it uses.
+"""
+import os
+import zlib
+
+import numpy as np
+import pytest
+
+from data.compress_footrpint import incremental_compress_footprint_file, native_compress_footprint_file
+from data.footprint_format import (FOOTPRINT_HEADER_SIZE, UNCOMPRESSED_SIZE_MASK, FootprintIndex,
+                                   load_footprint_index, read_footprint_header)
+from data.generate_footprint import FootprintGenerator
+
+COMPRESSED_FILES: tuple = ("footprint.bin.z", "footprint.idx.z")
+
+
+@pytest.fixture
+def static_path(tmp_path) -> str:
+    path: str = str(tmp_path / "static")
+    FootprintGenerator(num_events=60, num_areaperils=2000, mean_areaperils=40, seed=5).write(
+        static_path=path, file_formats=["bin"]
+    )
+    return path
+
+
+def read_files(path: str) -> dict:
+    contents: dict = {}
+    for name in COMPRESSED_FILES:
+        with open(os.path.join(path, name), "rb") as file:
+            contents[name] = file.read()
+    return contents
+
+
+def test_compressed_events_decompress_to_the_original_events(static_path):
+    native_compress_footprint_file(static_path=static_path, intensity_bins=50)
+    index: np.ndarray = load_footprint_index(os.path.join(static_path, "footprint.idx"))
+    compressed_index: np.ndarray = load_footprint_index(os.path.join(static_path, "footprint.idx.z"), compressed=True)
+    assert np.array_equal(compressed_index["event_id"], index["event_id"])
+    assert np.array_equal(compressed_index["d_size"], index["size"])
+    assert compressed_index["offset"][0] == FOOTPRINT_HEADER_SIZE
+    num_intensity_bins, options = read_footprint_header(os.path.join(static_path, "footprint.bin.z"))
+    assert num_intensity_bins == 50
+    assert options & UNCOMPRESSED_SIZE_MASK
+    with open(os.path.join(static_path, "footprint.bin"), "rb") as source, \
+            open(os.path.join(static_path, "footprint.bin.z"), "rb") as compressed:
+        for entry, compressed_entry in zip(index, compressed_index):
+            source.seek(entry["offset"])
+            compressed.seek(compressed_entry["offset"])
+            assert zlib.decompress(compressed.read(compressed_entry["size"])) == source.read(entry["size"])
+
+
+@pytest.mark.parametrize("workers", [2, 3, 8])
+def test_parallel_output_matches_serial(static_path, tmp_path, workers):
+    serial_path: str = str(tmp_path / "serial")
+    parallel_path: str = str(tmp_path / "parallel")
+    os.makedirs(serial_path)
+    os.makedirs(parallel_path)
+    native_compress_footprint_file(static_path=static_path, intensity_bins=50, output_path=serial_path, workers=1)
+    native_compress_footprint_file(static_path=static_path, intensity_bins=50, output_path=parallel_path,
+                                   workers=workers)
+    assert read_files(parallel_path) == read_files(serial_path)
+    assert sorted(os.listdir(parallel_path)) == sorted(COMPRESSED_FILES)
+
+
+def test_part_files_are_removed_when_a_worker_fails(static_path, tmp_path):
+    index: np.ndarray = np.fromfile(os.path.join(static_path, "footprint.idx"), dtype=FootprintIndex)
+    # the last event runs past the end of footprint.bin so the worker compressing it raises
+    index[-1]["size"] += 1024
+    index.tofile(os.path.join(static_path, "footprint.idx"))
+    output_path: str = str(tmp_path / "output")
+    os.makedirs(output_path)
+    with pytest.raises(ValueError):
+        native_compress_footprint_file(static_path=static_path, intensity_bins=50, output_path=output_path,
+                                       workers=4)
+    assert not any(".part" in name for name in os.listdir(output_path))
+
+
+def change_events(static_path: str, positions: list) -> None:
+    index: np.ndarray = load_footprint_index(os.path.join(static_path, "footprint.idx"))
+    with open(os.path.join(static_path, "footprint.bin"), "r+b") as file:
+        for position in positions:
+            # the probability of the first record of the event is changed in place
+            file.seek(int(index[position]["offset"]) + 8)
+            file.write(np.array([0.123], dtype="<f4").tobytes())
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_incremental_output_matches_a_full_compression(static_path, tmp_path, workers):
+    incremental_path: str = str(tmp_path / "incremental")
+    full_path: str = str(tmp_path / "full")
+    os.makedirs(incremental_path)
+    os.makedirs(full_path)
+    first: dict = incremental_compress_footprint_file(static_path=static_path, intensity_bins=50,
+                                                      output_path=incremental_path, workers=workers)
+    assert (first["compressed"], first["reused"]) == (60, 0)
+
+    change_events(static_path, positions=[0, 17, 18, 59])
+    second: dict = incremental_compress_footprint_file(static_path=static_path, intensity_bins=50,
+                                                       output_path=incremental_path, workers=workers)
+    assert (second["compressed"], second["reused"]) == (4, 56)
+    native_compress_footprint_file(static_path=static_path, intensity_bins=50, output_path=full_path)
+    assert read_files(incremental_path) == read_files(full_path)
+
+    unchanged: dict = incremental_compress_footprint_file(static_path=static_path, intensity_bins=50,
+                                                          output_path=incremental_path, workers=workers)
+    assert (unchanged["compressed"], unchanged["copies"]) == (0, 1)
+    assert read_files(incremental_path) == read_files(full_path)
+
+
+def test_incremental_compression_of_a_regenerated_footprint(static_path, tmp_path):
+    incremental_path: str = str(tmp_path / "incremental")
+    full_path: str = str(tmp_path / "full")
+    os.makedirs(incremental_path)
+    os.makedirs(full_path)
+    incremental_compress_footprint_file(static_path=static_path, intensity_bins=50, output_path=incremental_path)
+    # a different footprint moves and resizes the events of the old one
+    FootprintGenerator(num_events=80, num_areaperils=2000, mean_areaperils=40, seed=6).write(
+        static_path=static_path, file_formats=["bin"]
+    )
+    incremental_compress_footprint_file(static_path=static_path, intensity_bins=50, output_path=incremental_path)
+    native_compress_footprint_file(static_path=static_path, intensity_bins=50, output_path=full_path)
+    assert read_files(incremental_path) == read_files(full_path)
@@ -0,0 +1,53 @@
+"""
+Tests running console scripts under cProfile, which has to keep the exit code of the script.
+"""
+import os
+import pstats
+import subprocess
+import sys
+
+import pytest
+
+from running_models.cpu_profile import hot_functions, profiled_command
+
+SCRIPT: str = """#!{interpreter}
+import sys
+
+
+def busy_work():
+    return sum(range(100000))
+
+
+if __name__ == "__main__":
+    busy_work()
+    if "--raise" in sys.argv:
+        raise KeyError("failed")
+    sys.exit(int(sys.argv[1]))
+"""
+
+
+@pytest.fixture
+def console_script(tmp_path, monkeypatch) -> str:
+    path = tmp_path / "fakemodel"
+    path.write_text(SCRIPT.format(interpreter=sys.executable))
+    path.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{tmp_path}{os.pathsep}{os.environ['PATH']}")
+    return str(path)
+
+
+@pytest.mark.parametrize("exit_code", [0, 3])
+def test_exit_code_is_kept_and_stats_are_dumped(console_script, tmp_path, exit_code):
+    output_path: str = str(tmp_path / "run.prof")
+    command: str = profiled_command(program=f"fakemodel {exit_code}", output_path=output_path)
+    assert subprocess.run(command, shell=True).returncode == exit_code
+    functions = [row["function"] for row in hot_functions(pstats.Stats(output_path), limit=None)]
+    assert any("busy_work" in function for function in functions)
+
+
+def test_exception_fails_the_run(console_script, tmp_path):
+    output_path: str = str(tmp_path / "run.prof")
+    command: str = profiled_command(program="fakemodel 0 --raise", output_path=output_path)
+    process = subprocess.run(command, shell=True, stderr=subprocess.PIPE)
+    assert process.returncode == 1
+    assert b"KeyError" in process.stderr
+    assert os.path.isfile(output_path)
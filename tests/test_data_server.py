@@ -0,0 +1,92 @@
+"""
+Tests starting and stopping the data server with a fake servedata on the path.
+"""
+import os
+import sys
+import time
+from typing import List
+
+import psutil
+import pytest
+
+from running_models.data_server import DataServer
+
+# starts a child that outlives it unless its process group is killed, then listens or not as it is told
+FAKE_SERVEDATA: str = """#!{interpreter}
+import socket
+import subprocess
+import sys
+import time
+
+child = subprocess.Popen(["sleep", "30"])
+with open({pids_path!r}, "w") as file:
+    file.write(f"{{child.pid}}\\n")
+mode = {mode!r}
+if mode == "exit":
+    sys.exit(4)
+if mode == "listen":
+    server = socket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen()
+time.sleep(30)
+"""
+
+
+def fake_servedata(tmp_path, monkeypatch, mode: str) -> str:
+    bin_path = tmp_path / "bin"
+    bin_path.mkdir()
+    pids_path: str = str(tmp_path / "pids")
+    script = bin_path / "servedata"
+    script.write_text(FAKE_SERVEDATA.format(interpreter=sys.executable, pids_path=pids_path, mode=mode))
+    script.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{bin_path}{os.pathsep}{os.environ['PATH']}")
+    return pids_path
+
+
+def running(pid: int) -> bool:
+    # a killed process that has not been reaped yet is a zombie
+    try:
+        return psutil.Process(pid).status() != psutil.STATUS_ZOMBIE
+    except psutil.NoSuchProcess:
+        return False
+
+
+def survivors(pids: List[int], timeout: float = 5.0) -> List[int]:
+    # a signalled process that is not our child dies a moment after the signal is sent, so it is given a little time
+    deadline: float = time.time() + timeout
+    while any(running(pid) for pid in pids) and time.time() < deadline:
+        time.sleep(0.01)
+    return [pid for pid in pids if running(pid)]
+
+
+def group_pids(server: DataServer, pids_path: str) -> List[int]:
+    # the fake server writes the pid of its child before it does anything else
+    with open(pids_path) as file:
+        return [server.pid, int(file.read())]
+
+
+@pytest.mark.parametrize("mode, error", [("silent", TimeoutError), ("exit", RuntimeError)])
+def test_a_server_that_never_becomes_ready_leaves_no_survivors(tmp_path, monkeypatch, mode, error):
+    pids_path: str = fake_servedata(tmp_path, monkeypatch, mode=mode)
+    server = DataServer(static_path="static", total_processes=2, cwd=str(tmp_path), port=None, startup_timeout=1.0)
+    with pytest.raises(error):
+        with server:
+            pass
+    pids: List[int] = group_pids(server=server, pids_path=pids_path)
+    assert server.stop_time is not None
+    assert survivors(pids) == []
+
+
+def test_a_ready_server_is_timed_and_stopped_with_its_group(tmp_path, monkeypatch):
+    pids_path: str = fake_servedata(tmp_path, monkeypatch, mode="listen")
+    with DataServer(static_path="static", total_processes=2, cwd=str(tmp_path), port=None,
+                    startup_timeout=10.0) as server:
+        assert server.startup_seconds > 0
+        pids: List[int] = group_pids(server=server, pids_path=pids_path)
+        assert all(running(pid) for pid in pids)
+    assert survivors(pids) == []
+    report: dict = server.to_dict()
+    assert report["return_code"] == server.return_code != 0
+    assert report["seconds"] >= report["startup_seconds"]
+    # stopping twice does nothing
+    assert server.stop() == server.return_code
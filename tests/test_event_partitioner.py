@@ -0,0 +1,118 @@
+"""
+Tests balancing the events of a model run across processes by footprint size.
+"""
+import os
+import shutil
+from typing import List
+
+import numpy as np
+import pytest
+
+from data.footprint_format import (UNCOMPRESSED_SIZE_MASK, FootprintIndex, load_footprint_index,
+                                   pack_footprint_header, read_footprint_header)
+from data.generate_footprint import FootprintGenerator
+from running_models.event_partitioner import (event_costs, footprint_event_sizes, partition_events, partition_run,
+                                              read_events)
+
+
+@pytest.fixture(scope="module")
+def footprint_path(tmp_path_factory) -> str:
+    static_path: str = str(tmp_path_factory.mktemp("footprint") / "static")
+    FootprintGenerator(num_events=30, num_areaperils=500, mean_areaperils=20, seed=5).write(
+        static_path=static_path, file_formats=["bin", "bin.z", "parquet"]
+    )
+    return static_path
+
+
+def only_files(source_path: str, target_path: str, file_names: List[str]) -> str:
+    os.makedirs(target_path)
+    for file_name in file_names:
+        source: str = os.path.join(source_path, file_name)
+        if os.path.isdir(source):
+            shutil.copytree(source, os.path.join(target_path, file_name))
+        else:
+            shutil.copy(source, target_path)
+    return target_path
+
+
+def test_every_event_is_assigned_exactly_once():
+    rng = np.random.default_rng(2)
+    event_ids: np.ndarray = rng.permutation(np.arange(1, 1001)).astype(np.int32)
+    costs: np.ndarray = rng.integers(1, 10_000, size=len(event_ids))
+    partitions, totals = partition_events(event_ids=event_ids, costs=costs, total_processes=7)
+    assert len(partitions) == 7
+    assert np.array_equal(np.sort(np.concatenate(partitions)), np.sort(event_ids))
+    assert totals.sum() == costs.sum()
+    position: dict = {int(event_id): index for index, event_id in enumerate(event_ids)}
+    for partition, total in zip(partitions, totals):
+        # the events of a process keep the order they had in the run
+        positions: List[int] = [position[int(event_id)] for event_id in partition]
+        assert positions == sorted(positions)
+        assert total == costs[positions].sum()
+
+
+def test_largest_partition_is_within_the_lpt_bound():
+    # the classic worst case of two processes, the best split is 3 + 3 and 2 + 2 + 2 but LPT gives 3 + 2 + 2 and 3 + 2
+    costs: np.ndarray = np.array([2, 3, 2, 3, 2])
+    _, totals = partition_events(event_ids=np.arange(1, 6), costs=costs, total_processes=2)
+    optimal: int = 6
+    assert sorted(totals.tolist()) == [5, 7]
+    # Graham's bound of 4 / 3 - 1 / 3m of the optimum, multiplied out by 3m to stay in integers, which it meets
+    assert 3 * 2 * totals.max() <= (4 * 2 - 1) * optimal
+
+    rng = np.random.default_rng(3)
+    costs = rng.integers(1, 1000, size=200)
+    _, totals = partition_events(event_ids=np.arange(1, 201), costs=costs, total_processes=8)
+    # no process ends more than one event above the mean
+    assert totals.max() <= costs.sum() / 8 + costs.max()
+
+
+def test_sizes_are_read_from_every_index(footprint_path, tmp_path):
+    index: np.ndarray = load_footprint_index(os.path.join(footprint_path, "footprint.idx"), compressed=False)
+    event_ids, sizes = footprint_event_sizes(footprint_path)
+    assert np.array_equal(event_ids, index["event_id"])
+    assert np.array_equal(sizes, index["size"])
+
+    compressed_path: str = only_files(footprint_path, str(tmp_path / "compressed"),
+                                      ["footprint.bin.z", "footprint.idx.z"])
+    compressed_ids, compressed_sizes = footprint_event_sizes(compressed_path)
+    # the uncompressed sizes are kept in the compressed index
+    assert np.array_equal(compressed_ids, event_ids)
+    assert np.array_equal(compressed_sizes, sizes)
+
+    # an older compressed footprint without the uncompressed sizes falls back on the compressed sizes
+    z_index: np.ndarray = load_footprint_index(os.path.join(compressed_path, "footprint.idx.z"), compressed=True)
+    old_index: np.ndarray = np.empty(len(z_index), dtype=FootprintIndex)
+    for field in ("event_id", "offset", "size"):
+        old_index[field] = z_index[field]
+    old_index.tofile(os.path.join(compressed_path, "footprint.idx.z"))
+    num_intensity_bins, options = read_footprint_header(os.path.join(compressed_path, "footprint.bin.z"))
+    with open(os.path.join(compressed_path, "footprint.bin.z"), "r+b") as file:
+        file.write(pack_footprint_header(num_intensity_bins=num_intensity_bins,
+                                         options=options & ~UNCOMPRESSED_SIZE_MASK))
+    old_ids, old_sizes = footprint_event_sizes(compressed_path)
+    assert np.array_equal(old_ids, event_ids)
+    assert np.array_equal(old_sizes, z_index["size"])
+
+    parquet_path: str = only_files(footprint_path, str(tmp_path / "parquet"), ["footprint.parquet"])
+    parquet_ids, parquet_sizes = footprint_event_sizes(parquet_path)
+    assert np.array_equal(np.sort(parquet_ids), np.sort(event_ids))
+    assert (parquet_sizes > 0).all()
+
+    with pytest.raises(FileNotFoundError):
+        footprint_event_sizes(str(tmp_path))
+
+
+def test_run_is_partitioned_into_events_files(footprint_path, tmp_path):
+    event_ids, sizes = footprint_event_sizes(footprint_path)
+    # an event missing from the footprint costs as much as the smallest event
+    run_events: np.ndarray = np.append(event_ids[::-1], event_ids.max() + 1).astype(np.int32)
+    assert event_costs(run_events, footprint_path)[-1] == sizes.min()
+    events_file: str = str(tmp_path / "events.bin")
+    run_events.astype("<i4").tofile(events_file)
+
+    paths, shares = partition_run(static_path=footprint_path, total_processes=3, output_path=str(tmp_path),
+                                  events_file=events_file)
+    assert [os.path.basename(path) for path in paths] == ["events_1.bin", "events_2.bin", "events_3.bin"]
+    assert np.array_equal(np.sort(np.concatenate([read_events(path) for path in paths])), np.sort(run_events))
+    assert sum(shares) == pytest.approx(1.0)
@@ -0,0 +1,121 @@
+"""
+Tests stashing files out of the static directory and recovering the stashes of dead processes.
+"""
+import json
+import os
+
+import pytest
+
+from running_models.file_operations import ModelRunFileManager, copy_range
+
+
+@pytest.fixture
+def static_path(tmp_path) -> str:
+    for name in ("footprint.bin", "footprint.idx", "vulnerability.bin"):
+        (tmp_path / name).write_bytes(name.encode())
+    (tmp_path / "footprint.parquet").mkdir()
+    (tmp_path / "footprint.parquet" / "part.parquet").write_bytes(b"parquet")
+    return str(tmp_path)
+
+
+def write_journal(manager: ModelRunFileManager, pid: int, create_time, files) -> None:
+    with open(manager.journal_path, "w") as file:
+        json.dump({"pid": pid, "create_time": create_time, "created": 0.0, "files": files}, file)
+
+
+def test_stashed_files_are_put_back(static_path):
+    manager = ModelRunFileManager(static_path)
+    with manager.stashed(["footprint.bin", "footprint.parquet", "missing.bin"]) as stashed:
+        assert stashed == ["footprint.bin", "footprint.parquet"]
+        assert not os.path.exists(os.path.join(static_path, "footprint.bin"))
+        assert os.path.isdir(os.path.join(manager.stash_path, "footprint.parquet"))
+        assert os.path.isfile(manager.journal_path)
+    assert os.path.isfile(os.path.join(static_path, "footprint.parquet", "part.parquet"))
+    assert not os.path.exists(manager.journal_path)
+
+
+def test_stashed_files_are_put_back_when_the_block_raises(static_path):
+    manager = ModelRunFileManager(static_path)
+    with pytest.raises(KeyError):
+        with manager.stashed(["footprint.idx"]):
+            raise KeyError("failed run")
+    assert os.path.isfile(os.path.join(static_path, "footprint.idx"))
+    assert not os.path.exists(manager.journal_path)
+
+
+def test_stash_of_a_dead_process_is_recovered(static_path):
+    manager = ModelRunFileManager(static_path)
+    manager.move_to_stash("footprint.bin")
+    # the process ID is running but was created at another time so it was reused
+    write_journal(manager, pid=os.getpid(), create_time=1.0, files=["footprint.bin"])
+    assert ModelRunFileManager(static_path).recover() == []
+    assert os.path.isfile(os.path.join(static_path, "footprint.bin"))
+    assert not os.path.exists(manager.journal_path)
+
+
+def test_stash_of_a_running_process_is_left_alone(static_path):
+    manager = ModelRunFileManager(static_path)
+    with manager.stashed(["footprint.bin"]):
+        assert manager.recover() == []
+        with pytest.raises(RuntimeError):
+            with ModelRunFileManager(static_path).stashed(["footprint.idx"]):
+                pass
+        assert not os.path.exists(os.path.join(static_path, "footprint.bin"))
+
+
+def test_journal_is_kept_when_a_file_cannot_be_restored(static_path):
+    manager = ModelRunFileManager(static_path)
+    manager.move_to_stash("footprint.bin")
+    with open(os.path.join(static_path, "footprint.bin"), "wb") as file:
+        file.write(b"replacement")
+    write_journal(manager, pid=os.getpid(), create_time=1.0, files=["footprint.bin"])
+    with pytest.raises(FileExistsError):
+        manager.recover()
+    assert os.path.isfile(manager.journal_path)
+    assert os.path.isfile(os.path.join(manager.stash_path, "footprint.bin"))
+
+
+def test_copy_range_copies_into_the_same_range(tmp_path):
+    source = tmp_path / "source.bin"
+    target = tmp_path / "target.bin"
+    source.write_bytes(bytes(range(256)) * 4)
+    target.write_bytes(b"\0" * 1024)
+    copy_range(str(source), str(target), offset=100, length=500)
+    assert target.read_bytes() == b"\0" * 100 + source.read_bytes()[100:600] + b"\0" * 424
+
+
+def test_copy_range_raises_on_a_short_source(tmp_path):
+    source = tmp_path / "source.bin"
+    target = tmp_path / "target.bin"
+    source.write_bytes(b"x" * 300)
+    target.write_bytes(b"\0" * 1024)
+    with pytest.raises(EOFError):
+        copy_range(str(source), str(target), offset=100, length=500)
+
+
+def test_stash_name_collision_is_rolled_back(static_path):
+    manager = ModelRunFileManager(static_path)
+    with open(os.path.join(manager.stash_path, "footprint.idx"), "wb") as file:
+        file.write(b"left over")
+    with pytest.raises(FileExistsError):
+        with manager.stashed(["footprint.bin", "footprint.idx"]):
+            pytest.fail("the block ran although footprint.idx was not stashed")
+    assert os.path.isfile(os.path.join(static_path, "footprint.bin"))
+    assert os.path.isfile(os.path.join(static_path, "footprint.idx"))
+    assert not os.path.exists(manager.journal_path)
+    # the next manager of the static directory is not blocked
+    with ModelRunFileManager(static_path).stashed(["footprint.bin"]) as stashed:
+        assert stashed == ["footprint.bin"]
+
+
+def test_unresolvable_journal_does_not_stop_construction(static_path):
+    manager = ModelRunFileManager(static_path)
+    manager.move_to_stash("footprint.bin")
+    with open(os.path.join(static_path, "footprint.bin"), "wb") as file:
+        file.write(b"replacement")
+    write_journal(manager, pid=os.getpid(), create_time=1.0, files=["footprint.bin"])
+    blocked = ModelRunFileManager(static_path)
+    assert os.path.isfile(manager.journal_path)
+    with pytest.raises(FileExistsError):
+        with blocked.stashed(["footprint.idx"]):
+            pass
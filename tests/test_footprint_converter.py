@@ -0,0 +1,74 @@
+"""
+Tests converting footprints between formats and reading them back.
+"""
+import os
+
+import numpy as np
+import pytest
+
+from data.footprint_converter import (PARQUET_DIRECTORY, convert_footprint, iter_footprint_events,
+                                      verify_footprints)
+from data.footprint_reader import FootprintReader
+from data.generate_footprint import FootprintGenerator
+
+
+@pytest.fixture
+def bin_footprint(tmp_path) -> str:
+    static_path: str = str(tmp_path / "bin")
+    FootprintGenerator(num_events=40, num_areaperils=500, mean_areaperils=20, seed=3).write(
+        static_path=static_path, file_formats=["bin"]
+    )
+    return static_path
+
+
+@pytest.mark.parametrize("target_format", ["bin.z", "csv", "parquet"])
+def test_round_trip_is_bit_exact(bin_footprint, tmp_path, target_format):
+    target_path: str = str(tmp_path / "converted")
+    back_path: str = str(tmp_path / "back")
+    assert convert_footprint(bin_footprint, "bin", target_path, target_format) == 40
+    # csv footprints carry no header so the settings are passed back in
+    convert_footprint(target_path, target_format, back_path, "bin", num_intensity_bins=50,
+                      has_intensity_uncertainty=True)
+    assert verify_footprints(bin_footprint, "bin", back_path, "bin") == 0
+
+
+def test_reader_matches_converted_events(bin_footprint, tmp_path):
+    target_path: str = str(tmp_path / "compressed")
+    convert_footprint(bin_footprint, "bin", target_path, "bin.z")
+    with FootprintReader(bin_footprint) as plain, FootprintReader(target_path, compressed=True) as compressed:
+        assert np.array_equal(plain.event_ids, compressed.event_ids)
+        for event_id, records in iter_footprint_events(bin_footprint, "bin"):
+            assert plain.get_event(event_id).tobytes() == records.tobytes()
+            assert compressed.get_event(event_id).tobytes() == records.tobytes()
+        assert plain.get_event(int(plain.event_ids.max()) + 1) is None
+
+
+@pytest.mark.parametrize("file_format", ["bin", "parquet"])
+def test_converting_onto_itself_is_refused(bin_footprint, file_format):
+    if file_format == "parquet":
+        convert_footprint(bin_footprint, "bin", bin_footprint, "parquet")
+    size: int = os.path.getsize(os.path.join(bin_footprint, "footprint.bin"))
+    with pytest.raises(ValueError):
+        convert_footprint(bin_footprint, file_format, bin_footprint + os.sep, file_format)
+    assert os.path.getsize(os.path.join(bin_footprint, "footprint.bin")) == size
+    assert verify_footprints(bin_footprint, "bin", bin_footprint, file_format) == 0
+
+
+def test_parquet_layouts_are_not_mixed(bin_footprint, tmp_path):
+    target_path: str = str(tmp_path / "parquet")
+    convert_footprint(bin_footprint, "bin", target_path, "parquet", layout="partitioned")
+    convert_footprint(bin_footprint, "bin", target_path, "parquet", layout="row_groups")
+    assert not any(name.startswith("event_id=") for name in os.listdir(os.path.join(target_path, PARQUET_DIRECTORY)))
+    assert verify_footprints(bin_footprint, "bin", target_path, "parquet") == 0
+
+
+def test_differing_settings_fail_verification(bin_footprint, tmp_path):
+    target_path: str = str(tmp_path / "no_uncertainty")
+    # the events are copied byte for byte but the header no longer matches them
+    with pytest.raises(ValueError):
+        convert_footprint(bin_footprint, "bin", target_path, "bin", has_intensity_uncertainty=False)
+    with pytest.raises(ValueError):
+        verify_footprints(bin_footprint, "bin", target_path, "bin")
+    convert_footprint(target_path, "bin", str(tmp_path / "csv"), "csv")
+    # csv footprints have no header so only their events are compared
+    assert verify_footprints(bin_footprint, "bin", str(tmp_path / "csv"), "csv") == 0
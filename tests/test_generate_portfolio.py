@@ -0,0 +1,64 @@
+"""
+Tests generating seeded synthetic portfolios.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from data.generate_portfolio import PortfolioGenerator
+
+
+def write_portfolio(tmp_path, name: str, generator: PortfolioGenerator, remove: int = 0) -> str:
+    path: str = str(tmp_path / f"{name}.csv")
+    generator.write_locations(path=path, remove=remove)
+    return path
+
+
+def test_same_seed_gives_identical_files(tmp_path):
+    first: str = write_portfolio(tmp_path, "first", PortfolioGenerator(num_locations=2500, seed=4, block_size=1000))
+    second: str = write_portfolio(tmp_path, "second", PortfolioGenerator(num_locations=2500, seed=4, block_size=1000))
+    other: str = write_portfolio(tmp_path, "other", PortfolioGenerator(num_locations=2500, seed=5, block_size=1000))
+    with open(first, "rb") as first_file, open(second, "rb") as second_file, open(other, "rb") as other_file:
+        first_bytes: bytes = first_file.read()
+        assert first_bytes == second_file.read()
+        assert first_bytes != other_file.read()
+
+    accounts = [str(tmp_path / f"accounts_{number}.csv") for number in range(2)]
+    for path in accounts:
+        PortfolioGenerator(num_locations=2500, seed=4, block_size=1000).write_accounts(path=path)
+    with open(accounts[0], "rb") as first_file, open(accounts[1], "rb") as second_file:
+        assert first_file.read() == second_file.read()
+
+
+# removing every location leaves every block empty so the header is the only line written
+@pytest.mark.parametrize("remove", [0, 1, 37, 2500])
+def test_remove_drops_exactly_that_many_locations(tmp_path, remove):
+    generator = PortfolioGenerator(num_locations=2500, seed=4, block_size=1000)
+    full: pd.DataFrame = pd.read_csv(write_portfolio(tmp_path, "full", generator))
+    assert generator.write_locations(path=str(tmp_path / "reduced.csv"), remove=remove) == 2500 - remove
+    reduced: pd.DataFrame = pd.read_csv(tmp_path / "reduced.csv")
+    assert len(reduced) == 2500 - remove
+    # the locations that are kept are unchanged
+    kept: pd.DataFrame = full[full["LocNumber"].isin(reduced["LocNumber"])].reset_index(drop=True)
+    pd.testing.assert_frame_equal(kept, reduced.reset_index(drop=True), check_dtype=False)
+    assert np.array_equal(np.setdiff1d(full["LocNumber"], reduced["LocNumber"]),
+                          generator.removed_locations(count=remove))
+
+
+def test_removing_more_locations_than_there_are_is_refused():
+    with pytest.raises(ValueError):
+        PortfolioGenerator(num_locations=10).removed_locations(count=11)
+
+
+def test_account_and_location_ids_are_consistent(tmp_path):
+    generator = PortfolioGenerator(num_locations=2550, seed=1, locations_per_account=100, block_size=1000)
+    locations: pd.DataFrame = pd.read_csv(write_portfolio(tmp_path, "locations", generator))
+    generator.write_accounts(path=str(tmp_path / "accounts.csv"))
+    accounts: pd.DataFrame = pd.read_csv(tmp_path / "accounts.csv")
+
+    assert locations["LocNumber"].tolist() == list(range(1, 2551))
+    assert accounts["AccNumber"].is_unique
+    assert set(locations["AccNumber"]) == set(accounts["AccNumber"])
+    assert len(accounts) == generator.num_accounts == 26
+    assert locations.groupby("AccNumber").size().max() == 100
+    assert set(locations["PortNumber"]) == set(accounts["PortNumber"]) == {1}
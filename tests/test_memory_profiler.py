@@ -0,0 +1,127 @@
+"""
+Tests sampling short lived processes with the MemoryProfiler and reading its output back.
+"""
+import os
+import signal
+import subprocess
+import sys
+import time
+from typing import Iterator
+
+import numpy as np
+import pytest
+
+from running_models.memory_profiler import MemoryProfile, MemoryProfiler, SampleRecord
+
+
+@pytest.fixture
+def sleeper() -> Iterator[subprocess.Popen]:
+    process = subprocess.Popen(["sleep", "30"])
+    yield process
+    process.kill()
+    process.wait()
+
+
+def profile_for(profiler: MemoryProfiler, seconds: float) -> MemoryProfile:
+    profiler.start()
+    time.sleep(seconds)
+    profiler.stop()
+    profiler.join(timeout=10)
+    # the stop event ends the sampling loop however long the profiled process runs for
+    assert profiler.is_alive() is False
+    assert profiler.exitcode == 0
+    return MemoryProfile.load(profiler.output_path)
+
+
+def test_stop_ends_sampling_and_the_buffer_spills(sleeper, tmp_path):
+    profiler = MemoryProfiler(pids=[sleeper.pid], interval=0.01, output_path=str(tmp_path / "profile.npz"),
+                              buffer_size=4)
+    profile: MemoryProfile = profile_for(profiler, seconds=0.5)
+    # far more samples than fit in the preallocated buffer are kept
+    assert len(profile.samples) > 4 * profiler.buffer_size
+    assert len(profile.samples) <= profile.samples_taken
+    assert set(profile.samples["pid"].tolist()) == {sleeper.pid}
+    assert (profile.samples["rss"] > 0).all()
+    assert np.all(np.diff(profile.samples["timestamp"]) > 0)
+    assert sleeper.poll() is None
+    assert not (tmp_path / "profile.npz.samples").exists()
+
+
+def test_npz_round_trips_the_samples(tmp_path):
+    samples: np.ndarray = np.zeros(10, dtype=SampleRecord)
+    for position, name in enumerate(SampleRecord.names):
+        samples[name] = np.arange(10) + position
+    profiler = MemoryProfiler(pids=[], interval=0.25, output_path=str(tmp_path / "profile.npz"), buffer_size=3)
+    samples.tofile(profiler.spill_path)
+    profiler._write_report(samples_taken=12, wall_seconds=2.5, cpu_seconds=0.5)
+
+    profile: MemoryProfile = MemoryProfile.load(profiler.output_path)
+    assert profile.samples.tobytes() == samples.tobytes()
+    assert (profile.interval, profile.samples_taken, profile.wall_seconds) == (0.25, 12, 2.5)
+    assert profile.cpu_overhead == pytest.approx(0.2)
+
+
+def test_a_process_that_is_gone_gives_an_empty_profile(tmp_path):
+    process = subprocess.Popen(["true"])
+    process.wait()
+    profiler = MemoryProfiler(pids=[process.pid], interval=0.01, output_path=str(tmp_path / "profile.npz"))
+    profile: MemoryProfile = profile_for(profiler, seconds=0.1)
+    assert len(profile.samples) == 0
+    assert profile.samples_taken > 0
+
+
+def test_descendants_are_sampled_under_their_root(tmp_path):
+    # the shell stays as the root of a pipeline of two sleeps, as the shell=True pipelines of a model run do
+    shell = subprocess.Popen(["sh", "-c", "sleep 30 | sleep 30"], start_new_session=True)
+    try:
+        profiler = MemoryProfiler(pids=[shell.pid], interval=0.01, output_path=str(tmp_path / "profile.npz"),
+                                  tree_refresh_interval=0.05)
+        profile: MemoryProfile = profile_for(profiler, seconds=0.5)
+    finally:
+        os.killpg(shell.pid, signal.SIGKILL)
+        shell.wait()
+    children: set = set(profile.samples["pid"].tolist()) - {shell.pid}
+    assert len(children) == 2
+    assert profile.root_pids == [shell.pid]
+    assert profile.peak_total(metric="pss") > 0
+    assert profile.peak_total(metric="uss") <= profile.peak_total(metric="rss")
+    assert set(profile.summary().keys()) == {str(shell.pid), "job"}
+
+
+def test_parquet_round_trips_the_samples_across_chunks(tmp_path):
+    samples: np.ndarray = np.zeros(10, dtype=SampleRecord)
+    for position, name in enumerate(SampleRecord.names):
+        samples[name] = np.arange(10) + position
+    # a buffer of 3 writes the 10 samples in 4 row groups
+    profiler = MemoryProfiler(pids=[], interval=0.25, output_path=str(tmp_path / "profile.parquet"), buffer_size=3)
+    samples.tofile(profiler.spill_path)
+    profiler._write_report(samples_taken=12, wall_seconds=2.5, cpu_seconds=0.5)
+
+    profile: MemoryProfile = MemoryProfile.load(profiler.output_path)
+    assert profile.samples.tobytes() == samples.tobytes()
+    assert (profile.interval, profile.samples_taken, profile.wall_seconds, profile.cpu_seconds) == (0.25, 12, 2.5, 0.5)
+
+
+def test_counters_of_a_busy_process_are_sampled(tmp_path):
+    busy = subprocess.Popen([sys.executable, "-c", "while True: pass"])
+    try:
+        profiler = MemoryProfiler(pids=[busy.pid], interval=0.02, output_path=str(tmp_path / "profile.parquet"))
+        profile: MemoryProfile = profile_for(profiler, seconds=0.5)
+    finally:
+        busy.kill()
+        busy.wait()
+    assert profile.samples["cpu_user"][-1] > profile.samples["cpu_user"][0]
+    job: dict = profile.summary()["job"]
+    # a busy loop keeps most of a core busy
+    assert job["cpu_user_rate"] + job["cpu_system_rate"] > 0.3
+    assert job["minor_faults"] >= 0
+
+
+def test_counters_that_were_not_read_are_left_out_of_the_summary(sleeper, tmp_path):
+    profiler = MemoryProfiler(pids=[sleeper.pid], interval=0.02, output_path=str(tmp_path / "profile.npz"),
+                              collect_counters=False)
+    profile: MemoryProfile = profile_for(profiler, seconds=0.2)
+    assert (profile.samples["cpu_user"] == -1).all()
+    job: dict = profile.summary()["job"]
+    assert "cpu_user" not in job
+    assert job["peak_rss"] > 0
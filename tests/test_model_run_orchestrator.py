@@ -0,0 +1,86 @@
+"""
+Tests running model runs side by side with a fake oasislmf on the path.
+"""
+import json
+import os
+import sys
+from typing import Dict
+
+import pytest
+
+from running_models.model_run_orchestrator import ModelRunOrchestrator
+
+# records its arguments and the config it was given, takes a while so the runs overlap and exits with the config's code
+FAKE_OASISLMF: str = """#!{interpreter}
+import json
+import os
+import sys
+import time
+
+arguments = sys.argv[1:]
+config_path = arguments[arguments.index("--config") + 1]
+run_directory = arguments[arguments.index("--model-run-dir") + 1]
+with open(config_path) as file:
+    config = json.load(file)
+start = time.time()
+time.sleep(0.5)
+os.makedirs(os.path.join(run_directory, "output"))
+with open(os.path.join(run_directory, "output", "call.json"), "w") as file:
+    json.dump({{"arguments": arguments, "cwd": os.getcwd(), "start": start, "end": time.time()}}, file)
+print("running", config["name"])
+sys.exit(config["exit_code"])
+"""
+
+
+@pytest.fixture
+def fake_oasislmf(tmp_path, monkeypatch) -> None:
+    bin_path = tmp_path / "bin"
+    bin_path.mkdir()
+    script = bin_path / "oasislmf"
+    script.write_text(FAKE_OASISLMF.format(interpreter=sys.executable))
+    script.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{bin_path}{os.pathsep}{os.environ['PATH']}")
+
+
+def read_call(result: dict) -> dict:
+    with open(os.path.join(result["output_directory"], "call.json")) as file:
+        return json.load(file)
+
+
+def test_concurrent_runs_get_their_own_directories(fake_oasislmf, tmp_path):
+    base_path = tmp_path / "model dir"
+    base_path.mkdir()
+    orchestrator = ModelRunOrchestrator(configs={
+        "full": {"name": "full", "exit_code": 0, "oed_location_csv": "tests/full.csv"},
+        "reduced": {"name": "reduced", "exit_code": 3, "oed_location_csv": "tests/reduced.csv"}
+    }, runs_path=str(tmp_path / "model runs"), max_concurrent=2, base_path=str(base_path),
+        extra_args="--verbose --label 'two words'")
+    results: Dict[str, dict] = orchestrator.run()
+
+    assert {name: result["return_code"] for name, result in results.items()} == {"full": 0, "reduced": 3}
+    assert orchestrator.succeeded is False
+    assert results["full"]["run_directory"] != results["reduced"]["run_directory"]
+    calls: Dict[str, dict] = {name: read_call(result) for name, result in results.items()}
+    for name, result in results.items():
+        # the paths and the quoted extra argument arrive as single arguments without a shell splitting them
+        assert calls[name]["arguments"] == ["model", "run", "--config", result["config_path"], "--model-run-dir",
+                                            result["run_directory"], "--verbose", "--label", "two words"]
+        assert calls[name]["cwd"] == str(base_path)
+        with open(result["config_path"]) as file:
+            assert json.load(file)["oed_location_csv"] == str(base_path / "tests" / f"{name}.csv")
+        with open(os.path.join(result["run_directory"], "oasislmf.log")) as file:
+            assert file.read() == f"running {name}\n"
+    # the runs overlapped
+    assert calls["full"]["start"] < calls["reduced"]["end"] and calls["reduced"]["start"] < calls["full"]["end"]
+    with open(orchestrator.manifest_path) as file:
+        assert json.load(file) == results
+
+
+def test_runs_are_limited_to_max_concurrent(fake_oasislmf, tmp_path):
+    orchestrator = ModelRunOrchestrator(configs={
+        name: {"name": name, "exit_code": 0} for name in ("first", "second")
+    }, runs_path=str(tmp_path / "runs"), max_concurrent=1, base_path=str(tmp_path))
+    results: Dict[str, dict] = orchestrator.run()
+    assert orchestrator.succeeded is True
+    first, second = sorted((read_call(result) for result in results.values()), key=lambda call: call["start"])
+    assert first["end"] <= second["start"]
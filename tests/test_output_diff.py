@@ -0,0 +1,97 @@
+"""
+Tests diffing model output files with tolerances and worked out keys.
+"""
+import math
+import os
+from typing import List
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from running_models import output_diff
+from running_models.output_diff import diff_outputs
+
+
+def write(frame: pd.DataFrame, path) -> str:
+    if str(path).endswith(".parquet"):
+        frame.to_parquet(path, index=False)
+    else:
+        frame.to_csv(path, index=False)
+    return str(path)
+
+
+@pytest.fixture
+def elt() -> pd.DataFrame:
+    rng = np.random.default_rng(7)
+    return pd.DataFrame({
+        "summary_id": np.repeat(np.arange(1, 11), 50),
+        "event_id": np.tile(np.arange(1, 51), 10),
+        "mean": rng.random(500) * 1000,
+        "standard_deviation": rng.random(500) * 100
+    })
+
+
+@pytest.mark.parametrize("suffix", [".csv", ".parquet"])
+def test_identical_files_in_any_row_order(elt, tmp_path, suffix):
+    left: str = write(elt, tmp_path / f"left{suffix}")
+    right: str = write(elt.sample(frac=1.0, random_state=1), tmp_path / f"right{suffix}")
+    diff = diff_outputs(left, right, partition_bytes=1024)
+    assert diff.key == ["summary_id", "event_id"]
+    assert diff.identical is True
+    assert diff.left_rows == diff.right_rows == 500
+
+
+def test_changes_within_the_tolerance_are_ignored(elt, tmp_path):
+    changed: pd.DataFrame = elt.copy()
+    changed.loc[3, "mean"] += 1e-9
+    changed.loc[7, "mean"] += 1.0
+    diff = diff_outputs(write(elt, tmp_path / "left.csv"), write(changed, tmp_path / "right.csv"), atol=1e-6,
+                        rtol=1e-6)
+    assert diff.changed == 1
+    assert diff.column_changes == {"mean": 1, "standard_deviation": 0}
+    assert diff.max_abs_differences["mean"] == pytest.approx(1.0)
+    assert diff_outputs(write(elt, tmp_path / "left.csv"), write(changed, tmp_path / "right.csv"),
+                        atol=2.0).identical is True
+
+
+def test_missing_rows_and_columns(elt, tmp_path):
+    right: pd.DataFrame = elt.drop(index=[0, 1]).drop(columns=["standard_deviation"])
+    diff = diff_outputs(write(elt, tmp_path / "left.parquet"), write(right, tmp_path / "right.parquet"))
+    assert diff.left_only == 2
+    assert diff.right_only == 0
+    assert diff.left_only_columns == ["standard_deviation"]
+    assert diff.identical is False
+
+
+def test_fallback_key_uses_the_types_of_both_files(tmp_path):
+    left: pd.DataFrame = pd.DataFrame({"group": ["a", "b", "c"], "bucket": [1, 2, 3], "loss": [1.0, 2.0, 3.0]})
+    # bucket is a float on the right so it cannot be joined on
+    right: pd.DataFrame = left.assign(bucket=[1.5, 2.0, 3.0])
+    diff = diff_outputs(write(left, tmp_path / "left.parquet"), write(right, tmp_path / "right.parquet"))
+    assert diff.key == ["group"]
+    assert diff.column_changes["bucket"] == 1
+
+
+def test_partitions_are_not_capped(elt, tmp_path, monkeypatch):
+    left: str = write(elt, tmp_path / "left.csv")
+    right: str = write(elt, tmp_path / "right.csv")
+    partition_rows: List[int] = []
+
+    def load_partition(path: str, columns: List[str]) -> pd.DataFrame:
+        frame: pd.DataFrame = load(path=path, columns=columns)
+        partition_rows.append(len(frame))
+        return frame
+
+    load = output_diff._load_partition
+    monkeypatch.setattr(output_diff, "_load_partition", load_partition)
+    total_bytes: int = os.path.getsize(left) + os.path.getsize(right)
+    partition_bytes: int = total_bytes // 300
+    diff = diff_outputs(left, right, partition_bytes=partition_bytes)
+    assert diff.identical is True
+    # every partition is loaded once for each side and the number of partitions follows the size of the files
+    expected: int = math.ceil(total_bytes / partition_bytes)
+    assert expected >= 300
+    assert len(partition_rows) == 2 * expected
+    assert sum(partition_rows) == 1000
+    assert max(partition_rows) < 20
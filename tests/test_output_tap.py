@@ -0,0 +1,75 @@
+"""
+Tests tapping cdf streams, which have to give the same event digest however the events were split and buffered.
+"""
+import io
+import struct
+from typing import List
+
+import numpy as np
+import pytest
+
+import running_models.output_tap as output_tap
+from running_models.output_tap import CdfRecordCounter, summarise_taps, tap_stream
+
+STREAM_TYPE: bytes = struct.pack("<i", (1 << 24) | 1)
+
+
+def cdf_records(event_ids: List[int], seed: int = 0) -> bytes:
+    records: List[bytes] = []
+    for event_id in event_ids:
+        # the records of an event are the same whatever other events are in the stream
+        rng = np.random.default_rng([seed, event_id])
+        for areaperil_id in range(1, int(rng.integers(2, 8))):
+            bin_count: int = int(rng.integers(0, 12))
+            records.append(struct.pack("<iIii", event_id, areaperil_id, 3, bin_count)
+                           + rng.random(2 * bin_count).astype("<f4").tobytes())
+    return b"".join(records)
+
+
+def counted(data: bytes, buffer_size: int) -> CdfRecordCounter:
+    counter = CdfRecordCounter()
+    for position in range(0, len(data), buffer_size):
+        counter.update(memoryview(data[position:position + buffer_size]))
+    counter.finish()
+    return counter
+
+
+def test_event_digest_does_not_depend_on_the_split(monkeypatch):
+    whole: dict = tap_stream(io.BytesIO(STREAM_TYPE + cdf_records(list(range(1, 41)))), stream_format="cdf")
+    # the buffer is shrunk so records and the header are split across reads
+    monkeypatch.setattr(output_tap, "BUFFER_SIZE", 7)
+    halves: List[dict] = [
+        tap_stream(io.BytesIO(STREAM_TYPE + cdf_records(list(range(start, 41, 2)))), stream_format="cdf")
+        for start in (2, 1)
+    ]
+    assert whole["records"] == sum(report["records"] for report in halves)
+    assert summarise_taps(halves)["digest"] == summarise_taps([whole])["digest"]
+    assert whole["events"] == 40
+    assert whole["stream_type"] == (1 << 24) | 1
+
+
+@pytest.mark.parametrize("buffer_size", [1, 3, 16, 100, 4096])
+def test_counts_do_not_depend_on_the_buffer_size(buffer_size):
+    data: bytes = STREAM_TYPE + cdf_records([5, 5, 6, 9], seed=1)
+    counter: CdfRecordCounter = counted(data, buffer_size)
+    reference: CdfRecordCounter = counted(data, len(data))
+    assert (counter.records, counter.events, counter.stream_digest) == \
+           (reference.records, reference.events, reference.stream_digest)
+    assert counter.trailing_bytes == 0
+
+
+def test_changes_and_truncation_are_found():
+    data: bytes = STREAM_TYPE + cdf_records([1, 2, 3], seed=2)
+    reference: dict = tap_stream(io.BytesIO(data), stream_format="cdf")
+    changed: bytearray = bytearray(data)
+    changed[-1] ^= 1
+    assert tap_stream(io.BytesIO(bytes(changed)), stream_format="cdf")["event_digest"] != reference["event_digest"]
+    truncated: dict = tap_stream(io.BytesIO(data[:-5]), stream_format="cdf")
+    assert truncated["trailing_bytes"] > 0
+    assert truncated["records"] == reference["records"] - 1
+
+
+def test_raw_is_the_default():
+    report: dict = tap_stream(io.BytesIO(STREAM_TYPE + cdf_records([1])))
+    assert report["format"] == "raw"
+    assert "event_digest" not in report
@@ -0,0 +1,53 @@
+"""
+Tests putting files into a page cache state.
+"""
+import os
+
+import pytest
+
+from running_models.page_cache import WARM_RANGE_SIZE, evict_file, list_files, set_cache_state, warm_range
+
+
+@pytest.fixture
+def static_path(tmp_path) -> str:
+    static = tmp_path / "static"
+    (static / "footprint.parquet" / "event_id=1").mkdir(parents=True)
+    (static / "footprint.bin").write_bytes(os.urandom(100_000))
+    (static / "footprint.parquet" / "event_id=1" / "part.parquet").write_bytes(b"parquet")
+    (tmp_path / "vulnerability.bin").write_bytes(b"vulnerability")
+    # a linked file is warmed and evicted through the file it points to
+    (static / "vulnerability.bin").symlink_to(tmp_path / "vulnerability.bin")
+    return str(static)
+
+
+def test_files_are_listed_through_directories_and_links(static_path):
+    assert list_files(static_path) == sorted([
+        os.path.join(static_path, "footprint.bin"),
+        os.path.join(static_path, "footprint.parquet", "event_id=1", "part.parquet"),
+        os.path.realpath(os.path.join(static_path, "..", "vulnerability.bin"))
+    ])
+    assert list_files(static_path, file_names=["footprint.bin", "footprint.idx"]) == [
+        os.path.join(static_path, "footprint.bin")
+    ]
+
+
+@pytest.mark.parametrize("state", ["none", "cold", "warm"])
+def test_every_state_can_be_set(static_path, state):
+    set_cache_state(paths=list_files(static_path), state=state, workers=2)
+    with open(os.path.join(static_path, "footprint.bin"), "rb") as file:
+        assert len(file.read()) == 100_000
+
+
+def test_unknown_state_is_refused(static_path):
+    with pytest.raises(ValueError):
+        set_cache_state(paths=list_files(static_path), state="hot")
+
+
+def test_ranges_are_read_and_evicted(static_path):
+    path: str = os.path.join(static_path, "footprint.bin")
+    assert warm_range(path, offset=0, length=WARM_RANGE_SIZE) == 100_000
+    assert warm_range(path, offset=90_000, length=50) == 50
+    assert warm_range(path, offset=200_000, length=50) == 0
+    evict_file(path)
+    with pytest.raises(FileNotFoundError):
+        evict_file(os.path.join(static_path, "footprint.idx"))
@@ -0,0 +1,48 @@
+"""
+Tests launching pipelines and cleaning up after pipelines that fail to launch.
+"""
+import os
+
+import psutil
+import pytest
+
+from running_models.pipeline_launcher import PipelineLauncher
+
+
+def open_descriptors() -> int:
+    return len(os.listdir("/proc/self/fd"))
+
+
+def test_pipelines_are_run_and_timed(tmp_path):
+    output_path: str = str(tmp_path / "out.txt")
+    launcher = PipelineLauncher(commands=[f"printf abc | cat | cat > {output_path}", "sh -c 'exit 3'"])
+    assert launcher.run() >= 0.0
+    assert launcher.return_codes == [0, 3]
+    assert launcher.succeeded is False
+    with open(output_path) as file:
+        assert file.read() == "abc"
+
+
+def test_no_commands(capsys):
+    launcher = PipelineLauncher(commands=[])
+    assert launcher.run() == 0.0
+    assert launcher.succeeded is True
+    spread: dict = launcher.spread()
+    assert spread["spread_seconds"] == 0.0
+    assert spread["slowest_pipeline"] is None
+    launcher.print_report()
+    assert "there were no pipelines" in capsys.readouterr().out
+
+
+def test_stage_that_cannot_start_cleans_up():
+    descriptors: int = open_descriptors()
+    launcher = PipelineLauncher(commands=["sleep 30", "sleep 30 | cat | no-such-program-anywhere | cat"])
+    with pytest.raises(FileNotFoundError):
+        launcher.fire()
+    assert open_descriptors() == descriptors
+    assert len(launcher.all_stages) == 1
+    for record in launcher.all_stages:
+        assert record.return_code is not None
+        assert not psutil.pid_exists(record.pid)
+    # the stages of the pipeline that failed to launch are killed and reaped too
+    assert [child.name() for child in psutil.Process().children()] == []